@@ -1,5 +1,3 @@
 from .config import settings
-from .database import engine
-
-__all__ = ["settings", "engine"]
 
+__all__ = ["settings"]
@@ -0,0 +1,129 @@
+"""Admission control: cap how many requests to an expensive endpoint run at once.
+
+A route declares ``dependencies=[Depends(admision("pdf"))]``, or wraps part of
+its handler in ``async with admitido("busqueda")`` (e.g. after a cache hit
+was ruled out). Up to ``limite``
+of its requests run concurrently; the next ``cola`` wait up to
+``ADMISSION_WAIT_SECONDS`` for a slot, and any more get 503 with
+``Retry-After`` right away. A burst of PDF renders or searches then sheds load
+instead of piling up in front of ``/health`` and cheap reads. Route
+dependencies are solved before the endpoint's own, so a waiting request holds
+no database session.
+
+Limits are per process: with several uvicorn workers each one admits its own.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.metrics import metrics
+
+
+class Limitador:
+    def __init__(self, nombre: str, limite: int, cola: int, espera: float):
+        self.nombre = nombre
+        self.limite = limite
+        self.cola = cola
+        self.espera = espera
+        self._semaforo = asyncio.Semaphore(limite)
+        self.en_curso = 0
+        self.esperando = 0
+        self.rechazados = 0
+
+    async def entrar(self) -> None:
+        """Take a slot, queueing for it if there is room; 503 when the queue is full or the wait runs out."""
+        etiquetas = (self.nombre,)
+        if self._semaforo.locked():
+            if self.esperando >= self.cola:
+                self._rechazar("queue_full")
+            self.esperando += 1
+            metrics.inc("admission_queue_depth", etiquetas)
+            inicio = time.perf_counter()
+            adquisicion = asyncio.ensure_future(self._semaforo.acquire())
+            try:
+                await asyncio.wait({adquisicion}, timeout=self.espera)
+            except asyncio.CancelledError:
+                # The client went away; a slot taken meanwhile goes back.
+                if not adquisicion.cancel():
+                    self._semaforo.release()
+                raise
+            finally:
+                self.esperando -= 1
+                metrics.inc("admission_queue_depth", etiquetas, -1)
+                metrics.observe("admission_wait_seconds", etiquetas, time.perf_counter() - inicio)
+            # cancel() is False once the slot was taken, even right at the deadline. A cancelled acquire() passes
+            # a wakeup it already got on to the next waiter, so neither way leaks a slot.
+            if adquisicion.cancel():
+                self._rechazar("timeout")
+        else:
+            await self._semaforo.acquire()
+        self.en_curso += 1
+        metrics.inc("admission_in_flight", etiquetas)
+
+    def salir(self) -> None:
+        self.en_curso -= 1
+        metrics.inc("admission_in_flight", (self.nombre,), -1)
+        self._semaforo.release()
+
+    def _rechazar(self, motivo: str) -> None:
+        self.rechazados += 1
+        metrics.inc("admission_rejected_total", (self.nombre, motivo))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado; reintente en unos segundos",
+            headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+        )
+
+    def status(self) -> dict:
+        return {
+            "limit": self.limite,
+            "in_flight": self.en_curso,
+            "queue_size": self.cola,
+            "queued": self.esperando,
+            "rejected": self.rechazados,
+        }
+
+
+# name -> (concurrent requests, queue size); a limit of 0 admits everything.
+LIMITES = {
+    "pdf": (settings.admission_pdf_concurrency, settings.admission_pdf_queue),
+    "busqueda": (settings.admission_search_concurrency, settings.admission_search_queue),
+}
+
+limitadores = {
+    nombre: Limitador(nombre, limite, cola, settings.admission_wait_seconds)
+    for nombre, (limite, cola) in LIMITES.items()
+    if limite > 0
+}
+
+
+@asynccontextmanager
+async def admitido(nombre: str):
+    """Hold a slot of the ``nombre`` limit for the block; for handlers that admit only part of their work."""
+    limitador = limitadores.get(nombre)
+    if limitador is None:
+        yield
+        return
+    await limitador.entrar()
+    try:
+        yield
+    finally:
+        limitador.salir()
+
+
+def admision(nombre: str):
+    """Route dependency admitting at most the configured number of concurrent requests named ``nombre``."""
+
+    async def admitir():
+        async with admitido(nombre):
+            yield
+
+    return admitir
+
+
+def admision_status() -> dict:
+    return {nombre: limitador.status() for nombre, limitador in limitadores.items()}
@@ -0,0 +1,250 @@
+"""Response cache for read endpoints, with strong ETags and tag-based invalidation.
+
+Entries are tagged with the data they were built from (``rutina:<id>``,
+``rutinas`` for list pages, ``plan``). Write handlers invalidate the tags they
+touched right after committing. Each invalidation starts a new generation; a
+read stores its body only if none of its tags was invalidated since its
+lookup, so a read that raced a write cannot cache what it saw before it.
+
+With read replicas the cache must not undo read-your-writes. A client inside
+its sticky window (see ``app.replicas``) skips the lookup and reads the
+primary. And for ``DB_REPLICA_STICKY_SECONDS`` after a tag is invalidated,
+other clients' replica reads of it are not stored, since the replica may not
+have replayed the write yet.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response, status
+
+from app.config import settings
+from app.replicas import lee_del_primario
+from app.serialization import dumps
+
+LISTAS = "rutinas"
+PLAN = "plan"
+
+
+def rutina_tag(rutina_id: int) -> str:
+    return f"rutina:{rutina_id}"
+
+
+def rutina_de_tag(tag: str) -> int | None:
+    """Routine id of a ``rutina_tag``; None for the other tags."""
+    prefijo, _, valor = tag.partition(":")
+    return int(valor) if prefijo == "rutina" and valor else None
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str
+
+
+class CacheBackend:
+    """Storage interface. A shared store (Redis, memcached) implements these four methods."""
+
+    def get(self, key: str) -> CachedResponse | None:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: CachedResponse, ttl: float, tags: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of ``tags``; return how many were removed."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, CachedResponse, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, entry, _ = item
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CachedResponse, ttl: float, tags: Iterable[str]) -> None:
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, entry, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: W/"x" matches "x".
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag in candidates
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True, hold_off: float = 0.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        # Seconds after an invalidation during which replica reads of the tag are not stored.
+        self.hold_off = hold_off
+        self._invalidated_at: dict[str, float] = {}
+        # Generation of the last invalidation of each tag; older ones are folded into the floor.
+        self._generation = 0
+        self._generation_floor = 0
+        self._invalidated_in: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.bypassed = 0
+        self.held_off = 0
+        self.raced = 0
+
+    @staticmethod
+    def key_for(request: Request, variant: str = "") -> str:
+        # Re-encoded, so a value holding "&" or "=" cannot spell another query's key.
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}#{variant}"
+
+    def _respond(self, request: Request, entry: CachedResponse) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    def lookup(self, request: Request, variant: str = "") -> Response | None:
+        """Return the cached response (or a 304) for ``request``, or None on a miss.
+
+        ``variant`` separates responses that depend on more than the URL (e.g. the current day).
+        """
+        if not self.enabled:
+            return None
+        request.state.cache_generation = self._generation
+        if lee_del_primario(request):
+            # The entry may have been filled from a replica that lacks this client's write.
+            self.bypassed += 1
+            return None
+        entry = self.backend.get(self.key_for(request, variant))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._respond(request, entry)
+
+    def store(self, request: Request, payload, tags: Iterable[str], variant: str = "") -> Response:
+        """Serialize ``payload``, cache it under ``tags`` and answer the request."""
+        body = dumps(payload)
+        entry = CachedResponse(body=body, etag=f'"{hashlib.sha256(body).hexdigest()}"', media_type="application/json")
+        tags = tuple(tags)
+        if self.enabled and self._storable(request, tags):
+            self.backend.set(self.key_for(request, variant), entry, self.ttl, tags)
+        return self._respond(request, entry)
+
+    def _storable(self, request: Request, tags: tuple[str, ...]) -> bool:
+        desde = getattr(request.state, "cache_generation", None)
+        if desde is not None and (
+            desde < self._generation_floor or any(self._invalidated_in.get(tag, 0) > desde for tag in tags)
+        ):
+            # A write committed while this read ran: its body may predate it.
+            self.raced += 1
+            return False
+        if not self.hold_off or lee_del_primario(request):
+            return True
+        desde = time.monotonic() - self.hold_off
+        if any(self._invalidated_at.get(tag, 0.0) > desde for tag in tags):
+            self.held_off += 1
+            return False
+        return True
+
+    def invalidate(self, *tags: str) -> None:
+        if not self.enabled:
+            return
+        self.invalidations += self.backend.invalidate(tags)
+        self._generation += 1
+        self._invalidated_in.update(dict.fromkeys(tags, self._generation))
+        if len(self._invalidated_in) > 1024:
+            self._generation_floor = self._generation
+            self._invalidated_in.clear()
+        if self.hold_off:
+            ahora = time.monotonic()
+            self._invalidated_at.update(dict.fromkeys(tags, ahora))
+            if len(self._invalidated_at) > 1024:
+                self._invalidated_at = {
+                    tag: cuando for tag, cuando in self._invalidated_at.items() if cuando > ahora - self.hold_off
+                }
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "invalidated_entries": self.invalidations,
+            "sticky_bypasses": self.bypassed,
+            "held_off_stores": self.held_off,
+            "raced_stores": self.raced,
+            "entries": len(self.backend) if hasattr(self.backend, "__len__") else None,
+        }
+
+
+response_cache = ResponseCache(
+    MemoryCacheBackend(settings.response_cache_max_entries),
+    ttl=settings.response_cache_ttl,
+    enabled=settings.response_cache_enabled,
+    hold_off=settings.db_replica_sticky_seconds if settings.database_replica_urls else 0.0,
+)
@@ -0,0 +1,100 @@
+"""Stored exercise counters of ``rutina``: lookup and reconciliation.
+
+``total_ejercicios`` and ``ejercicios_<dia>`` are maintained by triggers on
+``ejercicio`` (migration 0004), so the list endpoint reads them as plain
+columns. ``reconciliar`` recounts every routine and repairs the ones that
+drifted, e.g. after the triggers were disabled for a manual load.
+
+    python -m app.contadores [--solo-informar]
+"""
+
+import argparse
+import sys
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, case, func, or_, select, text, update
+
+from app.database import engine
+from app.models import DiaSemana, Ejercicio, Rutina
+
+CONTADOR_DIA = {dia: f"ejercicios_{dia.name.lower()}" for dia in DiaSemana}
+CONTADORES = ("total_ejercicios", *CONTADOR_DIA.values())
+
+
+class Deriva(NamedTuple):
+    rutina_id: int
+    contador: str
+    guardado: int
+    real: int
+
+
+def contador_dia(dia: DiaSemana):
+    """Counter column of the exercises ``dia``."""
+    return getattr(Rutina, CONTADOR_DIA[dia])
+
+
+def reconciliar(connection, corregir: bool = True) -> list[Deriva]:
+    """Compare the stored counters with a recount; with ``corregir`` overwrite the ones that differ."""
+    if corregir and connection.dialect.name == "postgresql":
+        # Exercise writes wait until the repair commits, so none lands between the recount and the UPDATE.
+        connection.execute(text("LOCK TABLE ejercicio IN SHARE MODE"))
+
+    conteos = (
+        select(
+            Ejercicio.rutina_id,
+            func.count().label("total_ejercicios"),
+            *(
+                func.sum(case((Ejercicio.dia_semana == dia, 1), else_=0)).label(contador)
+                for dia, contador in CONTADOR_DIA.items()
+            ),
+        )
+        .group_by(Ejercicio.rutina_id)
+        .subquery()
+    )
+    reales = [func.coalesce(conteos.c[contador], 0).label(f"real_{contador}") for contador in CONTADORES]
+    guardados = [getattr(Rutina, contador) for contador in CONTADORES]
+    statement = (
+        select(Rutina.id, *guardados, *reales)
+        .outerjoin(conteos, conteos.c.rutina_id == Rutina.id)
+        .where(or_(*(guardado != real for guardado, real in zip(guardados, reales))))
+        .order_by(Rutina.id)
+    )
+    filas = connection.execute(statement).all()
+
+    derivas = [
+        Deriva(fila.id, contador, fila._mapping[contador], fila._mapping[f"real_{contador}"])
+        for fila in filas
+        for contador in CONTADORES
+        if fila._mapping[contador] != fila._mapping[f"real_{contador}"]
+    ]
+    if corregir and filas:
+        connection.execute(
+            update(Rutina)
+            .where(Rutina.id == bindparam("b_id"))
+            .values({contador: bindparam(f"b_{contador}") for contador in CONTADORES}),
+            [
+                {"b_id": fila.id, **{f"b_{contador}": fila._mapping[f"real_{contador}"] for contador in CONTADORES}}
+                for fila in filas
+            ],
+        )
+    return derivas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recalcula los contadores de ejercicios de cada rutina.")
+    parser.add_argument("--solo-informar", action="store_true", help="informa las diferencias sin corregirlas")
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        derivas = reconciliar(connection, corregir=not args.solo_informar)
+    for deriva in derivas:
+        print(f"Rutina {deriva.rutina_id}: {deriva.contador} {deriva.guardado} -> {deriva.real}")
+    rutinas = len({deriva.rutina_id for deriva in derivas})
+    if args.solo_informar:
+        print(f"{rutinas} rutinas con contadores desactualizados")
+        sys.exit(1 if derivas else 0)
+    print(f"{rutinas} rutinas corregidas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,293 @@
-from sqlmodel import SQLModel, create_engine, Session
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from app.config import settings
+from app.migrations import check, upgrade
+from app.search import configure_engine
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+slow_query_logger = logging.getLogger("app.slow_queries")
+
+
+def async_url(url: str) -> str:
+    """Map a sync database URL onto the async driver for its backend."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r}")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+class PoolMetrics:
+    """Checkout counters for one engine's pool; survives pool recreation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def start(self):
+        with self._lock:
+            self.waiting += 1
+
+    def finish(self, waited: float, timed_out: bool):
+        with self._lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def _instrumented(pool_class, metrics: PoolMetrics):
+    class InstrumentedPool(pool_class):
+        def connect(self):
+            metrics.start()
+            started = time.perf_counter()
+            timed_out = False
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                metrics.finish(time.perf_counter() - started, timed_out)
+
+    InstrumentedPool.metrics = metrics
+    return InstrumentedPool
+
+
+def pool_options(url: str, pool_class) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite needs a single shared connection, not a queue pool.
+        return {}
+    return {
+        "poolclass": _instrumented(pool_class, PoolMetrics()),
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+class QueryStats:
+    """Statements issued while handling one request (or one ``track_queries`` block)."""
+
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        self.budget: int | None = None
+        # Set when a transaction commits; past that point a strict-mode 500 would misreport saved work.
+        self.committed = False
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "-"
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or self.scope.get("path", "-")
+        return f"{self.scope.get('method', '')} {path}".strip()
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+
+class QueryBudgetExceeded(Exception):
+    """Strict mode: a transaction was about to commit with its request already over the query budget."""
+
+    def __init__(self, stats: QueryStats):
+        super().__init__(f"{stats.route} ran {stats.count} queries (budget {stats.budget})")
+        self.stats = stats
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> QueryStats | None:
+    return _query_stats.get()
+
+
+@contextmanager
+def track_queries(scope: dict | None = None):
+    """Count and time every statement executed inside the block, on either engine."""
+    stats = QueryStats(scope)
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def query_budget(max_queries: int):
+    """Route dependency declaring how many statements the endpoint may issue."""
+
+    async def declare_budget():
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.budget = max_queries
+
+    return declare_budget
+
+
+def extend_query_budget(extra: int) -> None:
+    """Allow ``extra`` statements for optional work the request asked for (e.g. ``include=``)."""
+    stats = _query_stats.get()
+    if stats is not None and stats.budget is not None:
+        stats.budget += extra
+
+
+@contextmanager
+def one_query_for_budget():
+    """Count the statements run inside the block as one against the budget.
+
+    Wraps a single multi-row ``insert().returning()``: insertmanyvalues runs it in as many batches as the payload
+    needs, which a fixed budget cannot know in advance.
+    """
+    stats = _query_stats.get()
+    before = stats.count if stats is not None else 0
+    yield
+    if stats is not None:
+        extend_query_budget(max(stats.count - before - 1, 0))
+
+
+_PLACEHOLDER = r"(?:\?|\$\d+(?:::\w+)?|%\(\w+\)s|%s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Single-line SQL with expanded IN lists collapsed, so the same query always logs the same."""
+    return _PLACEHOLDER_LIST.sub("(?, ...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if elapsed * 1000 >= settings.slow_query_ms:
+        slow_query_logger.warning(
+            "%.1f ms %s: %s", elapsed * 1000, stats.route if stats is not None else "-", normalize_sql(statement)
+        )
+
+
+@event.listens_for(OrmSession, "before_commit")
+def _check_budget_before_commit(session) -> None:
+    stats = _query_stats.get()
+    if stats is None or not settings.query_budget_strict:
+        return
+    # Flush now so the final flush's statements count; raising leaves the transaction to roll back.
+    session.flush()
+    if stats.over_budget:
+        raise QueryBudgetExceeded(stats)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _mark_committed(session) -> None:
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.committed = True
+
+
+def instrument_engine(sync_engine) -> None:
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+_async_database_url = settings.async_database_url or async_url(settings.database_url)
+
+# The sync engine is kept for CLI tasks and benchmarks; request handling goes through async_engine.
+engine = create_engine(settings.database_url, echo=False, **pool_options(settings.database_url, QueuePool))
+configure_engine(engine)
+instrument_engine(engine)
+
+async_engine = create_async_engine(
+    _async_database_url, echo=False, **pool_options(_async_database_url, AsyncAdaptedQueuePool)
+)
+configure_engine(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine)
+
+
+def pool_status(pool=None) -> dict:
+    """Snapshot of the request pool: occupancy, overflow and checkout wait times."""
+    pool = pool or async_engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": pool.status()}
+
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    status = dict(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        checked_in=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        max_overflow=pool._max_overflow,
+        capacity=capacity,
+        saturated=pool._max_overflow > -1 and pool.checkedout() >= capacity,
+    )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(
+            checkouts=metrics.checkouts,
+            checkout_timeouts=metrics.timeouts,
+            waiting=metrics.waiting,
+            wait_seconds_total=round(metrics.wait_seconds_total, 6),
+            wait_seconds_max=round(metrics.wait_seconds_max, 6),
+            wait_seconds_avg=round(metrics.wait_seconds_total / metrics.checkouts, 6) if metrics.checkouts else 0.0,
+        )
+    return status
+
+
+async def ping_database():
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
 
-engine = create_engine(settings.database_url, echo=False)
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    """Apply pending migrations with the sync engine (CLI tasks, benchmarks)."""
+    with engine.begin() as connection:
+        upgrade(connection)
 
-def get_session():
-    with Session(engine) as session:
+
+async def ensure_schema():
+    """Fail fast when migrations are pending; with ``DB_MIGRATE_ON_STARTUP`` apply them instead."""
+    async with async_engine.begin() as connection:
+        if settings.db_migrate_on_startup:
+            await connection.run_sync(upgrade)
+        await connection.run_sync(check)
+
+
+async def get_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
 
+
+def get_sync_session():
+    with Session(engine) as session:
+        yield session
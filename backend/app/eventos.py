@@ -0,0 +1,204 @@
+"""Change feed: server-sent events telling clients what to reload.
+
+Write handlers call ``difusor.publicar`` right after committing, with the same
+cache tags they invalidate (see ``app.cache``). ``GET /api/eventos`` streams
+one ``cambio`` event per write:
+``{"listado": bool, "plan": bool, "rutinas": [ids] | null}``. ``rutinas``
+lists the routines whose detail changed; ``null`` means too many to list, so
+the client reloads whatever it shows.
+
+Each subscriber has a queue of ``EVENTS_QUEUE_SIZE`` events, so a slow client
+never blocks a publisher. When the queue is full the oldest event is dropped,
+and the client is then sent ``resync`` to reload everything. An idle
+subscriber is a coroutine waiting on an ``asyncio.Event``, plus a comment
+line every ``EVENTS_KEEPALIVE_SECONDS``.
+
+The broadcaster is per process. With several uvicorn workers on PostgreSQL,
+``EVENTS_PG_NOTIFY=true`` relays events through LISTEN/NOTIFY, so subscribers
+on one worker hear the writes handled by the others.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+
+from sqlalchemy.engine import make_url
+
+from app.cache import LISTAS, PLAN, rutina_de_tag
+from app.config import settings
+
+logger = logging.getLogger("app.eventos")
+
+# Above this many routines a change is reported as "rutinas": null; also keeps NOTIFY payloads small.
+MAX_IDS = 100
+PUENTE_REINTENTO = 5.0
+PUENTE_LATIDO = 30.0
+
+
+class Evento(NamedTuple):
+    id: int
+    tipo: str
+    datos: dict
+
+
+def formato_sse(evento: Evento) -> str:
+    return f"id: {evento.id}\nevent: {evento.tipo}\ndata: {json.dumps(evento.datos)}\n\n"
+
+
+def cambio(tags: tuple[str, ...]) -> dict:
+    """``cambio`` event payload for the invalidated cache ``tags``."""
+    ids = sorted({rutina_id for rutina_id in map(rutina_de_tag, tags) if rutina_id is not None})
+    return {"listado": LISTAS in tags, "plan": PLAN in tags, "rutinas": ids if len(ids) <= MAX_IDS else None}
+
+
+class Suscripcion:
+    def __init__(self, capacidad: int):
+        self.cola: deque[Evento] = deque(maxlen=capacidad)
+        self.aviso = asyncio.Event()
+        self.descartados = 0
+
+    def entregar(self, evento: Evento) -> bool:
+        """Queue ``evento``; True if that dropped the oldest one."""
+        lleno = len(self.cola) == self.cola.maxlen
+        self.descartados += lleno
+        self.cola.append(evento)
+        self.aviso.set()
+        return lleno
+
+    async def esperar(self, timeout: float) -> tuple[list[Evento], int]:
+        """Pending events and how many were dropped since the last call; nothing after ``timeout``."""
+        try:
+            await asyncio.wait_for(self.aviso.wait(), timeout)
+        except asyncio.TimeoutError:
+            return [], 0
+        self.aviso.clear()
+        eventos = list(self.cola)
+        self.cola.clear()
+        descartados, self.descartados = self.descartados, 0
+        return eventos, descartados
+
+
+class Difusor:
+    def __init__(self, capacidad: int, max_suscriptores: int):
+        self.capacidad = capacidad
+        self.max_suscriptores = max_suscriptores
+        self.suscripciones: set[Suscripcion] = set()
+        self.puente: PuenteNotify | None = None
+        self._secuencia = itertools.count(1)
+        self.publicados = 0
+        self.descartados = 0
+
+    @property
+    def lleno(self) -> bool:
+        return len(self.suscripciones) >= self.max_suscriptores
+
+    @contextmanager
+    def suscribir(self) -> Iterator[Suscripcion]:
+        suscripcion = Suscripcion(self.capacidad)
+        self.suscripciones.add(suscripcion)
+        try:
+            yield suscripcion
+        finally:
+            self.suscripciones.discard(suscripcion)
+
+    def publicar(self, *tags: str) -> None:
+        """Announce a committed write that invalidated ``tags``, here and, with the bridge, on the other workers."""
+        datos = cambio(tags)
+        self.difundir("cambio", datos)
+        if self.puente is not None:
+            self.puente.enviar(datos)
+
+    def difundir(self, tipo: str, datos: dict) -> None:
+        """Deliver to this process's subscribers only."""
+        self.publicados += 1
+        evento = Evento(next(self._secuencia), tipo, datos)
+        for suscripcion in self.suscripciones:
+            self.descartados += suscripcion.entregar(evento)
+
+    def status(self) -> dict:
+        return {
+            "subscribers": len(self.suscripciones),
+            "max_subscribers": self.max_suscriptores,
+            "published": self.publicados,
+            "dropped": self.descartados,
+            "pg_notify": self.puente.status() if self.puente else None,
+        }
+
+
+class PuenteNotify:
+    """Relay events between workers over PostgreSQL LISTEN/NOTIFY, on one dedicated asyncpg connection."""
+
+    def __init__(self, url: str, canal: str, difusor: Difusor):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.canal = canal
+        self.difusor = difusor
+        # Tells this worker's own notifications apart; it already delivered them locally.
+        self.origen = uuid.uuid4().hex
+        self.salida: asyncio.Queue[dict] = asyncio.Queue(maxsize=1000)
+        self.conectado = False
+        self.reconexiones = 0
+
+    def enviar(self, datos: dict) -> None:
+        if self.salida.full():
+            self.salida.get_nowait()
+        self.salida.put_nowait(datos)
+
+    def _recibir(self, conexion, pid, canal, payload: str) -> None:
+        mensaje = json.loads(payload)
+        if mensaje["origen"] != self.origen:
+            self.difusor.difundir("cambio", mensaje["datos"])
+
+    async def ejecutar(self) -> None:
+        import asyncpg
+
+        while True:
+            try:
+                conexion = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError) as error:
+                logger.warning("LISTEN/NOTIFY bridge cannot connect: %s", error)
+                await asyncio.sleep(PUENTE_REINTENTO)
+                continue
+            try:
+                await conexion.add_listener(self.canal, self._recibir)
+                if self.reconexiones:
+                    # Other workers' events sent while disconnected are lost; subscribers reload instead.
+                    self.difusor.difundir("resync", {})
+                self.conectado = True
+                while True:
+                    try:
+                        datos = await asyncio.wait_for(self.salida.get(), PUENTE_LATIDO)
+                    except asyncio.TimeoutError:
+                        # Idle: probe the connection, so a dead listener is noticed.
+                        await conexion.execute("SELECT 1")
+                        continue
+                    mensaje = json.dumps({"origen": self.origen, "datos": datos})
+                    await conexion.execute("SELECT pg_notify($1, $2)", self.canal, mensaje)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+                logger.warning("LISTEN/NOTIFY bridge lost its connection: %s", error)
+            finally:
+                self.conectado = False
+                conexion.terminate()
+            self.reconexiones += 1
+            await asyncio.sleep(PUENTE_REINTENTO)
+
+    def status(self) -> dict:
+        return {"channel": self.canal, "connected": self.conectado, "reconnects": self.reconexiones}
+
+
+difusor = Difusor(settings.events_queue_size, settings.events_max_subscribers)
+
+
+def iniciar_puente() -> asyncio.Task | None:
+    """Start the LISTEN/NOTIFY bridge when ``EVENTS_PG_NOTIFY`` is set; on SQLite there is nothing to bridge."""
+    if not settings.events_pg_notify:
+        return None
+    if make_url(settings.database_url).get_backend_name() != "postgresql":
+        logger.warning("EVENTS_PG_NOTIFY requires PostgreSQL; events stay within each worker")
+        return None
+    difusor.puente = PuenteNotify(settings.database_url, settings.events_pg_channel, difusor)
+    return asyncio.create_task(difusor.puente.ejecutar())
@@ -0,0 +1,188 @@
+"""PDF export jobs rendered in a bounded process pool.
+
+Each job keeps its state in the spool directory as ``<id>.json`` next to its
+result file, so any worker process on the host can answer a status poll.
+Files older than ``export_ttl_seconds`` are removed by ``limpiar``.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.metrics import metrics
+from app.pdf import render_rutina, render_rutinas
+from app.pdf_cache import clave_pdf, pdf_cache
+
+JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+EXTENSIONES = {"zip": "zip", "pdf": "pdf"}
+
+
+class ExportManager:
+    def __init__(self, spool_dir: Path, workers: int, ttl_seconds: int):
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self._executor: ProcessPoolExecutor | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn keeps the children free of the parent's event loop and DB connections.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, rutinas: list[dict]) -> bytes:
+        """Render ``rutinas`` into one PDF in a worker process."""
+        loop = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        if len(rutinas) == 1:
+            contenido = await loop.run_in_executor(self.executor, render_rutina, rutinas[0])
+        else:
+            contenido = await loop.run_in_executor(self.executor, render_rutinas, rutinas)
+        metrics.observe("pdf_render_duration_seconds", (), time.perf_counter() - inicio)
+        return contenido
+
+    async def pdf_rutina(self, datos: dict) -> tuple[str, bytes]:
+        """Return ``(hash, pdf)`` for one routine, rendering only on a cache miss."""
+        clave = clave_pdf(datos)
+        contenido = await run_in_threadpool(pdf_cache.get, clave)
+        if contenido is None:
+            inicio = time.perf_counter()
+            contenido = await asyncio.get_running_loop().run_in_executor(self.executor, render_rutina, datos)
+            duracion = time.perf_counter() - inicio
+            metrics.observe("pdf_render_duration_seconds", (), duracion)
+            await run_in_threadpool(pdf_cache.put, clave, contenido, datos["id"], duracion)
+        return clave, contenido
+
+    def _estado_path(self, job_id: str) -> Path:
+        return self.spool_dir / f"{job_id}.json"
+
+    def _resultado_path(self, job_id: str, formato: str) -> Path:
+        return self.spool_dir / f"{job_id}.{EXTENSIONES[formato]}"
+
+    def _guardar_estado(self, estado: dict) -> None:
+        path = self._estado_path(estado["id"])
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(estado))
+        os.replace(tmp, path)
+
+    def estado(self, job_id: str) -> dict | None:
+        if not JOB_ID.match(job_id):
+            return None
+        try:
+            return json.loads(self._estado_path(job_id).read_text())
+        except FileNotFoundError:
+            return None
+
+    def resultado(self, job_id: str) -> Path | None:
+        estado = self.estado(job_id)
+        if not estado or estado["estado"] != "completado":
+            return None
+        path = self._resultado_path(job_id, estado["formato"])
+        return path if path.exists() else None
+
+    def lanzar(self, formato: str, total: int, cargar: Callable[[], Awaitable[list[dict]]]) -> dict:
+        """Register a job and start it in the background; ``cargar`` loads the routines to render."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        estado = {
+            "id": uuid.uuid4().hex,
+            "estado": "pendiente",
+            "formato": formato,
+            "total": total,
+            "completadas": 0,
+            "creado": datetime.utcnow().isoformat(),
+            "error": None,
+        }
+        self._guardar_estado(estado)
+        task = asyncio.create_task(self._ejecutar(estado, cargar))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return estado
+
+    async def _ejecutar(self, estado: dict, cargar: Callable[[], Awaitable[list[dict]]]) -> None:
+        destino = self._resultado_path(estado["id"], estado["formato"])
+        tmp = destino.with_suffix(destino.suffix + ".tmp")
+        try:
+            estado["estado"] = "procesando"
+            self._guardar_estado(estado)
+            rutinas = await cargar()
+            if estado["formato"] == "pdf":
+                contenido = await self.render(rutinas)
+                await run_in_threadpool(tmp.write_bytes, contenido)
+                estado["completadas"] = len(rutinas)
+            else:
+                await self._escribir_zip(tmp, rutinas, estado)
+            os.replace(tmp, destino)
+            estado["estado"] = "completado"
+        except asyncio.CancelledError:
+            tmp.unlink(missing_ok=True)
+            raise
+        except Exception as error:
+            # Any failure is reported to the poller instead of being raised.
+            tmp.unlink(missing_ok=True)
+            estado["estado"] = "error"
+            estado["error"] = str(error) or error.__class__.__name__
+        self._guardar_estado(estado)
+
+    async def _escribir_zip(self, path: Path, rutinas: list[dict], estado: dict) -> None:
+        # Render in chunks so at most a few PDFs are held in memory at once.
+        chunk = self.workers * 2
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archivo:
+            for inicio in range(0, len(rutinas), chunk):
+                lote = rutinas[inicio : inicio + chunk]
+                pdfs = await asyncio.gather(*(self.pdf_rutina(rutina) for rutina in lote))
+                for rutina, (_, contenido) in zip(lote, pdfs):
+                    await run_in_threadpool(archivo.writestr, f"rutina_{rutina['id']}.pdf", contenido)
+                estado["completadas"] += len(lote)
+                self._guardar_estado(estado)
+
+    def limpiar(self) -> int:
+        """Delete spool files older than the TTL; return how many were removed."""
+        if not self.spool_dir.exists():
+            return 0
+        limite = time.time() - self.ttl_seconds
+        eliminados = 0
+        for path in self.spool_dir.iterdir():
+            try:
+                if path.is_file() and path.stat().st_mtime < limite:
+                    path.unlink()
+                    eliminados += 1
+            except FileNotFoundError:
+                continue
+        return eliminados
+
+    async def limpiar_periodicamente(self) -> None:
+        intervalo = max(60, self.ttl_seconds // 4)
+        while True:
+            await run_in_threadpool(self.limpiar)
+            await asyncio.sleep(intervalo)
+
+
+export_manager = ExportManager(
+    Path(settings.export_spool_dir or Path(tempfile.gettempdir()) / "rutinas_exports"),
+    workers=settings.export_workers,
+    ttl_seconds=settings.export_ttl_seconds,
+)
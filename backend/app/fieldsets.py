@@ -0,0 +1,90 @@
+"""Sparse fieldsets for the routine endpoints: ``fields=`` and ``include=``.
+
+``fields`` is a comma-separated list of routine fields; ``ejercicios.<campo>``
+picks exercise fields and a bare ``ejercicios`` asks for all of them.
+``include=ejercicios`` embeds the exercises where they are not returned by
+default (list pages). ``id`` is always returned, at both levels.
+
+The handlers turn the projection into SQL: only the requested columns are
+selected, and the exercise count or the exercises query is skipped when
+nobody asked for it. The payload builders emit only those keys.
+"""
+
+from typing import Callable, NamedTuple
+
+from fastapi import HTTPException, Query
+
+from app.serialization import CAMPOS_EJERCICIO, CAMPOS_RUTINA, CAMPOS_RUTINA_LISTA
+
+EJERCICIOS = "ejercicios"
+
+
+class Proyeccion(NamedTuple):
+    rutina: tuple[str, ...]
+    # None: the exercises are left out.
+    ejercicios: tuple[str, ...] | None
+
+
+def _nombres(valor: str) -> list[str]:
+    return [nombre.strip() for nombre in valor.split(",") if nombre.strip()]
+
+
+def _en_orden(campos: tuple[str, ...], pedidos: set[str]) -> tuple[str, ...]:
+    # Model order, so a sparse payload reads like the full one minus some keys.
+    return tuple(campo for campo in campos if campo in pedidos)
+
+
+def proyeccion(
+    fields: str | None, include: str | None, campos_rutina: tuple[str, ...], con_ejercicios: bool
+) -> Proyeccion:
+    """Resolve the query parameters; ``con_ejercicios`` says whether the endpoint embeds exercises by default."""
+    for relacion in _nombres(include or ""):
+        if relacion != EJERCICIOS:
+            raise HTTPException(status_code=400, detail=f"No se puede incluir '{relacion}'")
+    incluir = bool(include and _nombres(include))
+
+    if fields is None:
+        return Proyeccion(campos_rutina, CAMPOS_EJERCICIO if con_ejercicios or incluir else None)
+
+    rutina = {"id"}
+    subcampos: set[str] = set()
+    todos = incluir
+    for campo in _nombres(fields):
+        relacion, punto, subcampo = campo.partition(".")
+        if campo == EJERCICIOS:
+            todos = True
+        elif punto and relacion == EJERCICIOS and subcampo in CAMPOS_EJERCICIO:
+            subcampos.add(subcampo)
+        elif not punto and campo in campos_rutina:
+            rutina.add(campo)
+        else:
+            raise HTTPException(status_code=400, detail=f"Campo desconocido: '{campo}'")
+    # Named exercise fields win over include=ejercicios or a bare "ejercicios"; those alone mean all of them.
+    if subcampos:
+        ejercicios: set[str] | None = {"id"} | subcampos
+    else:
+        ejercicios = set(CAMPOS_EJERCICIO) if todos else None
+    return Proyeccion(
+        _en_orden(campos_rutina, rutina),
+        _en_orden(CAMPOS_EJERCICIO, ejercicios) if ejercicios is not None else None,
+    )
+
+
+def campos_dependency(campos_rutina: tuple[str, ...], con_ejercicios: bool) -> Callable[..., Proyeccion]:
+    """Route dependency reading ``fields`` and ``include`` into a ``Proyeccion``."""
+
+    def dependency(
+        fields: str | None = Query(
+            None,
+            description=f"Campos a devolver, separados por comas: {', '.join(campos_rutina)}; "
+            f"ejercicios.<campo> para los de cada ejercicio ({', '.join(CAMPOS_EJERCICIO)}). El id siempre se incluye.",
+        ),
+        include: str | None = Query(None, description="ejercicios: incluye los ejercicios de cada rutina."),
+    ) -> Proyeccion:
+        return proyeccion(fields, include, campos_rutina, con_ejercicios)
+
+    return dependency
+
+
+campos_lista = campos_dependency(CAMPOS_RUTINA_LISTA, con_ejercicios=False)
+campos_detalle = campos_dependency(CAMPOS_RUTINA, con_ejercicios=True)
@@ -0,0 +1,296 @@
+"""Bulk import of routines and exercises from NDJSON or CSV.
+
+Input is read as a stream and validated against ``RutinaCreate`` in chunks of
+``IMPORT_CHUNK`` routines. Each chunk is loaded in its own transaction: with
+``COPY`` on PostgreSQL and executemany batches elsewhere. Both formats match
+what ``GET /api/rutinas/export`` produces; in CSV the rows of one routine must
+be consecutive.
+
+    python -m app.imports rutinas.ndjson --duplicados actualizar
+"""
+
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import LISTAS, PLAN, response_cache, rutina_tag
+from app.database import async_engine, ensure_schema
+from app.eventos import difusor
+from app.models import Ejercicio, ImportacionError, ImportacionResumen, Rutina, RutinaCreate
+from app.pdf_cache import pdf_cache
+
+IMPORT_CHUNK = 1000
+MAX_ERRORES = 100
+FORMATOS = ("ndjson", "csv")
+DUPLICADOS = ("omitir", "actualizar")
+
+# CSV column for each EjercicioCreate field.
+EJERCICIO_CSV = {
+    "nombre": "ejercicio_nombre",
+    "dia_semana": "dia_semana",
+    "series": "series",
+    "repeticiones": "repeticiones",
+    "peso": "peso",
+    "notas": "notas",
+    "orden": "orden",
+}
+EJERCICIO_COLUMNAS = ("rutina_id", "nombre", "dia_semana", "series", "repeticiones", "peso", "notas", "orden")
+
+
+class ImportacionInvalida(ValueError):
+    """The input cannot be read at all (e.g. a CSV without the required columns)."""
+
+
+async def _lineas(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # utf-8-sig drops the BOM spreadsheets put in front of CSV files.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    async for chunk in chunks:
+        lineas = (resto + decoder.decode(chunk)).split("\n")
+        resto = lineas.pop()
+        for linea in lineas:
+            yield linea.rstrip("\r")
+    resto += decoder.decode(b"", final=True)
+    if resto:
+        yield resto.rstrip("\r")
+
+
+async def _registros_ndjson(lineas: AsyncIterator[str]) -> AsyncIterator[tuple[int, object, str | None]]:
+    numero = 0
+    async for linea in lineas:
+        numero += 1
+        if not linea.strip():
+            continue
+        try:
+            yield numero, json.loads(linea), None
+        except ValueError as error:
+            yield numero, None, f"JSON inválido: {error}"
+
+
+async def _registros_csv(lineas: AsyncIterator[str]) -> AsyncIterator[tuple[int, object, str | None]]:
+    encabezado: list[str] | None = None
+    actual: tuple[int, dict] | None = None
+    pendiente: list[str] = []
+    numero = inicio = 0
+    async for linea in lineas:
+        numero += 1
+        if not pendiente:
+            inicio = numero
+        pendiente.append(linea)
+        texto = "\n".join(pendiente)
+        # An odd number of quotes means a quoted field continues on the next line.
+        if texto.count('"') % 2:
+            continue
+        pendiente = []
+        if not texto.strip():
+            continue
+        fila = next(csv.reader([texto]))
+        if encabezado is None:
+            encabezado = fila
+            if "rutina_nombre" not in encabezado:
+                raise ImportacionInvalida("El CSV debe tener la columna rutina_nombre")
+            continue
+        if len(fila) != len(encabezado):
+            yield inicio, None, f"Se esperaban {len(encabezado)} columnas y hay {len(fila)}"
+            continue
+
+        valores = {columna: valor for columna, valor in zip(encabezado, fila) if valor != ""}
+        nombre = valores.get("rutina_nombre")
+        if actual is None or actual[1]["nombre"] != nombre:
+            if actual is not None:
+                yield actual[0], actual[1], None
+            actual = (inicio, {"nombre": nombre, "descripcion": valores.get("rutina_descripcion"), "ejercicios": []})
+        if "ejercicio_nombre" in valores:
+            actual[1]["ejercicios"].append(
+                {campo: valores[columna] for campo, columna in EJERCICIO_CSV.items() if columna in valores}
+            )
+    if pendiente:
+        yield inicio, None, "Comillas sin cerrar al final del archivo"
+    if actual is not None:
+        yield actual[0], actual[1], None
+
+
+LECTORES = {"ndjson": _registros_ndjson, "csv": _registros_csv}
+
+
+def _validar(datos: object) -> tuple[RutinaCreate | None, str | None]:
+    try:
+        return RutinaCreate.model_validate(datos), None
+    except ValidationError as error:
+        detalle = error.errors()[0]
+        ubicacion = ".".join(str(parte) for parte in detalle["loc"])
+        return None, f"{ubicacion}: {detalle['msg']}" if ubicacion else detalle["msg"]
+
+
+def _registrar_error(resumen: ImportacionResumen, linea: int, error: str) -> None:
+    resumen.fallidas += 1
+    if len(resumen.errores) < MAX_ERRORES:
+        resumen.errores.append(ImportacionError(linea=linea, error=error))
+
+
+async def _copy(session: AsyncSession, tabla: str, columnas: Iterable[str], registros: list[tuple]) -> None:
+    # COPY runs on the session's own connection, inside the chunk's transaction.
+    conexion = await session.connection()
+    raw = await conexion.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(tabla, records=registros, columns=list(columnas))
+
+
+async def _insertar_rutinas(session: AsyncSession, rutinas: list[RutinaCreate]) -> dict[str, int]:
+    """Insert ``rutinas`` and return their ids by name."""
+    if not rutinas:
+        return {}
+    ahora = datetime.utcnow()
+    if session.get_bind().dialect.name == "postgresql":
+        await _copy(
+            session,
+            "rutina",
+            ("nombre", "descripcion", "fecha_creacion"),
+            [(rutina.nombre, rutina.descripcion, ahora) for rutina in rutinas],
+        )
+        statement = select(Rutina.nombre, Rutina.id).where(Rutina.nombre.in_([rutina.nombre for rutina in rutinas]))
+        return dict((await session.exec(statement)).all())
+
+    filas = await session.exec(
+        insert(Rutina).returning(Rutina.nombre, Rutina.id),
+        params=[{"nombre": rutina.nombre, "descripcion": rutina.descripcion, "fecha_creacion": ahora} for rutina in rutinas],
+    )
+    return dict(filas.all())
+
+
+async def _insertar_ejercicios(session: AsyncSession, filas: list[dict]) -> None:
+    if not filas:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        # COPY bypasses SQLAlchemy's Enum type, which stores member names.
+        registros = [
+            tuple(fila["dia_semana"].name if columna == "dia_semana" else fila[columna] for columna in EJERCICIO_COLUMNAS)
+            for fila in filas
+        ]
+        await _copy(session, "ejercicio", EJERCICIO_COLUMNAS, registros)
+        return
+    await session.exec(insert(Ejercicio), params=filas)
+
+
+async def _cargar_lote(
+    session: AsyncSession, lote: list[tuple[int, RutinaCreate]], duplicados: str, resumen: ImportacionResumen
+) -> None:
+    # Repeated names inside the chunk: the first wins when skipping, the last when updating.
+    por_nombre: dict[str, RutinaCreate] = {}
+    for _, rutina in lote:
+        if rutina.nombre in por_nombre:
+            resumen.omitidas += 1
+            if duplicados == "omitir":
+                continue
+        por_nombre[rutina.nombre] = rutina
+
+    statement = select(Rutina.nombre, Rutina.id).where(Rutina.nombre.in_(list(por_nombre)))
+    existentes = dict((await session.exec(statement)).all())
+    nuevas = [rutina for nombre, rutina in por_nombre.items() if nombre not in existentes]
+    actualizar: list[tuple[int, RutinaCreate]] = []
+    if duplicados == "omitir":
+        resumen.omitidas += len(existentes)
+    else:
+        actualizar = [(existentes[nombre], rutina) for nombre, rutina in por_nombre.items() if nombre in existentes]
+
+    try:
+        ids = await _insertar_rutinas(session, nuevas)
+        if actualizar:
+            await session.exec(
+                update(Rutina),
+                params=[{"id": rutina_id, "descripcion": rutina.descripcion} for rutina_id, rutina in actualizar],
+            )
+            await session.exec(delete(Ejercicio).where(Ejercicio.rutina_id.in_([rutina_id for rutina_id, _ in actualizar])))
+        destinos = [(ids[rutina.nombre], rutina) for rutina in nuevas] + actualizar
+        filas = [
+            {**ejercicio.model_dump(), "rutina_id": rutina_id}
+            for rutina_id, rutina in destinos
+            for ejercicio in rutina.ejercicios or []
+        ]
+        await _insertar_ejercicios(session, filas)
+        await session.commit()
+    except SQLAlchemyError as error:
+        # Usually a concurrent insert of the same name; the rest of the import goes on.
+        await session.rollback()
+        # Existing names skipped above are already counted as omitidas.
+        rechazadas = len(nuevas) + len(actualizar)
+        resumen.fallidas += rechazadas - 1
+        _registrar_error(resumen, lote[0][0], f"Lote de {rechazadas} rutinas rechazado: {error.__class__.__name__}")
+        return
+
+    resumen.insertadas += len(nuevas)
+    resumen.actualizadas += len(actualizar)
+    resumen.ejercicios += len(filas)
+    if actualizar:
+        tags = [rutina_tag(rutina_id) for rutina_id, _ in actualizar]
+        response_cache.invalidate(*tags)
+        difusor.publicar(*tags)
+        pdf_cache.invalidar(*(rutina_id for rutina_id, _ in actualizar))
+
+
+async def importar(
+    session: AsyncSession, chunks: AsyncIterator[bytes], formato: str, duplicados: str = "omitir"
+) -> ImportacionResumen:
+    """Import routines from a stream of ``formato`` bytes and return the summary report."""
+    resumen = ImportacionResumen()
+    lote: list[tuple[int, RutinaCreate]] = []
+    try:
+        async for linea, datos, error in LECTORES[formato](_lineas(chunks)):
+            rutina = None
+            if error is None:
+                rutina, error = _validar(datos)
+            if error is not None:
+                _registrar_error(resumen, linea, error)
+                continue
+            lote.append((linea, rutina))
+            if len(lote) >= IMPORT_CHUNK:
+                await _cargar_lote(session, lote, duplicados, resumen)
+                lote = []
+        if lote:
+            await _cargar_lote(session, lote, duplicados, resumen)
+    finally:
+        if resumen.insertadas or resumen.actualizadas:
+            response_cache.invalidate(LISTAS, PLAN)
+            difusor.publicar(LISTAS, PLAN)
+    return resumen
+
+
+async def _leer_archivo(path: Path, tamano: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with path.open("rb") as archivo:
+        while chunk := archivo.read(tamano):
+            yield chunk
+
+
+async def _main(args: argparse.Namespace) -> ImportacionResumen:
+    await ensure_schema()
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        return await importar(session, _leer_archivo(args.archivo), args.formato, args.duplicados)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importa rutinas desde NDJSON o CSV.")
+    parser.add_argument("archivo", type=Path)
+    parser.add_argument("--formato", choices=FORMATOS, help="por defecto, según la extensión del archivo")
+    parser.add_argument("--duplicados", choices=DUPLICADOS, default="omitir")
+    args = parser.parse_args()
+    args.formato = args.formato or ("csv" if args.archivo.suffix.lower() == ".csv" else "ndjson")
+    try:
+        resumen = asyncio.run(_main(args))
+    except ImportacionInvalida as error:
+        sys.exit(str(error))
+    print(resumen.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Request metrics in Prometheus text format.
+
+Each process keeps its counters, gauges and histograms in memory behind one
+lock. With ``METRICS_DIR`` set (required when uvicorn runs several workers),
+every process also writes a snapshot to ``<dir>/<boot>-<pid>-<start>.json``
+every ``metrics_flush_interval`` seconds; ``/metrics`` merges all snapshots,
+so any worker answers with totals for the whole server. Counters and
+histograms of workers that exited are kept; their gauges are dropped.
+
+``<boot>`` is the parent pid, shared by the workers of one uvicorn master.
+Snapshots of an earlier boot are ignored, and deleted once that master is
+gone. ``<start>`` keeps a worker that reuses a pid from overwriting, and so
+decreasing, the counters of the one that had it. A snapshot is live while its
+process exists and keeps flushing.
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+from app.config import settings
+from app.database import current_query_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+UNMATCHED = "<unmatched>"
+
+# name -> (type, help, label names, buckets)
+DEFINITIONS = {
+    "http_requests_total": (
+        "counter",
+        "Requests handled, by route template and status.",
+        ("method", "route", "status"),
+        None,
+    ),
+    "http_requests_in_flight": ("gauge", "Requests currently being handled.", ("method", "route"), None),
+    "http_request_duration_seconds": ("histogram", "Request latency.", ("method", "route"), LATENCY_BUCKETS),
+    "http_response_size_bytes": ("histogram", "Response body size.", ("method", "route"), SIZE_BUCKETS),
+    "db_queries_total": ("counter", "SQL statements executed.", ("method", "route"), None),
+    "db_duration_seconds": ("histogram", "Time spent in SQL per request.", ("method", "route"), LATENCY_BUCKETS),
+    "admission_in_flight": ("gauge", "Requests holding an admission slot.", ("limit",), None),
+    "admission_queue_depth": ("gauge", "Requests waiting for an admission slot.", ("limit",), None),
+    "admission_wait_seconds": ("histogram", "Time queued for an admission slot.", ("limit",), LATENCY_BUCKETS),
+    "admission_rejected_total": (
+        "counter",
+        "Requests shed with 503, by reason (queue_full or timeout).",
+        ("limit", "reason"),
+        None,
+    ),
+    "pdf_render_duration_seconds": ("histogram", "Time to render one PDF in the export pool.", (), LATENCY_BUCKETS),
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pares = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metrics:
+    def __init__(self, directory: Path | None, flush_interval: float):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        # name -> {labels tuple -> value}; histograms store [bucket counts..., +Inf count, sum].
+        self._values: dict[str, dict[tuple, float | list[float]]] = {name: {} for name in DEFINITIONS}
+        self._lock = threading.Lock()
+        self._started = time.time_ns()
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1) -> None:
+        with self._lock:
+            serie = self._values[name]
+            serie[labels] = serie.get(labels, 0) + value
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        buckets = DEFINITIONS[name][3]
+        with self._lock:
+            serie = self._values[name]
+            datos = serie.get(labels)
+            if datos is None:
+                datos = serie[labels] = [0] * (len(buckets) + 2)
+            # Non-cumulative counts per bucket; rendering accumulates them.
+            datos[bisect.bisect_left(buckets, value)] += 1
+            datos[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: [
+                    [list(labels), list(value) if isinstance(value, list) else value] for labels, value in serie.items()
+                ]
+                for name, serie in self._values.items()
+            }
+
+    def flush(self) -> None:
+        """Write this process' snapshot for the other workers. Blocking."""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self._snapshot_name()}.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, path)
+
+    async def flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await run_in_threadpool(self.flush)
+
+    def _snapshot_name(self) -> str:
+        return f"{os.getppid()}-{os.getpid()}-{self._started}"
+
+    def _snapshots(self) -> list[tuple[bool, dict]]:
+        """(alive, snapshot) for this process and every other worker of this boot that wrote one."""
+        snapshots = [(True, self.snapshot())]
+        if self.directory is None or not self.directory.exists():
+            return snapshots
+        boot, propio = os.getppid(), self._snapshot_name()
+        # A live worker rewrites its snapshot every flush_interval.
+        vigente = time.time() - 3 * self.flush_interval
+        for path in self.directory.glob("*.json"):
+            partes = path.stem.split("-")
+            if len(partes) != 3 or not all(parte.isdigit() for parte in partes) or path.stem == propio:
+                continue
+            if int(partes[0]) != boot:
+                if not _alive(int(partes[0])):
+                    path.unlink(missing_ok=True)
+                continue
+            try:
+                snapshot = json.loads(path.read_text())
+                alive = _alive(int(partes[1])) and path.stat().st_mtime >= vigente
+            except (OSError, ValueError):
+                continue
+            snapshots.append((alive, snapshot))
+        return snapshots
+
+    def collect(self) -> dict[str, dict[tuple, float | list[float]]]:
+        merged: dict[str, dict[tuple, float | list[float]]] = {name: {} for name in DEFINITIONS}
+        for alive, snapshot in self._snapshots():
+            for name, series in snapshot.items():
+                if name not in merged or (DEFINITIONS[name][0] == "gauge" and not alive):
+                    continue
+                destino = merged[name]
+                for labels, value in series:
+                    key = tuple(labels)
+                    if isinstance(value, list):
+                        actual = destino.setdefault(key, [0] * len(value))
+                        for index, count in enumerate(value):
+                            actual[index] += count
+                    else:
+                        destino[key] = destino.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        """All metrics, merged across workers, in Prometheus text exposition format."""
+        lines = []
+        for name, series in self.collect().items():
+            kind, help_text, label_names, buckets = DEFINITIONS[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series.items()):
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(label_names, labels)} {_format(value)}")
+                    continue
+                acumulado = 0
+                for limite, count in zip((*buckets, "+Inf"), value[:-1]):
+                    acumulado += count
+                    le = f'le="{limite}"'
+                    lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {_format(acumulado)}")
+                lines.append(f"{name}_sum{_labels(label_names, labels)} {_format(value[-1])}")
+                lines.append(f"{name}_count{_labels(label_names, labels)} {_format(acumulado)}")
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user.
+        pass
+    return True
+
+
+def route_template(app, scope: dict) -> str:
+    """Path template of the route that will handle ``scope`` (``/api/rutinas/{rutina_id}``)."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return UNMATCHED
+
+
+class MetricsMiddleware:
+    """Record count, status, latency, size, in-flight and DB time for every HTTP request."""
+
+    def __init__(self, app, metrics: Metrics, routes_app=None, long_lived_routes: frozenset[str] = frozenset()):
+        self.app = app
+        self.metrics = metrics
+        # The FastAPI app whose routes are matched; middleware wrap it, so it is passed explicitly.
+        self.routes_app = routes_app
+        # Streams held open for as long as the client listens (SSE): counted, but kept out of the latency,
+        # size and in-flight series, which they would swamp.
+        self.long_lived_routes = long_lived_routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = (scope["method"], route_template(self.routes_app, scope))
+        started = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_counting(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        if labels[1] in self.long_lived_routes:
+            try:
+                await self.app(scope, receive, send_counting)
+            finally:
+                self.metrics.inc("http_requests_total", (*labels, str(status_code)))
+            return
+
+        self.metrics.inc("http_requests_in_flight", labels)
+        try:
+            await self.app(scope, receive, send_counting)
+        finally:
+            self.metrics.inc("http_requests_in_flight", labels, -1)
+            self.metrics.inc("http_requests_total", (*labels, str(status_code)))
+            self.metrics.observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+            self.metrics.observe("http_response_size_bytes", labels, size)
+            stats = current_query_stats()
+            if stats is not None:
+                self.metrics.inc("db_queries_total", labels, stats.count)
+                self.metrics.observe("db_duration_seconds", labels, stats.seconds)
+
+
+metrics = Metrics(
+    Path(settings.metrics_dir) if settings.metrics_dir else None,
+    flush_interval=settings.metrics_flush_interval,
+)
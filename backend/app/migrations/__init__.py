@@ -0,0 +1,93 @@
+"""Versioned schema migrations.
+
+Every ``mNNNN_<nombre>.py`` module in this package defines ``upgrade(connection)``
+and runs once, in version order; applied versions are recorded in the
+``schema_migrations`` table. The API only checks the version at startup (see
+``app.database.ensure_schema``). Migrations are applied with
+
+    python -m app.migrations upgrade
+"""
+
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+from typing import NamedTuple
+
+import sqlalchemy as sa
+
+MODULE_NAME = re.compile(r"^m(\d{4})_(\w+)$")
+
+
+class Migration(NamedTuple):
+    version: int
+    nombre: str
+    modulo: str
+
+
+class SchemaOutdated(RuntimeError):
+    """The database is behind the migrations this code expects."""
+
+
+def _discover() -> list[Migration]:
+    encontradas = []
+    for info in pkgutil.iter_modules(__path__):
+        if match := MODULE_NAME.match(info.name):
+            encontradas.append(Migration(int(match.group(1)), match.group(2), f"{__name__}.{info.name}"))
+    return sorted(encontradas)
+
+
+MIGRATIONS = _discover()
+LATEST_VERSION = MIGRATIONS[-1].version if MIGRATIONS else 0
+
+_metadata = sa.MetaData()
+schema_migrations = sa.Table(
+    "schema_migrations",
+    _metadata,
+    sa.Column("version", sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column("nombre", sa.String(200), nullable=False),
+    sa.Column("aplicada", sa.DateTime, nullable=False),
+)
+
+
+def current_version(connection) -> int:
+    if not sa.inspect(connection).has_table("schema_migrations"):
+        return 0
+    return connection.execute(sa.select(sa.func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def pending(connection) -> list[Migration]:
+    actual = current_version(connection)
+    return [migration for migration in MIGRATIONS if migration.version > actual]
+
+
+def upgrade(connection, target: int | None = None) -> list[Migration]:
+    """Apply pending migrations up to ``target`` in the caller's transaction; return the ones applied.
+
+    Two processes upgrading at once collide on the ``schema_migrations`` primary
+    key, so the loser rolls back instead of applying a step twice.
+    """
+    _metadata.create_all(connection, checkfirst=True)
+    aplicadas = []
+    for migration in pending(connection):
+        if target is not None and migration.version > target:
+            break
+        importlib.import_module(migration.modulo).upgrade(connection)
+        connection.execute(
+            sa.insert(schema_migrations).values(
+                version=migration.version, nombre=migration.nombre, aplicada=datetime.utcnow()
+            )
+        )
+        aplicadas.append(migration)
+    return aplicadas
+
+
+def check(connection) -> int:
+    """Return the schema version, or raise ``SchemaOutdated`` if migrations are pending."""
+    version = current_version(connection)
+    if version < LATEST_VERSION:
+        raise SchemaOutdated(
+            f"La base está en la versión {version} del esquema y se requiere la {LATEST_VERSION}; "
+            "ejecute: python -m app.migrations upgrade"
+        )
+    return version
@@ -0,0 +1,52 @@
+"""Migration CLI.
+
+    python -m app.migrations upgrade [--version N]   apply pending migrations
+    python -m app.migrations status                  current version and pending steps
+    python -m app.migrations explain                 check the hot queries use their indexes
+"""
+
+import argparse
+import sys
+
+from app.database import engine
+from app.migrations import LATEST_VERSION, current_version, pending, upgrade
+from app.migrations.plans import check_plans
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    subir = comandos.add_parser("upgrade", help="aplica las migraciones pendientes")
+    subir.add_argument("--version", type=int, help="versión final (por defecto, la última)")
+    comandos.add_parser("status", help="muestra la versión actual y las migraciones pendientes")
+    comandos.add_parser("explain", help="verifica con EXPLAIN que las consultas frecuentes usan índices")
+    args = parser.parse_args()
+
+    if args.comando == "upgrade":
+        with engine.begin() as connection:
+            aplicadas = upgrade(connection, args.version)
+            version = current_version(connection)
+        for migration in aplicadas:
+            print(f"Aplicada {migration.version:04d} {migration.nombre}")
+        print(f"Esquema en la versión {version}")
+    elif args.comando == "status":
+        with engine.connect() as connection:
+            version = current_version(connection)
+            pendientes = pending(connection)
+        print(f"Versión actual: {version} (última: {LATEST_VERSION})")
+        for migration in pendientes:
+            print(f"Pendiente {migration.version:04d} {migration.nombre}")
+    else:
+        # Never committed: EXPLAIN changes nothing and SET LOCAL must not outlive the check.
+        with engine.connect() as connection:
+            resultados = check_plans(connection)
+        for resultado in resultados:
+            print(f"{'OK   ' if resultado.ok else 'FALLA'} {resultado.nombre}: {resultado.indice}")
+            if not resultado.ok:
+                print("      " + resultado.plan.replace("\n", "\n      "))
+        if not all(resultado.ok for resultado in resultados):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
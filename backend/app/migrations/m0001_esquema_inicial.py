@@ -0,0 +1,48 @@
+"""Initial schema: rutina, ejercicio, plansemanal and the search indexes.
+
+Tables are declared here rather than taken from ``app.models`` so this step
+keeps creating the same schema after the models change. Existing databases
+created before migrations existed are left untouched (``checkfirst``).
+"""
+
+import sqlalchemy as sa
+
+from app.search import get_search_backend
+
+metadata = sa.MetaData()
+dia_semana = sa.Enum("LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO", name="diasemana")
+
+sa.Table(
+    "rutina",
+    metadata,
+    sa.Column("nombre", sa.String(200), nullable=False, unique=True),
+    sa.Column("descripcion", sa.String(1000)),
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("fecha_creacion", sa.DateTime, nullable=False),
+)
+sa.Table(
+    "ejercicio",
+    metadata,
+    sa.Column("nombre", sa.String(200), nullable=False),
+    sa.Column("dia_semana", dia_semana, nullable=False),
+    sa.Column("series", sa.Integer, nullable=False),
+    sa.Column("repeticiones", sa.Integer, nullable=False),
+    sa.Column("peso", sa.Float),
+    sa.Column("notas", sa.String(500)),
+    sa.Column("orden", sa.Integer),
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("rutina_id", sa.Integer, sa.ForeignKey("rutina.id", ondelete="CASCADE"), nullable=False),
+)
+sa.Table(
+    "plansemanal",
+    metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("dia_semana", dia_semana, nullable=False),
+    sa.Column("rutina_id", sa.Integer, sa.ForeignKey("rutina.id"), nullable=False),
+    sa.Index("ix_plansemanal_dia_semana", "dia_semana", unique=True),
+)
+
+
+def upgrade(connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
+    get_search_backend(connection.dialect.name).install(connection)
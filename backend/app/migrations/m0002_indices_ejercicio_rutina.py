@@ -0,0 +1,17 @@
+"""Indexes for the hot paths.
+
+``ix_ejercicio_rutina_dia_orden`` serves every load of a routine's exercises
+(detail, reorder, selectinload), the per-routine exercise count of the list
+and the ``dia_semana`` filter; its leading column also covers plain
+``rutina_id`` lookups and the ON DELETE CASCADE. ``ix_rutina_nombre_lower``
+serves case-insensitive lookups by name.
+"""
+
+from sqlalchemy import text
+
+
+def upgrade(connection) -> None:
+    connection.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_ejercicio_rutina_dia_orden ON ejercicio (rutina_id, dia_semana, orden)")
+    )
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_rutina_nombre_lower ON rutina (lower(nombre))"))
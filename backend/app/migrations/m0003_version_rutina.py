@@ -0,0 +1,11 @@
+"""``rutina.version``: optimistic-lock counter for the exercise order.
+
+Every reorder increments it and a reorder sent with an older version is
+rejected with 409 (see ``reordenar_ejercicios``).
+"""
+
+from sqlalchemy import text
+
+
+def upgrade(connection) -> None:
+    connection.execute(text("ALTER TABLE rutina ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
@@ -0,0 +1,96 @@
+"""Stored exercise counters on ``rutina``, kept exact by triggers.
+
+``total_ejercicios`` and one ``ejercicios_<dia>`` column per weekday. Triggers
+on ``ejercicio`` maintain them, so every write path is covered: ORM writes,
+``INSERT ... SELECT`` copies, executemany batches and ``COPY`` imports.
+SQLite gets row triggers. PostgreSQL gets statement triggers over transition
+tables, so a bulk load costs one UPDATE per statement instead of one per row.
+Existing rows are backfilled here; ``python -m app.contadores`` repairs drift
+later.
+
+``ix_rutina_total_ejercicios`` serves ordering and filtering by exercise count.
+"""
+
+from sqlalchemy import text
+
+# Enum member names, as stored in ejercicio.dia_semana.
+DIAS = ("LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO")
+COLUMNAS = ("total_ejercicios", *(f"ejercicios_{dia.lower()}" for dia in DIAS))
+
+
+def _sqlite_ajuste(fila: str, signo: str) -> str:
+    """UPDATE adding (``+``) or removing (``-``) the ``new``/``old`` exercise from its routine's counters."""
+    dias = ", ".join(
+        f"ejercicios_{dia.lower()} = ejercicios_{dia.lower()} {signo} ({fila}.dia_semana = '{dia}')" for dia in DIAS
+    )
+    return f"UPDATE rutina SET total_ejercicios = total_ejercicios {signo} 1, {dias} WHERE id = {fila}.rutina_id;"
+
+
+SQLITE = (
+    "CREATE TRIGGER IF NOT EXISTS ejercicio_contadores_ai AFTER INSERT ON ejercicio BEGIN "
+    f"{_sqlite_ajuste('new', '+')} END",
+    "CREATE TRIGGER IF NOT EXISTS ejercicio_contadores_ad AFTER DELETE ON ejercicio BEGIN "
+    f"{_sqlite_ajuste('old', '-')} END",
+    "CREATE TRIGGER IF NOT EXISTS ejercicio_contadores_au AFTER UPDATE OF dia_semana, rutina_id ON ejercicio "
+    "WHEN old.dia_semana IS NOT new.dia_semana OR old.rutina_id IS NOT new.rutina_id BEGIN "
+    f"{_sqlite_ajuste('old', '-')} {_sqlite_ajuste('new', '+')} END",
+)
+
+
+def _postgres_funcion(nombre: str, cambios: str) -> str:
+    """Statement-trigger function applying the net per-routine delta of ``cambios`` (rutina_id, dia_semana, signo)."""
+    sumas = ", ".join(
+        f"sum(CASE WHEN dia_semana = '{dia}' THEN signo ELSE 0 END) AS ejercicios_{dia.lower()}" for dia in DIAS
+    )
+    asignaciones = ", ".join(f"{columna} = r.{columna} + d.{columna}" for columna in COLUMNAS)
+    distinto = " OR ".join(f"d.{columna} <> 0" for columna in COLUMNAS)
+    return (
+        f"CREATE OR REPLACE FUNCTION {nombre}() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        f"UPDATE rutina AS r SET {asignaciones} "
+        f"FROM (SELECT rutina_id, sum(signo) AS total_ejercicios, {sumas} FROM ({cambios}) AS cambios "
+        "GROUP BY rutina_id) AS d "
+        # Reorders and edits that keep day and routine net to zero and touch no routine.
+        f"WHERE r.id = d.rutina_id AND ({distinto}); "
+        "RETURN NULL; END $$"
+    )
+
+
+NUEVOS = "SELECT rutina_id, dia_semana, 1 AS signo FROM nuevos"
+VIEJOS = "SELECT rutina_id, dia_semana, -1 AS signo FROM viejos"
+
+POSTGRES = (
+    _postgres_funcion("ejercicio_contadores_insert", NUEVOS),
+    _postgres_funcion("ejercicio_contadores_delete", VIEJOS),
+    _postgres_funcion("ejercicio_contadores_update", f"{NUEVOS} UNION ALL {VIEJOS}"),
+    "CREATE TRIGGER ejercicio_contadores_insert AFTER INSERT ON ejercicio "
+    "REFERENCING NEW TABLE AS nuevos FOR EACH STATEMENT EXECUTE FUNCTION ejercicio_contadores_insert()",
+    "CREATE TRIGGER ejercicio_contadores_delete AFTER DELETE ON ejercicio "
+    "REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION ejercicio_contadores_delete()",
+    # Transition tables rule out an "UPDATE OF" column list; the function skips zero deltas instead.
+    "CREATE TRIGGER ejercicio_contadores_update AFTER UPDATE ON ejercicio "
+    "REFERENCING OLD TABLE AS viejos NEW TABLE AS nuevos FOR EACH STATEMENT "
+    "EXECUTE FUNCTION ejercicio_contadores_update()",
+)
+
+
+def upgrade(connection) -> None:
+    for columna in COLUMNAS:
+        connection.execute(text(f"ALTER TABLE rutina ADD COLUMN {columna} INTEGER NOT NULL DEFAULT 0"))
+
+    conteos = ", ".join(
+        f"ejercicios_{dia.lower()} = (SELECT count(*) FROM ejercicio "
+        f"WHERE ejercicio.rutina_id = rutina.id AND ejercicio.dia_semana = '{dia}')"
+        for dia in DIAS
+    )
+    connection.execute(
+        text(
+            "UPDATE rutina SET total_ejercicios = "
+            f"(SELECT count(*) FROM ejercicio WHERE ejercicio.rutina_id = rutina.id), {conteos}"
+        )
+    )
+
+    for statement in POSTGRES if connection.dialect.name == "postgresql" else SQLITE:
+        connection.execute(text(statement))
+    connection.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_rutina_total_ejercicios ON rutina (total_ejercicios DESC, id)")
+    )
@@ -0,0 +1,79 @@
+"""Change tracking for ``GET /api/sync``: ``fecha_modificacion`` and tombstones.
+
+``rutina``, ``ejercicio`` and ``plansemanal`` get ``fecha_modificacion``,
+stamped by triggers on every insert and update with the database clock in
+UTC, and an index on ``(fecha_modificacion, id)``. Deleting one of those rows
+records it in ``eliminacion``. Like the counters of 0004, triggers cover every
+write path, and the counters bumping ``rutina`` also stamp it.
+
+SQLite cannot add a column with a non-constant default, so there an AFTER
+INSERT trigger stamps new rows. Timestamps keep six decimals, the format
+SQLAlchemy binds, because SQLite compares them as text.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import text
+
+TABLAS = ("rutina", "ejercicio", "plansemanal")
+
+SQLITE_AHORA = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+POSTGRES_AHORA = "(clock_timestamp() AT TIME ZONE 'UTC')"
+
+metadata = sa.MetaData()
+sa.Table(
+    "eliminacion",
+    metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("tabla", sa.String(20), nullable=False),
+    sa.Column("fila_id", sa.Integer, nullable=False),
+    sa.Column("fecha_eliminacion", sa.DateTime, nullable=False),
+    sa.Index("ix_eliminacion_fecha", "fecha_eliminacion", "id"),
+)
+
+
+def _sqlite(tabla: str) -> tuple[str, ...]:
+    return (
+        f"ALTER TABLE {tabla} ADD COLUMN fecha_modificacion DATETIME",
+        f"UPDATE {tabla} SET fecha_modificacion = {SQLITE_AHORA}",
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_modificacion_ai AFTER INSERT ON {tabla} BEGIN "
+        f"UPDATE {tabla} SET fecha_modificacion = {SQLITE_AHORA} WHERE id = new.id; END",
+        # The guard skips the trigger's own UPDATE and any write that sets the column explicitly.
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_modificacion_au AFTER UPDATE ON {tabla} "
+        "WHEN new.fecha_modificacion IS old.fecha_modificacion BEGIN "
+        f"UPDATE {tabla} SET fecha_modificacion = {SQLITE_AHORA} WHERE id = new.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_eliminacion_ad AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO eliminacion (tabla, fila_id, fecha_eliminacion) VALUES ('{tabla}', old.id, {SQLITE_AHORA}); END",
+    )
+
+
+POSTGRES_FUNCIONES = (
+    "CREATE OR REPLACE FUNCTION marcar_modificacion() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"NEW.fecha_modificacion := {POSTGRES_AHORA}; RETURN NEW; END $$",
+    "CREATE OR REPLACE FUNCTION registrar_eliminacion() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    "INSERT INTO eliminacion (tabla, fila_id, fecha_eliminacion) "
+    f"SELECT TG_TABLE_NAME, id, {POSTGRES_AHORA} FROM viejos; RETURN NULL; END $$",
+)
+
+
+def _postgres(tabla: str) -> tuple[str, ...]:
+    return (
+        f"ALTER TABLE {tabla} ADD COLUMN fecha_modificacion TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC')",
+        f"CREATE TRIGGER {tabla}_modificacion BEFORE INSERT OR UPDATE ON {tabla} "
+        "FOR EACH ROW EXECUTE FUNCTION marcar_modificacion()",
+        f"CREATE TRIGGER {tabla}_eliminacion AFTER DELETE ON {tabla} "
+        "REFERENCING OLD TABLE AS viejos FOR EACH STATEMENT EXECUTE FUNCTION registrar_eliminacion()",
+    )
+
+
+def upgrade(connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
+    if connection.dialect.name == "postgresql":
+        statements = [*POSTGRES_FUNCIONES, *(statement for tabla in TABLAS for statement in _postgres(tabla))]
+    else:
+        statements = [statement for tabla in TABLAS for statement in _sqlite(tabla)]
+    for statement in statements:
+        connection.execute(text(statement))
+    for tabla in TABLAS:
+        connection.execute(
+            text(f"CREATE INDEX IF NOT EXISTS ix_{tabla}_fecha_modificacion ON {tabla} (fecha_modificacion, id)")
+        )
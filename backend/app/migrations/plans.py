@@ -0,0 +1,99 @@
+"""EXPLAIN checks proving the hot queries use the indexes created by the migrations.
+
+Each check compiles a statement shaped like the one the routers issue and
+asserts the planner picks the expected index. On PostgreSQL sequential scans
+are disabled for the check, since on small tables the planner would rightly
+prefer them.
+"""
+
+import json
+from typing import NamedTuple
+
+from datetime import datetime
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.sql import Select
+
+from app.models import DiaSemana, Ejercicio, Eliminacion, Rutina
+
+IX_EJERCICIO = "ix_ejercicio_rutina_dia_orden"
+IX_NOMBRE = "ix_rutina_nombre_lower"
+IX_TOTAL = "ix_rutina_total_ejercicios"
+DESDE = (datetime(2024, 1, 1), 0)
+
+
+class PlanCheck(NamedTuple):
+    nombre: str
+    indice: str
+    ok: bool
+    plan: str
+
+
+HOT_QUERIES: dict[str, tuple[Select, str]] = {
+    # selectinload(Rutina.ejercicios): detail, reorder, plan expand.
+    "ejercicios_de_rutina": (
+        select(Ejercicio).where(Ejercicio.rutina_id.in_([1, 2])).order_by(Ejercicio.orden),
+        IX_EJERCICIO,
+    ),
+    # ?orden=ejercicios and ?min_ejercicios= of the list endpoint.
+    "orden_por_ejercicios": (
+        select(Rutina.id).order_by(Rutina.total_ejercicios.desc(), Rutina.id).limit(100),
+        IX_TOTAL,
+    ),
+    "filtro_min_ejercicios": (select(Rutina.id).where(Rutina.total_ejercicios >= 30), IX_TOTAL),
+    # ?dia_semana= together with ?ejercicio_nombre= (Rutina.ejercicios.any(...)).
+    "filtro_dia": (
+        select(Ejercicio.id).where(Ejercicio.rutina_id == 1, Ejercicio.dia_semana == DiaSemana.LUNES),
+        IX_EJERCICIO,
+    ),
+    # GET /api/sync: one keyset range per source (ejercicio and plansemanal are read the same way).
+    "sync_rutinas": (
+        select(Rutina.id)
+        .where(tuple_(Rutina.fecha_modificacion, Rutina.id) > tuple_(*DESDE))
+        .order_by(Rutina.fecha_modificacion, Rutina.id)
+        .limit(500),
+        "ix_rutina_fecha_modificacion",
+    ),
+    "sync_eliminaciones": (
+        select(Eliminacion.id)
+        .where(tuple_(Eliminacion.fecha_eliminacion, Eliminacion.id) > tuple_(*DESDE))
+        .order_by(Eliminacion.fecha_eliminacion, Eliminacion.id)
+        .limit(500),
+        "ix_eliminacion_fecha",
+    ),
+    "nombre_sin_mayusculas": (select(Rutina.id).where(func.lower(Rutina.nombre) == "fuerza"), IX_NOMBRE),
+}
+
+
+def _sql(connection, statement: Select) -> str:
+    return str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _sqlite_plan(connection, sql: str) -> tuple[str, set[str]]:
+    filas = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    detalle = "\n".join(fila[-1] for fila in filas)
+    indices = {palabra for fila in filas for palabra in fila[-1].split() if palabra.startswith("ix_")}
+    return detalle, indices
+
+
+def _postgres_plan(connection, sql: str) -> tuple[str, set[str]]:
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    indices = set()
+    pendientes = [plan[0]["Plan"]]
+    while pendientes:
+        nodo = pendientes.pop()
+        if "Index Name" in nodo:
+            indices.add(nodo["Index Name"])
+        pendientes.extend(nodo.get("Plans", []))
+    return json.dumps(plan, indent=2), indices
+
+
+def check_plans(connection) -> list[PlanCheck]:
+    explicar = _postgres_plan if connection.dialect.name == "postgresql" else _sqlite_plan
+    resultados = []
+    for nombre, (statement, indice) in HOT_QUERIES.items():
+        plan, indices = explicar(connection, _sql(connection, statement))
+        resultados.append(PlanCheck(nombre, indice, indice in indices, plan))
+    return resultados
@@ -1,7 +1,8 @@
 from enum import Enum
-from typing import List, Optional
+from typing import Annotated, List, Literal, Optional, Union
 from datetime import datetime
 
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 
 
@@ -26,8 +27,16 @@ class EjercicioBase(SQLModel):
 
 
 class Ejercicio(EjercicioBase, table=True):
+    # Created by migrations (app/migrations); declared here to keep the metadata accurate.
+    __table_args__ = (
+        Index("ix_ejercicio_rutina_dia_orden", "rutina_id", "dia_semana", "orden"),
+        Index("ix_ejercicio_fecha_modificacion", "fecha_modificacion", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     rutina_id: int = Field(foreign_key="rutina.id", ondelete="CASCADE")
+    # Stamped by triggers (m0005) on every insert and update; never written by the app.
+    fecha_modificacion: Optional[datetime] = None
 
     rutina: Optional["Rutina"] = Relationship(back_populates="ejercicios")
 
@@ -51,17 +60,72 @@ class EjercicioUpdate(SQLModel):
     orden: Optional[int] = Field(default=None, ge=0)
 
 
+class EjercicioBatchCreate(EjercicioCreate):
+    op: Literal["create"]
+    rutina_id: int
+
+
+class EjercicioBatchUpdate(EjercicioUpdate):
+    op: Literal["update"]
+    id: int
+
+
+class EjercicioBatchDelete(SQLModel):
+    op: Literal["delete"]
+    id: int
+
+
+EjercicioBatchOperacion = Annotated[
+    Union[EjercicioBatchCreate, EjercicioBatchUpdate, EjercicioBatchDelete], Field(discriminator="op")
+]
+
+
+class EjercicioBatchRequest(SQLModel):
+    operaciones: List[EjercicioBatchOperacion] = Field(min_length=1, max_length=1000)
+
+
+class EjercicioBatchResultado(SQLModel):
+    indice: int
+    op: str
+    id: Optional[int] = None
+    ejercicio: Optional[EjercicioRead] = None
+
+
+class EjercicioBatchResponse(SQLModel):
+    resultados: List[EjercicioBatchResultado]
+
+
 class RutinaBase(SQLModel):
     nombre: str = Field(min_length=1, max_length=200, unique=True)
     descripcion: Optional[str] = Field(default=None, max_length=1000)
 
 
 class Rutina(RutinaBase, table=True):
+    __table_args__ = (
+        Index("ix_rutina_nombre_lower", text("lower(nombre)")),
+        Index("ix_rutina_total_ejercicios", text("total_ejercicios DESC"), "id"),
+        Index("ix_rutina_fecha_modificacion", "fecha_modificacion", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
+    # Incremented by every reorder; a reorder sent with an older version gets 409.
+    version: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
+    # Exercise counters, maintained by triggers on ejercicio (m0004); never written by the app.
+    total_ejercicios: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    ejercicios_lunes: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    ejercicios_martes: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    ejercicios_miercoles: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    ejercicios_jueves: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    ejercicios_viernes: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    ejercicios_sabado: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    ejercicios_domingo: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    # Stamped by triggers (m0005) on every insert and update, counter changes included.
+    fecha_modificacion: Optional[datetime] = None
 
     ejercicios: List[Ejercicio] = Relationship(
-        back_populates="rutina", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        back_populates="rutina",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan", "order_by": "Ejercicio.orden"},
     )
 
 
@@ -72,6 +136,7 @@ class RutinaCreate(RutinaBase):
 class RutinaRead(RutinaBase):
     id: int
     fecha_creacion: datetime
+    version: int
     ejercicios: List[EjercicioRead] = Field(default_factory=list)
 
 
@@ -90,15 +155,19 @@ class RutinaList(SQLModel):
 
 class RutinaListResponse(SQLModel):
     items: List[RutinaList]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 class PlanSemanal(SQLModel, table=True):
+    __table_args__ = (Index("ix_plansemanal_fecha_modificacion", "fecha_modificacion", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     dia_semana: DiaSemana = Field(unique=True, index=True)
     rutina_id: int = Field(foreign_key="rutina.id")
+    fecha_modificacion: Optional[datetime] = None
 
     rutina: Optional[Rutina] = Relationship()
 
@@ -109,6 +178,85 @@ class PlanDiaRead(SQLModel):
     rutina_nombre: Optional[str] = None
 
 
+class PlanDiaDetalle(PlanDiaRead):
+    rutina: Optional[RutinaRead] = None
+
+
 class PlanDiaUpdate(SQLModel):
     dia_semana: DiaSemana
-    rutina_id: int
\ No newline at end of file
+    rutina_id: int
+
+
+class Eliminacion(SQLModel, table=True):
+    """Tombstone of a deleted routine, exercise or plan entry, written by triggers (m0005)."""
+
+    __table_args__ = (Index("ix_eliminacion_fecha", "fecha_eliminacion", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tabla: str = Field(max_length=20)
+    fila_id: int
+    fecha_eliminacion: datetime
+
+
+class RutinaSync(RutinaBase):
+    id: int
+    fecha_creacion: datetime
+    version: int
+    total_ejercicios: int
+    fecha_modificacion: datetime
+
+
+class EjercicioSync(EjercicioRead):
+    fecha_modificacion: datetime
+
+
+class PlanSync(SQLModel):
+    id: int
+    dia_semana: DiaSemana
+    rutina_id: int
+    fecha_modificacion: datetime
+
+
+class SyncEliminados(SQLModel):
+    rutinas: List[int] = Field(default_factory=list)
+    ejercicios: List[int] = Field(default_factory=list)
+    plan: List[int] = Field(default_factory=list)
+
+
+class SyncResponse(SQLModel):
+    rutinas: List[RutinaSync]
+    ejercicios: List[EjercicioSync]
+    plan: List[PlanSync]
+    eliminados: SyncEliminados
+    cursor: str
+    hay_mas: bool
+
+
+class ExportacionCreate(SQLModel):
+    rutina_ids: Optional[List[int]] = None
+    plan_semanal: bool = False
+    formato: Literal["zip", "pdf"] = "zip"
+
+
+class ExportacionRead(SQLModel):
+    id: str
+    estado: str
+    formato: str
+    total: int
+    completadas: int
+    creado: datetime
+    error: Optional[str] = None
+
+
+class ImportacionError(SQLModel):
+    linea: int
+    error: str
+
+
+class ImportacionResumen(SQLModel):
+    insertadas: int = 0
+    actualizadas: int = 0
+    omitidas: int = 0
+    fallidas: int = 0
+    ejercicios: int = 0
+    errores: List[ImportacionError] = Field(default_factory=list)
@@ -0,0 +1,89 @@
+"""PDF rendering for routines.
+
+Rendering works on plain dicts (see ``rutina_a_datos``) so it can run in a
+worker process: this module must stay importable without a database.
+"""
+
+from fpdf import FPDF
+
+DIAS_ORDEN = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+
+def rutina_a_datos(rutina) -> dict:
+    """Snapshot a loaded ``Rutina`` (with ``ejercicios``) into picklable data."""
+    return {
+        "id": rutina.id,
+        "nombre": rutina.nombre,
+        "descripcion": rutina.descripcion,
+        "ejercicios": [
+            {
+                "nombre": ejercicio.nombre,
+                "dia_semana": ejercicio.dia_semana.value,
+                "series": ejercicio.series,
+                "repeticiones": ejercicio.repeticiones,
+                "peso": ejercicio.peso,
+                "notas": ejercicio.notas,
+                "orden": ejercicio.orden,
+            }
+            for ejercicio in rutina.ejercicios
+        ],
+    }
+
+
+def _wrap_long_text(text: str, max_chunk: int = 60) -> str:
+    """Ensure there are breakpoints to avoid FPDF 'Not enough horizontal space'."""
+    if len(text) <= max_chunk:
+        return text
+    parts = []
+    for i in range(0, len(text), max_chunk):
+        parts.append(text[i : i + max_chunk])
+    return " ".join(parts)
+
+
+def _ordenar_por_dia(ejercicios: list[dict]) -> list[dict]:
+    return sorted(ejercicios, key=lambda ejercicio: (DIAS_ORDEN.index(ejercicio["dia_semana"]), ejercicio["orden"] or 0))
+
+
+def _agregar_rutina(pdf: FPDF, rutina: dict) -> None:
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, rutina["nombre"], ln=1)
+    pdf.set_font("Arial", "", 11)
+    descr = _wrap_long_text(rutina["descripcion"] or "Sin descripción", max_chunk=60)
+    usable_width = pdf.w - pdf.l_margin - pdf.r_margin
+    pdf.multi_cell(usable_width, 8, descr)
+    pdf.ln(2)
+    pdf.set_font("Arial", "B", 11)
+    pdf.cell(0, 8, "Ejercicios", ln=1)
+    pdf.set_font("Arial", "", 10)
+    if rutina["ejercicios"]:
+        for ejercicio in _ordenar_por_dia(rutina["ejercicios"]):
+            line = f"{ejercicio['dia_semana']} · {ejercicio['nombre']} · {ejercicio['series']}x{ejercicio['repeticiones']}"
+            if ejercicio["peso"] is not None:
+                line += f" · Peso: {ejercicio['peso']}"
+            if ejercicio["orden"] is not None:
+                line += f" · Orden: {ejercicio['orden']}"
+            if ejercicio["notas"]:
+                line += f" · Notas: {ejercicio['notas']}"
+            safe_line = _wrap_long_text(line, max_chunk=50)
+            pdf.set_x(pdf.l_margin)
+            pdf.multi_cell(usable_width, 7, safe_line)
+    else:
+        pdf.cell(0, 7, "Sin ejercicios", ln=1)
+
+
+def render_rutinas(rutinas: list[dict]) -> bytes:
+    """Render one PDF with a section (starting on a new page) per routine."""
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    for rutina in rutinas:
+        _agregar_rutina(pdf, rutina)
+
+    pdf_bytes = pdf.output(dest="S")
+    if isinstance(pdf_bytes, str):
+        pdf_bytes = pdf_bytes.encode("latin-1")
+    return bytes(pdf_bytes)
+
+
+def render_rutina(rutina: dict) -> bytes:
+    return render_rutinas([rutina])
@@ -0,0 +1,181 @@
+"""Content-addressed cache for rendered routine PDFs.
+
+Keys are the SHA-256 of the routine snapshot (``rutina_a_datos``), so a routine
+whose name, description or ordered exercises changed never matches a stale
+entry. A small in-memory LRU sits over an on-disk directory; both tiers evict
+the least recently used files once they exceed their byte budget.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.config import settings
+
+
+def clave_pdf(datos: dict) -> str:
+    """Hash of a routine snapshot; identical data always renders the same PDF."""
+    contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+    def __init__(self, directory: Path | None, memory_max_bytes: int, disk_max_bytes: int):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        # Disk index (key -> size), built lazily from the directory listing.
+        self._disk: OrderedDict[str, int] | None = None
+        self._disk_bytes = 0
+        # Last key stored per routine, so writes can drop the superseded entry.
+        self._por_rutina: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+        self.last_render_seconds = 0.0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def _load_disk_index(self) -> OrderedDict[str, int]:
+        if self._disk is None:
+            self._disk = OrderedDict()
+            self._disk_bytes = 0
+            if self.directory is not None and self.directory.exists():
+                archivos = []
+                for path in self.directory.glob("*.pdf"):
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    archivos.append((stat.st_mtime, path.stem, stat.st_size))
+                for _, key, size in sorted(archivos):
+                    self._disk[key] = size
+                    self._disk_bytes += size
+        return self._disk
+
+    def _remember(self, key: str, body: bytes) -> None:
+        if len(body) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = body
+        self._memory_bytes += len(body)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _forget_disk(self, key: str) -> None:
+        size = self._load_disk_index().pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached PDF for ``key``. Blocking: disk reads happen here."""
+        with self._lock:
+            body = self._memory.get(key)
+            if body is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return body
+            disk = self._load_disk_index()
+            if key not in disk:
+                self.misses += 1
+                return None
+            try:
+                body = self._path(key).read_bytes()
+            except FileNotFoundError:
+                # Removed by another process sharing the directory.
+                self._disk_bytes -= disk.pop(key)
+                self.misses += 1
+                return None
+            disk.move_to_end(key)
+            os.utime(self._path(key))
+            self.disk_hits += 1
+            self._remember(key, body)
+            return body
+
+    def put(self, key: str, body: bytes, rutina_id: int | None = None, render_seconds: float = 0.0) -> None:
+        """Store a freshly rendered PDF in both tiers. Blocking."""
+        with self._lock:
+            self.renders += 1
+            self.render_seconds += render_seconds
+            self.last_render_seconds = render_seconds
+            if rutina_id is not None:
+                anterior = self._por_rutina.get(rutina_id)
+                if anterior is not None and anterior != key:
+                    self._drop(anterior)
+                self._por_rutina[rutina_id] = key
+            self._remember(key, body)
+            if self.directory is None or len(body) > self.disk_max_bytes:
+                return
+            disk = self._load_disk_index()
+            if key not in disk:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp = self._path(key).with_suffix(".tmp")
+                tmp.write_bytes(body)
+                os.replace(tmp, self._path(key))
+                disk[key] = len(body)
+                self._disk_bytes += len(body)
+            while self._disk_bytes > self.disk_max_bytes:
+                self._forget_disk(next(iter(disk)))
+
+    def _drop(self, key: str) -> None:
+        body = self._memory.pop(key, None)
+        if body is not None:
+            self._memory_bytes -= len(body)
+        if self.directory is not None:
+            self._forget_disk(key)
+
+    def invalidar(self, *rutina_ids: int) -> None:
+        """Drop the last PDF rendered for each routine (after it changed or was deleted)."""
+        with self._lock:
+            for rutina_id in rutina_ids:
+                key = self._por_rutina.pop(rutina_id, None)
+                if key is not None:
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._load_disk_index()):
+                self._forget_disk(key)
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._por_rutina.clear()
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk) if self._disk is not None else None,
+            "disk_bytes": self._disk_bytes if self._disk is not None else None,
+            "renders": self.renders,
+            "render_ms_avg": round(self.render_seconds / self.renders * 1000, 2) if self.renders else 0.0,
+            "render_ms_last": round(self.last_render_seconds * 1000, 2),
+        }
+
+
+pdf_cache = PdfCache(
+    Path(settings.pdf_cache_dir or Path(tempfile.gettempdir()) / "rutinas_pdf_cache")
+    if settings.pdf_cache_disk_max_bytes > 0
+    else None,
+    memory_max_bytes=settings.pdf_cache_memory_max_bytes,
+    disk_max_bytes=settings.pdf_cache_disk_max_bytes,
+)
@@ -0,0 +1,207 @@
+"""Read replicas for the read-only endpoints.
+
+``get_read_session`` opens a session on one of ``DATABASE_REPLICA_URLS``, in
+round robin. A replica that cannot be reached within
+``DB_REPLICA_CONNECT_TIMEOUT`` is skipped for ``DB_REPLICA_RETRY_SECONDS``,
+and the read falls back to the next healthy replica and finally to the
+primary. Without replicas every read goes to the primary.
+
+Replication is asynchronous, so a client could miss its own write when it
+reads it back. ``ReadYourWritesMiddleware`` sets a short-lived cookie on every
+successful write. Reads carrying that cookie go to the primary for
+``DB_REPLICA_STICKY_SECONDS``.
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+from app.database import async_engine, async_url, instrument_engine, pool_options, pool_status
+from app.search import configure_engine
+
+STICKY_COOKIE = "rutinas_primario"
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+logger = logging.getLogger("app.replicas")
+
+
+class ReadOnlySession(Session):
+    """Sync side of read sessions: refuses to flush ORM changes."""
+
+    def flush(self, objects=None) -> None:
+        if self.new or self.dirty or self.deleted:
+            raise RuntimeError("Read-only session; writes must use get_session")
+        super().flush(objects)
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = async_url(url)
+        self.engine = create_async_engine(self.url, echo=False, **pool_options(self.url, AsyncAdaptedQueuePool))
+        configure_engine(self.engine.sync_engine)
+        instrument_engine(self.engine.sync_engine)
+        self.down_until = 0.0
+        self.failures = 0
+        self.last_error: str | None = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    def status(self) -> dict:
+        return {
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "retry_in_seconds": round(max(self.down_until - time.monotonic(), 0.0), 3),
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "pool": pool_status(self.engine.pool),
+        }
+
+
+class ReplicaSet:
+    def __init__(self, urls: list[str], retry_seconds: float, connect_timeout: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.retry_seconds = retry_seconds
+        self.connect_timeout = connect_timeout
+        self._turno = itertools.count()
+        self.sticky_reads = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def _candidatas(self) -> list[Replica]:
+        """Healthy replicas, rotated so consecutive reads start on a different one."""
+        sanas = [replica for replica in self.replicas if replica.healthy]
+        if not sanas:
+            return []
+        inicio = next(self._turno) % len(sanas)
+        return sanas[inicio:] + sanas[:inicio]
+
+    def marcar_caida(self, replica: Replica, error: BaseException) -> None:
+        replica.down_until = time.monotonic() + self.retry_seconds
+        replica.failures += 1
+        # SQLAlchemy appends a "Background on this error" line; the first one is enough.
+        mensaje = str(error).partition("\n")[0]
+        replica.last_error = f"{type(error).__name__}: {mensaje}"[:300]
+        logger.warning(
+            "Replica %s skipped for %.0fs: %s", replica.status()["url"], self.retry_seconds, replica.last_error
+        )
+
+    @asynccontextmanager
+    async def session(self, primario: bool = False) -> AsyncIterator[AsyncSession]:
+        """Read-only session on a healthy replica; on the primary with ``primario`` or when none answers."""
+        if primario and self.enabled:
+            self.sticky_reads += 1
+        for replica in [] if primario else self._candidatas():
+            session = AsyncSession(replica.engine, expire_on_commit=False, sync_session_class=ReadOnlySession)
+            try:
+                # Check out the connection up front, so an unreachable replica falls back before any query runs.
+                await asyncio.wait_for(session.connection(), self.connect_timeout)
+            except (SQLAlchemyError, OSError, asyncio.TimeoutError) as error:
+                await session.close()
+                self.marcar_caida(replica, error)
+                continue
+            try:
+                yield session
+            except DBAPIError as error:
+                # Lost mid-request: this request fails, the following ones skip the replica.
+                if error.connection_invalidated:
+                    self.marcar_caida(replica, error)
+                raise
+            finally:
+                await session.close()
+            return
+
+        if self.enabled and not primario:
+            self.fallbacks += 1
+        async with AsyncSession(async_engine, expire_on_commit=False, sync_session_class=ReadOnlySession) as session:
+            yield session
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sticky_reads": self.sticky_reads,
+            "fallbacks": self.fallbacks,
+            "replicas": [replica.status() for replica in self.replicas],
+        }
+
+
+replicas = ReplicaSet(
+    settings.database_replica_urls,
+    retry_seconds=settings.db_replica_retry_seconds,
+    connect_timeout=settings.db_replica_connect_timeout,
+)
+
+
+def lee_del_primario(request: Request) -> bool:
+    """True while the client is inside the read-your-writes window of its last write."""
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_session(request: Request):
+    async with replicas.session(primario=lee_del_primario(request)) as session:
+        yield session
+
+
+class LecturaDiferida:
+    """Read session opened on first use, so a request answered from the response cache checks out no connection."""
+
+    def __init__(self, primario: bool, pila: AsyncExitStack):
+        self.primario = primario
+        self._pila = pila
+        self._session: AsyncSession | None = None
+
+    async def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = await self._pila.enter_async_context(replicas.session(primario=self.primario))
+        return self._session
+
+
+async def get_lazy_read_session(request: Request):
+    async with AsyncExitStack() as pila:
+        yield LecturaDiferida(lee_del_primario(request), pila)
+
+
+class ReadYourWritesMiddleware:
+    """Set the sticky cookie on successful writes, so the client's next reads go to the primary."""
+
+    def __init__(self, app, sticky_seconds: float):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS or not replicas.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_marking(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                hasta = time.time() + self.sticky_seconds
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{STICKY_COOKIE}={hasta:.3f}; Max-Age={math.ceil(self.sticky_seconds)}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_marking)
@@ -1,6 +1,9 @@
 from app.routers.ejercicios import router as ejercicios_router
+from app.routers.eventos import router as eventos_router
+from app.routers.exportaciones import router as exportaciones_router
 from app.routers.rutinas import router as rutinas_router
 from app.routers.plan import router as plan_router
+from app.routers.sync import router as sync_router
 
-__all__ = ["rutinas_router", "ejercicios_router", "plan_router"]
+__all__ = ["rutinas_router", "ejercicios_router", "plan_router", "exportaciones_router", "sync_router", "eventos_router"]
 
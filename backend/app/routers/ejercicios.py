@@ -1,15 +1,74 @@
+from collections import Counter
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
-from app.models import Ejercicio, EjercicioRead, EjercicioUpdate
+from app.cache import LISTAS, response_cache, rutina_tag
+from app.database import extend_query_budget, get_session, one_query_for_budget, query_budget
+from app.eventos import difusor
+from app.models import (
+    Ejercicio,
+    EjercicioBatchRequest,
+    EjercicioBatchResponse,
+    EjercicioRead,
+    EjercicioUpdate,
+    Rutina,
+)
+from app.pdf_cache import pdf_cache
+from app.serialization import ejercicio_dict, json_response
 
 router = APIRouter()
 
+CAMPOS_OBLIGATORIOS = ("nombre", "dia_semana", "series", "repeticiones")
+
+
+async def _validar_lote(session: AsyncSession, payload: EjercicioBatchRequest) -> dict[int, int]:
+    """Check every operation before touching any row; return ``{ejercicio_id: rutina_id}`` for the targets."""
+    operaciones = payload.operaciones
+    rutina_ids = {op.rutina_id for op in operaciones if op.op == "create"}
+    objetivo_ids = [op.id for op in operaciones if op.op != "create"]
+
+    rutinas_existentes = set()
+    if rutina_ids:
+        rutinas_existentes = set((await session.exec(select(Rutina.id).where(Rutina.id.in_(rutina_ids)))).all())
+    ejercicios_existentes: dict[int, int] = {}
+    if objetivo_ids:
+        filas = await session.exec(select(Ejercicio.id, Ejercicio.rutina_id).where(Ejercicio.id.in_(objetivo_ids)))
+        ejercicios_existentes = dict(filas.all())
+    repetidos = {ejercicio_id for ejercicio_id, veces in Counter(objetivo_ids).items() if veces > 1}
+
+    errores = []
+    for indice, op in enumerate(operaciones):
+        if op.op == "create":
+            if op.rutina_id not in rutinas_existentes:
+                errores.append({"indice": indice, "error": "Rutina no encontrada"})
+            continue
+        if op.id not in ejercicios_existentes:
+            errores.append({"indice": indice, "error": "Ejercicio no encontrado"})
+        elif op.id in repetidos:
+            errores.append({"indice": indice, "error": "El ejercicio aparece más de una vez en el lote"})
+        elif op.op == "update":
+            datos = _datos_update(op)
+            nulos = [campo for campo in CAMPOS_OBLIGATORIOS if campo in datos and datos[campo] is None]
+            if nulos:
+                errores.append({"indice": indice, "error": f"Campos obligatorios sin valor: {', '.join(nulos)}"})
+    if errores:
+        raise HTTPException(status_code=400, detail=errores)
+    return ejercicios_existentes
+
+
+def _datos_update(op) -> dict:
+    return op.model_dump(exclude_unset=True, exclude={"op", "id"})
 
-@router.put("/{ejercicio_id}", response_model=EjercicioRead)
-def actualizar_ejercicio(ejercicio_id: int, ejercicio_data: EjercicioUpdate, session: Session = Depends(get_session)):
-    ejercicio = session.get(Ejercicio, ejercicio_id)
+
+@router.put("/{ejercicio_id}", response_model=EjercicioRead, dependencies=[Depends(query_budget(3))])
+async def actualizar_ejercicio(
+    ejercicio_id: int, ejercicio_data: EjercicioUpdate, session: AsyncSession = Depends(get_session)
+):
+    ejercicio = await session.get(Ejercicio, ejercicio_id)
     if not ejercicio:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ejercicio no encontrado")
 
@@ -18,18 +77,95 @@ def actualizar_ejercicio(ejercicio_id: int, ejercicio_data: EjercicioUpdate, ses
         setattr(ejercicio, key, value)
 
     session.add(ejercicio)
-    session.commit()
-    session.refresh(ejercicio)
-    return EjercicioRead.from_orm(ejercicio)
+    await session.commit()
+    response_cache.invalidate(rutina_tag(ejercicio.rutina_id), LISTAS)
+    difusor.publicar(rutina_tag(ejercicio.rutina_id), LISTAS)
+    pdf_cache.invalidar(ejercicio.rutina_id)
+    await session.refresh(ejercicio)
+    return json_response(ejercicio_dict(ejercicio))
 
 
-@router.delete("/{ejercicio_id}", status_code=status.HTTP_204_NO_CONTENT)
-def eliminar_ejercicio(ejercicio_id: int, session: Session = Depends(get_session)):
-    ejercicio = session.get(Ejercicio, ejercicio_id)
+@router.delete("/{ejercicio_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(2))])
+async def eliminar_ejercicio(ejercicio_id: int, session: AsyncSession = Depends(get_session)):
+    ejercicio = await session.get(Ejercicio, ejercicio_id)
     if not ejercicio:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ejercicio no encontrado")
 
-    session.delete(ejercicio)
-    session.commit()
+    await session.delete(ejercicio)
+    await session.commit()
+    response_cache.invalidate(rutina_tag(ejercicio.rutina_id), LISTAS)
+    difusor.publicar(rutina_tag(ejercicio.rutina_id), LISTAS)
+    pdf_cache.invalidar(ejercicio.rutina_id)
     return
 
+
+# Extended in the handler by the kinds of operation present.
+@router.post("/batch", response_model=EjercicioBatchResponse, dependencies=[Depends(query_budget(0))])
+async def procesar_lote(payload: EjercicioBatchRequest, session: AsyncSession = Depends(get_session)):
+    """Apply mixed create/update/delete operations in a single transaction."""
+    operaciones = list(enumerate(payload.operaciones))
+    creaciones = [(indice, op) for indice, op in operaciones if op.op == "create"]
+    # Updates without fields are validated and reported but need no statement. The executemany UPDATE runs one
+    # statement per run of rows setting the same columns, so rows are grouped by their columns.
+    filas_update = sorted(
+        ({"id": op.id, **_datos_update(op)} for _, op in operaciones if op.op == "update" and _datos_update(op)),
+        key=sorted,
+    )
+    ids = [op.id for _, op in operaciones if op.op == "update"]
+    eliminaciones = [op.id for _, op in operaciones if op.op == "delete"]
+    extend_query_budget(
+        2 * bool(creaciones)  # routine check in _validar_lote, INSERT ... RETURNING
+        + bool(ids or eliminaciones)  # exercise check in _validar_lote
+        + len({frozenset(fila) for fila in filas_update})  # UPDATE per set of columns
+        + bool(ids)  # re-select of the updated rows
+        + bool(eliminaciones)  # DELETE
+    )
+
+    destinos = await _validar_lote(session, payload)
+
+    creados: list[Ejercicio] = []
+    actualizados: dict[int, Ejercicio] = {}
+    try:
+        if creaciones:
+            statement = insert(Ejercicio).returning(Ejercicio, sort_by_parameter_order=True)
+            filas = [op.model_dump(exclude={"op"}) for _, op in creaciones]
+            with one_query_for_budget():
+                creados = list((await session.exec(statement, params=filas)).scalars().all())
+        if filas_update:
+            await session.exec(update(Ejercicio), params=filas_update)
+        if ids:
+            actualizados = {
+                ejercicio.id: ejercicio
+                for ejercicio in (await session.exec(select(Ejercicio).where(Ejercicio.id.in_(ids)))).all()
+            }
+        if eliminaciones:
+            await session.exec(delete(Ejercicio).where(Ejercicio.id.in_(eliminaciones)))
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="No se pudo aplicar el lote")
+
+    afectadas = {ejercicio.rutina_id for ejercicio in creados} | set(destinos.values())
+    tags = (*(rutina_tag(rutina_id) for rutina_id in afectadas), LISTAS)
+    response_cache.invalidate(*tags)
+    difusor.publicar(*tags)
+    pdf_cache.invalidar(*afectadas)
+
+    creados_por_indice = dict(zip((indice for indice, _ in creaciones), creados))
+    resultados = []
+    for indice, op in operaciones:
+        if op.op == "create":
+            ejercicio = creados_por_indice[indice]
+        elif op.op == "update":
+            ejercicio = actualizados[op.id]
+        else:
+            ejercicio = None
+        resultados.append(
+            {
+                "indice": indice,
+                "op": op.op,
+                "id": ejercicio.id if ejercicio else op.id,
+                "ejercicio": ejercicio_dict(ejercicio) if ejercicio else None,
+            }
+        )
+    return json_response({"resultados": resultados})
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.eventos import difusor, formato_sse
+
+router = APIRouter()
+
+# Browsers reconnect this many milliseconds after the stream drops.
+REINTENTO_MS = 3000
+
+
+async def _transmitir():
+    with difusor.suscribir() as suscripcion:
+        yield f"retry: {REINTENTO_MS}\n\n"
+        while True:
+            eventos, descartados = await suscripcion.esperar(settings.events_keepalive_seconds)
+            if descartados:
+                # Some changes were lost in the full queue: the client reloads everything instead.
+                yield "event: resync\ndata: {}\n\n"
+                eventos = [evento for evento in eventos if evento.tipo != "resync"]
+            elif not eventos:
+                # A comment line: keeps proxies from closing an idle connection.
+                yield ": keepalive\n\n"
+            for evento in eventos:
+                yield formato_sse(evento)
+
+
+@router.get("/")
+async def suscribirse():
+    """Stream of change events (``text/event-stream``); see ``app.eventos``."""
+    if difusor.lleno:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiadas conexiones de eventos; reintente más tarde",
+            headers={"Retry-After": "30"},
+        )
+    return StreamingResponse(
+        _transmitir(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import get_session
+from app.exports import export_manager
+from app.models import DiaSemana, ExportacionCreate, ExportacionRead, PlanSemanal, Rutina
+from app.pdf import rutina_a_datos
+from app.replicas import lee_del_primario, replicas
+
+router = APIRouter()
+
+MEDIA_TYPES = {"zip": "application/zip", "pdf": "application/pdf"}
+
+
+async def _resolver_ids(session: AsyncSession, payload: ExportacionCreate) -> list[int]:
+    if payload.plan_semanal == (payload.rutina_ids is not None):
+        raise HTTPException(status_code=400, detail="Indique rutina_ids o plan_semanal, no ambos")
+
+    if payload.plan_semanal:
+        entries = (await session.exec(select(PlanSemanal.dia_semana, PlanSemanal.rutina_id))).all()
+        por_dia = dict(entries)
+        # Weekly order, each routine once even if it is assigned to several days.
+        ids = list(dict.fromkeys(por_dia[dia] for dia in DiaSemana if dia in por_dia))
+        if not ids:
+            raise HTTPException(status_code=400, detail="El plan semanal no tiene rutinas asignadas")
+        return ids
+
+    ids = list(dict.fromkeys(payload.rutina_ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="Debe enviar al menos una rutina")
+    if len(ids) > settings.export_max_rutinas:
+        raise HTTPException(
+            status_code=400, detail=f"Se permiten hasta {settings.export_max_rutinas} rutinas por exportación"
+        )
+    existentes = set((await session.exec(select(Rutina.id).where(Rutina.id.in_(ids)))).all())
+    faltantes = [rutina_id for rutina_id in ids if rutina_id not in existentes]
+    if faltantes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"rutinas_no_encontradas": faltantes})
+    return ids
+
+
+def _cargador(ids: list[int], primario: bool):
+    async def cargar() -> list[dict]:
+        # The job outlives the request, so it opens its own session.
+        async with replicas.session(primario) as session:
+            statement = select(Rutina).where(Rutina.id.in_(ids)).options(selectinload(Rutina.ejercicios))
+            por_id = {rutina.id: rutina for rutina in (await session.exec(statement)).all()}
+        return [rutina_a_datos(por_id[rutina_id]) for rutina_id in ids if rutina_id in por_id]
+
+    return cargar
+
+
+@router.post("/", response_model=ExportacionRead, status_code=status.HTTP_202_ACCEPTED)
+async def crear_exportacion(
+    request: Request, payload: ExportacionCreate, session: AsyncSession = Depends(get_session)
+):
+    ids = await _resolver_ids(session, payload)
+    return export_manager.lanzar(payload.formato, len(ids), _cargador(ids, lee_del_primario(request)))
+
+
+@router.get("/{job_id}", response_model=ExportacionRead)
+def obtener_exportacion(job_id: str):
+    estado = export_manager.estado(job_id)
+    if not estado:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exportación no encontrada")
+    return estado
+
+
+@router.get("/{job_id}/descarga", response_class=FileResponse)
+def descargar_exportacion(job_id: str):
+    estado = export_manager.estado(job_id)
+    if not estado:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exportación no encontrada")
+    path = export_manager.resultado(job_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"La exportación está {estado['estado']}")
+    formato = estado["formato"]
+    return FileResponse(path, media_type=MEDIA_TYPES[formato], filename=f"rutinas_{job_id[:8]}.{formato}")
@@ -1,42 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from datetime import datetime
 
-from app.database import get_session
-from app.models import DiaSemana, PlanDiaRead, PlanDiaUpdate, PlanSemanal, Rutina
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import PLAN, response_cache, rutina_tag
+from app.database import get_session, query_budget
+from app.eventos import difusor
+from app.models import DiaSemana, PlanDiaDetalle, PlanDiaRead, PlanDiaUpdate, PlanSemanal, Rutina
+from app.replicas import LecturaDiferida, get_lazy_read_session
+from app.serialization import json_response, plan_dia_dict
 
 router = APIRouter()
 
 
-@router.get("/", response_model=list[PlanDiaRead])
-def obtener_plan_semanal(session: Session = Depends(get_session)):
-    entries = session.exec(select(PlanSemanal)).all()
+def _dia_de_hoy() -> DiaSemana:
+    return list(DiaSemana)[datetime.now().weekday()]
+
+
+async def _cargar_plan(session: AsyncSession, expandir: bool, dia: DiaSemana | None = None) -> list[PlanSemanal]:
+    """Load plan entries with their routine; with ``expandir`` also the ordered exercises, in one joined query."""
+    if expandir:
+        loader = joinedload(PlanSemanal.rutina).joinedload(Rutina.ejercicios)
+    else:
+        loader = joinedload(PlanSemanal.rutina)
+    statement = select(PlanSemanal).options(loader)
+    if dia is not None:
+        statement = statement.where(PlanSemanal.dia_semana == dia)
+    return (await session.exec(statement)).unique().all()
+
+
+def _plan_tags(entries: list[PlanSemanal], expandir: bool) -> list[str]:
+    if not expandir:
+        return [PLAN]
+    return [PLAN, *(rutina_tag(entry.rutina_id) for entry in entries)]
+
+
+@router.get("/", response_model=list[PlanDiaDetalle], dependencies=[Depends(query_budget(1))])
+async def obtener_plan_semanal(
+    request: Request,
+    expand: str | None = Query(None, pattern="^ejercicios$"),
+    lectura: LecturaDiferida = Depends(get_lazy_read_session),
+):
+    if cached := response_cache.lookup(request):
+        return cached
+    session = await lectura.session()
+    expandir = expand == "ejercicios"
+    entries = await _cargar_plan(session, expandir)
     by_day = {entry.dia_semana: entry for entry in entries}
 
-    result: list[PlanDiaRead] = []
-    for dia in DiaSemana:
-        entry = by_day.get(dia)
-        if entry:
-            rutina = session.get(Rutina, entry.rutina_id)
-            result.append(
-                PlanDiaRead(
-                    dia_semana=dia,
-                    rutina_id=entry.rutina_id,
-                    rutina_nombre=rutina.nombre if rutina else None,
-                )
-            )
-        else:
-            result.append(PlanDiaRead(dia_semana=dia, rutina_id=None, rutina_nombre=None))
-    return result
-
-
-@router.put("/", response_model=PlanDiaRead)
-def asignar_rutina_a_dia(payload: PlanDiaUpdate, session: Session = Depends(get_session)):
-    rutina = session.get(Rutina, payload.rutina_id)
+    result = [plan_dia_dict(dia, by_day.get(dia), expandir) for dia in DiaSemana]
+    return response_cache.store(request, result, _plan_tags(entries, expandir))
+
+
+@router.get("/hoy", response_model=PlanDiaDetalle, dependencies=[Depends(query_budget(1))])
+async def obtener_plan_de_hoy(request: Request, lectura: LecturaDiferida = Depends(get_lazy_read_session)):
+    dia = _dia_de_hoy()
+    if cached := response_cache.lookup(request, variant=dia.value):
+        return cached
+    session = await lectura.session()
+    entries = await _cargar_plan(session, expandir=True, dia=dia)
+    entry = entries[0] if entries else None
+    return response_cache.store(request, plan_dia_dict(dia, entry, True), _plan_tags(entries, True), variant=dia.value)
+
+
+@router.put("/", response_model=PlanDiaRead, dependencies=[Depends(query_budget(4))])
+async def asignar_rutina_a_dia(payload: PlanDiaUpdate, session: AsyncSession = Depends(get_session)):
+    rutina = await session.get(Rutina, payload.rutina_id)
     if not rutina:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
 
-    entry = session.exec(
-        select(PlanSemanal).where(PlanSemanal.dia_semana == payload.dia_semana)
+    entry = (
+        await session.exec(select(PlanSemanal).where(PlanSemanal.dia_semana == payload.dia_semana))
     ).first()
     if entry:
         entry.rutina_id = payload.rutina_id
@@ -45,16 +81,22 @@ def asignar_rutina_a_dia(payload: PlanDiaUpdate, session: Session = Depends(get_
         entry = PlanSemanal(dia_semana=payload.dia_semana, rutina_id=payload.rutina_id)
         session.add(entry)
 
-    session.commit()
-    session.refresh(entry)
-    return PlanDiaRead(dia_semana=entry.dia_semana, rutina_id=entry.rutina_id, rutina_nombre=rutina.nombre)
+    await session.commit()
+    response_cache.invalidate(PLAN)
+    difusor.publicar(PLAN)
+    await session.refresh(entry)
+    return json_response(
+        {"dia_semana": entry.dia_semana, "rutina_id": entry.rutina_id, "rutina_nombre": rutina.nombre}
+    )
 
 
-@router.delete("/{dia_semana}", status_code=status.HTTP_204_NO_CONTENT)
-def limpiar_dia(dia_semana: DiaSemana, session: Session = Depends(get_session)):
-    entry = session.exec(select(PlanSemanal).where(PlanSemanal.dia_semana == dia_semana)).first()
+@router.delete("/{dia_semana}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(2))])
+async def limpiar_dia(dia_semana: DiaSemana, session: AsyncSession = Depends(get_session)):
+    entry = (await session.exec(select(PlanSemanal).where(PlanSemanal.dia_semana == dia_semana))).first()
     if entry:
-        session.delete(entry)
-        session.commit()
+        await session.delete(entry)
+        await session.commit()
+        response_cache.invalidate(PLAN)
+        difusor.publicar(PLAN)
     return
 
@@ -1,111 +1,332 @@
-import io
+import base64
+import re
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import and_, case, insert, true, update
 from sqlalchemy.exc import IntegrityError
-from sqlmodel import Session, select, func
-from fpdf import FPDF
-
-from app.database import get_session
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.admision import admision, admitido
+from app.cache import LISTAS, PLAN, etag_matches, response_cache, rutina_tag
+from app.config import settings
+from app.contadores import contador_dia
+from app.database import extend_query_budget, get_session, one_query_for_budget, query_budget
+from app.eventos import difusor
+from app.exports import export_manager
+from app.fieldsets import Proyeccion, campos_detalle, campos_lista
+from app.imports import ImportacionInvalida, importar
 from app.models import (
     DiaSemana,
     Ejercicio,
     EjercicioCreate,
     EjercicioRead,
+    ImportacionResumen,
     Rutina,
     RutinaCreate,
-    RutinaList,
     RutinaListResponse,
     RutinaRead,
     RutinaUpdate,
 )
+from app.pdf import rutina_a_datos
+from app.pdf_cache import clave_pdf, pdf_cache
+from app.replicas import LecturaDiferida, get_lazy_read_session, get_read_session, lee_del_primario
+from app.search import get_search_backend
+from app.serialization import ejercicio_dict, json_response, rutina_dict, rutina_lista_dict
+from app.streaming import MEDIA_TYPES, volcado
 
 router = APIRouter()
 
+MAX_RUTINAS_BULK = 1000
+MAX_COPIAS = 100
+COPIA_REINTENTOS = 3
+COPIA_SUFFIX = re.compile(r" (\d+)\)")
+
 
-def _get_ejercicio_count(session: Session, rutina_id: int) -> int:
-    statement = select(func.count(Ejercicio.id)).where(Ejercicio.rutina_id == rutina_id)
-    result = session.exec(statement)
-    value = result.first()
-    # Depending on SQLAlchemy version, first() can return a scalar int or a Row
-    if value is None:
-        return 0
-    return int(value[0]) if isinstance(value, (list, tuple)) else int(value)
+def _encode_cursor(rutina_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{rutina_id}".encode()).decode().rstrip("=")
 
 
-def _generate_copy_name(session: Session, base_name: str) -> str:
-    """Return a unique copy name based on the original routine name."""
-    candidate = f"{base_name} (copia)"
-    suffix = 2
-    while session.exec(select(Rutina).where(Rutina.nombre == candidate)).first():
-        candidate = f"{base_name} (copia {suffix})"
+def _decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, value = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+        if prefix != "id":
+            raise ValueError(prefix)
+        return int(value)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+async def _listar_paginado(
+    session: AsyncSession,
+    filtros: list,
+    skip: int,
+    limit: int,
+    cursor: str | None,
+    incluir_total: bool,
+    proyeccion: Proyeccion,
+    rank=None,
+) -> dict:
+    """Return one ``RutinaListResponse`` page of routines in a single statement.
+
+    With ``cursor`` the page is resolved by keyset (``Rutina.id > cursor``) instead of OFFSET.
+    With ``rank`` (relevance, exercise count) the page is ordered by it, descending, and offset
+    pagination is required. Only the columns in ``proyeccion`` are selected; the exercise count
+    is the stored counter. Included exercises take one more statement.
+    """
+    columns = [getattr(Rutina, campo) for campo in proyeccion.rutina]
+    if incluir_total:
+        total_column = select(func.count(Rutina.id)).where(*filtros).scalar_subquery()
+        columns.append(total_column.label("total"))
+
+    statement = select(*columns).where(*filtros)
+    if rank is not None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="La paginación por cursor requiere orden=id")
+        statement = statement.order_by(rank.desc(), Rutina.id)
+    else:
+        statement = statement.order_by(Rutina.id)
+    if cursor is not None:
+        statement = statement.where(Rutina.id > _decode_cursor(cursor)).limit(limit + 1)
+        skip = 0
+    else:
+        statement = statement.offset(skip).limit(limit + 1)
+    rows = (await session.exec(statement)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [rutina_lista_dict(row, proyeccion.rutina) for row in rows]
+    if proyeccion.ejercicios is not None and rows:
+        await _incluir_ejercicios(session, items, proyeccion.ejercicios)
+
+    total = None
+    if incluir_total:
+        if rows:
+            total = rows[0].total
+        else:
+            # Empty page: there is no row to carry the total, count it separately.
+            extend_query_budget(1)
+            total = (await session.exec(select(func.count(Rutina.id)).where(*filtros))).one()
+
+    next_cursor = _encode_cursor(rows[-1].id) if has_more and rank is None else None
+    return {"items": items, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor}
+
+
+async def _incluir_ejercicios(session: AsyncSession, items: list[dict], campos: tuple[str, ...]) -> None:
+    """Attach the exercises of every item, selecting only ``campos``, in one statement."""
+    extend_query_budget(1)
+    por_rutina = {item["id"]: item.setdefault("ejercicios", []) for item in items}
+    statement = (
+        select(Ejercicio.rutina_id, *(getattr(Ejercicio, campo) for campo in campos))
+        .where(Ejercicio.rutina_id.in_(por_rutina))
+        .order_by(Ejercicio.rutina_id, Ejercicio.orden, Ejercicio.id)
+    )
+    for rutina_id, *valores in (await session.exec(statement)).all():
+        por_rutina[rutina_id].append(dict(zip(campos, valores)))
+
+
+def _search_backend(session: AsyncSession):
+    return get_search_backend(session.get_bind().dialect.name)
+
+
+def _filtros_ejercicio(
+    session: AsyncSession, dia_semana: DiaSemana | None, ejercicio_nombre: str | None, sin_acentos: bool
+) -> list:
+    if not ejercicio_nombre:
+        # The day alone is answered by the stored counter, without touching ejercicio.
+        return [contador_dia(dia_semana) > 0] if dia_semana is not None else []
+    condiciones = [_search_backend(session).ejercicio_filter(ejercicio_nombre, sin_acentos)]
+    if dia_semana is not None:
+        condiciones.append(Ejercicio.dia_semana == dia_semana)
+    return [Rutina.ejercicios.any(and_(*condiciones))]
+
+
+async def _generate_copy_names(session: AsyncSession, base_name: str, cantidad: int = 1) -> List[str]:
+    """Return ``cantidad`` free copy names, resolving taken "(copia N)" suffixes with one query."""
+    prefijo = f"{base_name} (copia"
+    tomados = await session.exec(select(Rutina.nombre).where(Rutina.nombre.startswith(prefijo, autoescape=True)))
+    ocupados = set()
+    for nombre in tomados.all():
+        resto = nombre[len(prefijo) :]
+        if resto == ")":
+            ocupados.add(1)
+        elif (match := COPIA_SUFFIX.fullmatch(resto)) and int(match.group(1)) >= 2:
+            ocupados.add(int(match.group(1)))
+
+    nombres: List[str] = []
+    suffix = 1
+    while len(nombres) < cantidad:
+        if suffix not in ocupados:
+            nombres.append(f"{base_name} (copia)" if suffix == 1 else f"{base_name} (copia {suffix})")
         suffix += 1
-    return candidate
+    return nombres
 
 
-def _get_rutina_con_ejercicios(session: Session, rutina_id: int) -> Rutina | None:
-    rutina = session.get(Rutina, rutina_id)
+async def _duplicar(session: AsyncSession, rutina_id: int, cantidad: int) -> List[Rutina]:
+    """Copy a routine ``cantidad`` times in one transaction; exercises are copied with INSERT ... SELECT."""
+    rutina = await session.get(Rutina, rutina_id)
     if not rutina:
-        return None
-    ejercicios = session.exec(
-        select(Ejercicio)
-        .where(Ejercicio.rutina_id == rutina.id)
-        .order_by(Ejercicio.dia_semana, Ejercicio.orden)
-    ).all()
-    rutina.ejercicios = ejercicios
-    return rutina
-
-
-def _wrap_long_text(text: str, max_chunk: int = 60) -> str:
-    """Ensure there are breakpoints to avoid FPDF 'Not enough horizontal space'."""
-    if len(text) <= max_chunk:
-        return text
-    parts = []
-    for i in range(0, len(text), max_chunk):
-        parts.append(text[i : i + max_chunk])
-    return " ".join(parts)
-
-
-def _export_pdf(rutina: Rutina) -> StreamingResponse:
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, rutina.nombre, ln=1)
-    pdf.set_font("Arial", "", 11)
-    descr = _wrap_long_text(rutina.descripcion or "Sin descripción", max_chunk=60)
-    usable_width = pdf.w - pdf.l_margin - pdf.r_margin
-    pdf.multi_cell(usable_width, 8, descr)
-    pdf.ln(2)
-    pdf.set_font("Arial", "B", 11)
-    pdf.cell(0, 8, "Ejercicios", ln=1)
-    pdf.set_font("Arial", "", 10)
-    if rutina.ejercicios:
-        for ejercicio in rutina.ejercicios:
-            line = f"{ejercicio.dia_semana} · {ejercicio.nombre} · {ejercicio.series}x{ejercicio.repeticiones}"
-            if ejercicio.peso is not None:
-                line += f" · Peso: {ejercicio.peso}"
-            if ejercicio.orden is not None:
-                line += f" · Orden: {ejercicio.orden}"
-            if ejercicio.notas:
-                line += f" · Notas: {ejercicio.notas}"
-            safe_line = _wrap_long_text(line, max_chunk=50)
-            pdf.set_x(pdf.l_margin)
-            pdf.multi_cell(usable_width, 7, safe_line)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
+    base_name, descripcion = rutina.nombre, rutina.descripcion
+
+    columnas = ["nombre", "dia_semana", "series", "repeticiones", "peso", "notas", "orden"]
+    for _ in range(COPIA_REINTENTOS):
+        nombres = await _generate_copy_names(session, base_name, cantidad)
+        ahora = datetime.utcnow()
+        try:
+            copias = (
+                await session.exec(
+                    insert(Rutina).returning(Rutina),
+                    params=[{"nombre": nombre, "descripcion": descripcion, "fecha_creacion": ahora} for nombre in nombres],
+                )
+            ).scalars().all()
+            ids = [copia.id for copia in copias]
+            origen = (
+                select(*(getattr(Ejercicio, columna) for columna in columnas), Rutina.id)
+                .join_from(Ejercicio, Rutina, true())
+                .where(Ejercicio.rutina_id == rutina_id, Rutina.id.in_(ids))
+            )
+            await session.exec(insert(Ejercicio).from_select([*columnas, "rutina_id"], origen))
+            await session.commit()
+            break
+        except IntegrityError:
+            # Another request took one of the names between the lookup and the insert.
+            await session.rollback()
+    else:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No se pudo generar un nombre para la copia")
+    response_cache.invalidate(LISTAS)
+    difusor.publicar(LISTAS)
+
+    statement = select(Rutina).where(Rutina.id.in_(ids)).options(selectinload(Rutina.ejercicios)).order_by(Rutina.id)
+    return list((await session.exec(statement)).all())
+
+
+async def _get_rutina_con_ejercicios(
+    session: AsyncSession, rutina_id: int, proyeccion: Proyeccion | None = None
+) -> Rutina | None:
+    """Load a routine with its exercises (ordered by ``orden``) in one eager query.
+
+    With ``proyeccion`` only its columns are loaded, and the exercises only when it asks for them.
+    """
+    if proyeccion is None:
+        opciones = [selectinload(Rutina.ejercicios)]
     else:
-        pdf.cell(0, 7, "Sin ejercicios", ln=1)
+        opciones = [load_only(*(getattr(Rutina, campo) for campo in proyeccion.rutina))]
+        if proyeccion.ejercicios is not None:
+            columnas = (getattr(Ejercicio, campo) for campo in proyeccion.ejercicios)
+            opciones.append(selectinload(Rutina.ejercicios).load_only(*columnas))
+    statement = select(Rutina).where(Rutina.id == rutina_id).options(*opciones)
+    return (await session.exec(statement)).first()
+
+
+async def _crear_rutinas(session: AsyncSession, rutinas_data: List[RutinaCreate]) -> List[Rutina]:
+    """Insert routines and all their exercises in one transaction with two bulk INSERT ... RETURNING."""
+    ahora = datetime.utcnow()
+    try:
+        with one_query_for_budget():
+            creadas = (
+                await session.exec(
+                    insert(Rutina).returning(Rutina),
+                    params=[
+                        {"nombre": data.nombre, "descripcion": data.descripcion, "fecha_creacion": ahora}
+                        for data in rutinas_data
+                    ],
+                )
+            ).scalars().all()
+        # RETURNING order is not guaranteed across batches; names are unique, so match on them.
+        por_nombre = {rutina.nombre: rutina for rutina in creadas}
+        rutinas = [por_nombre[data.nombre] for data in rutinas_data]
+
+        filas = [
+            {**ejercicio_data.model_dump(), "rutina_id": rutina.id}
+            for rutina, data in zip(rutinas, rutinas_data)
+            for ejercicio_data in data.ejercicios or []
+        ]
+        ejercicios: List[Ejercicio] = []
+        if filas:
+            with one_query_for_budget():
+                ejercicios = (
+                    await session.exec(insert(Ejercicio).returning(Ejercicio), params=filas)
+                ).scalars().all()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="Ya existe una rutina con ese nombre")
+    response_cache.invalidate(LISTAS)
+    difusor.publicar(LISTAS)
+
+    por_rutina: dict[int, List[Ejercicio]] = {rutina.id: [] for rutina in rutinas}
+    for ejercicio in sorted(ejercicios, key=lambda ejercicio: ejercicio.id):
+        por_rutina[ejercicio.rutina_id].append(ejercicio)
+    for rutina in rutinas:
+        set_committed_value(rutina, "ejercicios", por_rutina[rutina.id])
+    return rutinas
+
 
-    pdf_bytes = pdf.output(dest="S")
-    if isinstance(pdf_bytes, str):
-        pdf_bytes = pdf_bytes.encode("latin-1")
+def _ordenar_por_dia(ejercicios: List[Ejercicio]) -> List[Ejercicio]:
+    dias = list(DiaSemana)
+    return sorted(
+        ejercicios, key=lambda ejercicio: (dias.index(ejercicio.dia_semana), ejercicio.orden or 0, ejercicio.id)
+    )
+
+
+def _rango(header: str | None, largo: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into inclusive offsets; None means send the whole body."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    inicio, _, fin = header[len("bytes=") :].strip().partition("-")
+    try:
+        if not inicio:
+            sufijo = int(fin)
+            if sufijo <= 0:
+                raise ValueError
+            return max(largo - sufijo, 0), largo - 1
+        primero = int(inicio)
+        ultimo = min(int(fin), largo - 1) if fin else largo - 1
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={"Content-Range": f"bytes */{largo}"}
+        )
+    if primero >= largo or primero > ultimo:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={"Content-Range": f"bytes */{largo}"}
+        )
+    return primero, ultimo
+
+
+async def _export_pdf(request: Request, rutina: Rutina) -> Response:
+    datos = rutina_a_datos(rutina)
+    etag = f'"{clave_pdf(datos)}"'
     filename = f"rutina_{rutina.id}_{datetime.utcnow().date()}.pdf"
-    return StreamingResponse(
-        io.BytesIO(pdf_bytes),
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    # The ETag is the content hash, so a matching client needs no render at all.
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    _, pdf_bytes = await export_manager.pdf_rutina(datos)
+    if_range = request.headers.get("if-range")
+    rango = _rango(request.headers.get("range"), len(pdf_bytes)) if not if_range or if_range == etag else None
+    if rango is None:
+        return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+    primero, ultimo = rango
+    headers["Content-Range"] = f"bytes {primero}-{ultimo}/{len(pdf_bytes)}"
+    return Response(
+        content=pdf_bytes[primero : ultimo + 1],
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
         media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename=\"{filename}\"'},
+        headers=headers,
     )
 
 
@@ -116,124 +337,148 @@ class EjercicioOrdenItem(BaseModel):
 
 class ReordenEjerciciosPayload(BaseModel):
     items: List[EjercicioOrdenItem]
+    # Version the client read (RutinaRead.version); a reorder based on an older one gets 409.
+    version: int
 
 
-@router.get("/", response_model=RutinaListResponse)
-def listar_rutinas(
+@router.get("/", response_model=RutinaListResponse, dependencies=[Depends(query_budget(1))])
+async def listar_rutinas(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=200),
     dia_semana: DiaSemana | None = Query(None),
     ejercicio_nombre: str | None = Query(None, min_length=1),
-    session: Session = Depends(get_session),
+    cursor: str | None = Query(None, min_length=1),
+    incluir_total: bool = Query(True),
+    min_ejercicios: int | None = Query(None, ge=0),
+    max_ejercicios: int | None = Query(None, ge=0),
+    orden: str = Query("id", pattern="^(id|ejercicios)$"),
+    proyeccion: Proyeccion = Depends(campos_lista),
+    lectura: LecturaDiferida = Depends(get_lazy_read_session),
 ):
-    base_query = select(Rutina)
-    if dia_semana is not None or ejercicio_nombre:
-        base_query = base_query.join(Ejercicio)
-    if dia_semana is not None:
-        base_query = base_query.where(Ejercicio.dia_semana == dia_semana)
-    if ejercicio_nombre:
-        base_query = base_query.where(func.lower(Ejercicio.nombre).contains(ejercicio_nombre.lower()))
-    base_query = base_query.distinct()
-
-    total_subquery = base_query.subquery()
-    total = session.exec(select(func.count()).select_from(total_subquery)).one()
-
-    statement = base_query.offset(skip).limit(limit)
-    rutinas = session.exec(statement).all()
-
-    items: List[RutinaList] = []
-    for rutina in rutinas:
-        count = _get_ejercicio_count(session, rutina.id)
-        items.append(
-            RutinaList(
-                id=rutina.id,
-                nombre=rutina.nombre,
-                descripcion=rutina.descripcion,
-                fecha_creacion=rutina.fecha_creacion,
-                total_ejercicios=count,
-            )
-        )
-    return RutinaListResponse(items=items, total=total, skip=skip, limit=limit)
-
-
-@router.get("/buscar", response_model=RutinaListResponse)
-def buscar_rutinas(
+    if cached := response_cache.lookup(request):
+        return cached
+    session = await lectura.session()
+    filtros = _filtros_ejercicio(session, dia_semana, ejercicio_nombre, settings.search_accent_insensitive)
+    if min_ejercicios is not None:
+        filtros.append(Rutina.total_ejercicios >= min_ejercicios)
+    if max_ejercicios is not None:
+        filtros.append(Rutina.total_ejercicios <= max_ejercicios)
+    rank = Rutina.total_ejercicios if orden == "ejercicios" else None
+    respuesta = await _listar_paginado(session, filtros, skip, limit, cursor, incluir_total, proyeccion, rank)
+    return response_cache.store(request, respuesta, [LISTAS])
+
+
+@router.get(
+    "/buscar",
+    response_model=RutinaListResponse,
+    dependencies=[Depends(query_budget(1))],
+)
+async def buscar_rutinas(
+    request: Request,
     nombre: str = Query(..., min_length=1),
     dia_semana: DiaSemana | None = Query(None),
     ejercicio_nombre: str | None = Query(None, min_length=1),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=200),
-    session: Session = Depends(get_session),
+    cursor: str | None = Query(None, min_length=1),
+    incluir_total: bool = Query(True),
+    orden: str = Query("relevancia", pattern="^(relevancia|id)$"),
+    sin_acentos: bool | None = Query(None),
+    proyeccion: Proyeccion = Depends(campos_lista),
+    lectura: LecturaDiferida = Depends(get_lazy_read_session),
 ):
-    base_query = select(Rutina).where(func.lower(Rutina.nombre).contains(nombre.lower()))
-    if dia_semana is not None or ejercicio_nombre:
-        base_query = base_query.join(Ejercicio)
-    if dia_semana is not None:
-        base_query = base_query.where(Ejercicio.dia_semana == dia_semana)
-    if ejercicio_nombre:
-        base_query = base_query.where(func.lower(Ejercicio.nombre).contains(ejercicio_nombre.lower()))
-    base_query = base_query.distinct()
-
-    total_subquery = base_query.subquery()
-    total = session.exec(select(func.count()).select_from(total_subquery)).one()
-
-    statement = base_query.offset(skip).limit(limit)
-    rutinas = session.exec(statement).all()
-
-    items: List[RutinaList] = []
-    for rutina in rutinas:
-        count = _get_ejercicio_count(session, rutina.id)
-        items.append(
-            RutinaList(
-                id=rutina.id,
-                nombre=rutina.nombre,
-                descripcion=rutina.descripcion,
-                fecha_creacion=rutina.fecha_creacion,
-                total_ejercicios=count,
-            )
-        )
-    return RutinaListResponse(items=items, total=total, skip=skip, limit=limit)
+    if cached := response_cache.lookup(request):
+        return cached
+    if sin_acentos is None:
+        sin_acentos = settings.search_accent_insensitive
+    # Cache hits above are never shed; the slot covers the session and the search itself.
+    async with admitido("busqueda"):
+        session = await lectura.session()
+        filtros, rank = _search_backend(session).rutina_filter(nombre, sin_acentos)
+        filtros.extend(_filtros_ejercicio(session, dia_semana, ejercicio_nombre, sin_acentos))
+        if orden == "id":
+            rank = None
+        respuesta = await _listar_paginado(session, filtros, skip, limit, cursor, incluir_total, proyeccion, rank)
+    return response_cache.store(request, respuesta, [LISTAS])
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def exportar_rutinas(request: Request, formato: str = Query("ndjson", pattern="^(csv|json|ndjson)$")):
+    """Stream every routine with its exercises; CSV has one row per exercise."""
+    filename = f"rutinas_{datetime.utcnow().date()}.{formato}"
+    return StreamingResponse(
+        volcado(formato, primario=lee_del_primario(request)),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
-@router.get("/{rutina_id}", response_model=RutinaRead)
-def obtener_rutina(rutina_id: int, session: Session = Depends(get_session)):
-    rutina = session.get(Rutina, rutina_id)
+@router.get("/{rutina_id}", response_model=RutinaRead, dependencies=[Depends(query_budget(2))])
+async def obtener_rutina(
+    rutina_id: int,
+    request: Request,
+    proyeccion: Proyeccion = Depends(campos_detalle),
+    lectura: LecturaDiferida = Depends(get_lazy_read_session),
+):
+    if cached := response_cache.lookup(request):
+        return cached
+    session = await lectura.session()
+    rutina = await _get_rutina_con_ejercicios(session, rutina_id, proyeccion)
     if not rutina:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
-    ejercicios = session.exec(
-        select(Ejercicio).where(Ejercicio.rutina_id == rutina.id).order_by(Ejercicio.orden)
-    ).all()
-    rutina.ejercicios = ejercicios
-    return RutinaRead.from_orm(rutina)
+    payload = rutina_dict(rutina, proyeccion.rutina, proyeccion.ejercicios)
+    return response_cache.store(request, payload, [rutina_tag(rutina_id)])
 
 
-@router.post("/", response_model=RutinaRead, status_code=status.HTTP_201_CREATED)
-def crear_rutina(rutina_data: RutinaCreate, session: Session = Depends(get_session)):
-    rutina = Rutina(nombre=rutina_data.nombre, descripcion=rutina_data.descripcion)
-    session.add(rutina)
-    try:
-        session.commit()
-        session.refresh(rutina)
-    except IntegrityError:
-        session.rollback()
-        raise HTTPException(status_code=400, detail="Ya existe una rutina con ese nombre")
+@router.post(
+    "/",
+    response_model=RutinaRead,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(2))],
+)
+async def crear_rutina(rutina_data: RutinaCreate, session: AsyncSession = Depends(get_session)):
+    (rutina,) = await _crear_rutinas(session, [rutina_data])
+    return json_response(rutina_dict(rutina), status_code=status.HTTP_201_CREATED)
 
-    ejercicios = []
-    for ejercicio_data in rutina_data.ejercicios or []:
-        ejercicio = Ejercicio(**ejercicio_data.model_dump(), rutina_id=rutina.id)
-        session.add(ejercicio)
-        ejercicios.append(ejercicio)
-    session.commit()
-    for ejercicio in ejercicios:
-        session.refresh(ejercicio)
 
-    rutina.ejercicios = ejercicios
-    return RutinaRead.from_orm(rutina)
+@router.post(
+    "/bulk",
+    response_model=List[RutinaRead],
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(2))],
+)
+async def crear_rutinas_bulk(rutinas_data: List[RutinaCreate], session: AsyncSession = Depends(get_session)):
+    if not rutinas_data:
+        raise HTTPException(status_code=400, detail="Debe enviar al menos una rutina")
+    if len(rutinas_data) > MAX_RUTINAS_BULK:
+        raise HTTPException(status_code=400, detail=f"Se permiten hasta {MAX_RUTINAS_BULK} rutinas por request")
+    nombres = [rutina_data.nombre for rutina_data in rutinas_data]
+    if len(set(nombres)) != len(nombres):
+        raise HTTPException(status_code=400, detail="Hay nombres de rutina repetidos en el lote")
+    rutinas = await _crear_rutinas(session, rutinas_data)
+    return json_response([rutina_dict(rutina) for rutina in rutinas], status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/import", response_model=ImportacionResumen)
+async def importar_rutinas(
+    request: Request,
+    formato: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    duplicados: str = Query("omitir", pattern="^(omitir|actualizar)$"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Load routines from an NDJSON or CSV request body; see ``app.imports``."""
+    try:
+        return await importar(session, request.stream(), formato, duplicados)
+    except ImportacionInvalida as error:
+        raise HTTPException(status_code=400, detail=str(error))
 
 
-@router.put("/{rutina_id}", response_model=RutinaRead)
-def actualizar_rutina(rutina_id: int, rutina_data: RutinaUpdate, session: Session = Depends(get_session)):
-    rutina = session.get(Rutina, rutina_id)
+@router.put("/{rutina_id}", response_model=RutinaRead, dependencies=[Depends(query_budget(3))])
+async def actualizar_rutina(
+    rutina_id: int, rutina_data: RutinaUpdate, session: AsyncSession = Depends(get_session)
+):
+    rutina = await _get_rutina_con_ejercicios(session, rutina_id)
     if not rutina:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
 
@@ -244,123 +489,141 @@ def actualizar_rutina(rutina_id: int, rutina_data: RutinaUpdate, session: Sessio
 
     try:
         session.add(rutina)
-        session.commit()
-        session.refresh(rutina)
+        await session.commit()
     except IntegrityError:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=400, detail="Ya existe una rutina con ese nombre")
+    response_cache.invalidate(rutina_tag(rutina_id), LISTAS, PLAN)
+    difusor.publicar(rutina_tag(rutina_id), LISTAS, PLAN)
+    pdf_cache.invalidar(rutina_id)
 
-    ejercicios = session.exec(
-        select(Ejercicio).where(Ejercicio.rutina_id == rutina.id).order_by(Ejercicio.orden)
-    ).all()
-    rutina.ejercicios = ejercicios
-    return RutinaRead.from_orm(rutina)
+    return json_response(rutina_dict(rutina))
 
 
-@router.delete("/{rutina_id}", status_code=status.HTTP_204_NO_CONTENT)
-def eliminar_rutina(rutina_id: int, session: Session = Depends(get_session)):
-    rutina = session.get(Rutina, rutina_id)
+@router.delete("/{rutina_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(4))])
+async def eliminar_rutina(rutina_id: int, session: AsyncSession = Depends(get_session)):
+    rutina = await _get_rutina_con_ejercicios(session, rutina_id)
     if not rutina:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
-    session.delete(rutina)
-    session.commit()
+    await session.delete(rutina)
+    await session.commit()
+    response_cache.invalidate(rutina_tag(rutina_id), LISTAS, PLAN)
+    difusor.publicar(rutina_tag(rutina_id), LISTAS, PLAN)
+    pdf_cache.invalidar(rutina_id)
     return
 
 
-@router.post("/{rutina_id}/ejercicios", response_model=EjercicioRead, status_code=status.HTTP_201_CREATED)
-def agregar_ejercicio(rutina_id: int, ejercicio_data: EjercicioCreate, session: Session = Depends(get_session)):
-    rutina = session.get(Rutina, rutina_id)
+@router.post(
+    "/{rutina_id}/ejercicios",
+    response_model=EjercicioRead,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(3))],
+)
+async def agregar_ejercicio(
+    rutina_id: int, ejercicio_data: EjercicioCreate, session: AsyncSession = Depends(get_session)
+):
+    rutina = await session.get(Rutina, rutina_id)
     if not rutina:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
 
     ejercicio = Ejercicio(**ejercicio_data.model_dump(), rutina_id=rutina.id)
     session.add(ejercicio)
-    session.commit()
-    session.refresh(ejercicio)
-    return EjercicioRead.from_orm(ejercicio)
+    await session.commit()
+    response_cache.invalidate(rutina_tag(rutina_id), LISTAS)
+    difusor.publicar(rutina_tag(rutina_id), LISTAS)
+    pdf_cache.invalidar(rutina_id)
+    await session.refresh(ejercicio)
+    return json_response(ejercicio_dict(ejercicio), status_code=status.HTTP_201_CREATED)
 
 
-@router.put("/{rutina_id}/ejercicios/reordenar", response_model=RutinaRead)
-def reordenar_ejercicios(
-    rutina_id: int, payload: ReordenEjerciciosPayload, session: Session = Depends(get_session)
+@router.put("/{rutina_id}/ejercicios/reordenar", response_model=RutinaRead, dependencies=[Depends(query_budget(2))])
+async def reordenar_ejercicios(
+    rutina_id: int, payload: ReordenEjerciciosPayload, session: AsyncSession = Depends(get_session)
 ):
-    rutina = session.get(Rutina, rutina_id)
-    if not rutina:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
+    """Apply the new order with two set-based UPDATE ... RETURNING statements.
 
+    The first bumps ``Rutina.version`` if it still matches the client's and
+    returns the routine; the second rewrites ``orden`` with a CASE and returns every
+    exercise of the routine, so no reload is needed. Stale versions get 409.
+    """
     if not payload.items:
         raise HTTPException(status_code=400, detail="Debe enviar al menos un ejercicio")
+    ordenes = {item.id: item.orden for item in payload.items}
+    if len(ordenes) != len(payload.items):
+        raise HTTPException(status_code=400, detail="Hay ejercicios repetidos")
+
+    rutina = (
+        await session.exec(
+            update(Rutina)
+            .where(Rutina.id == rutina_id, Rutina.version == payload.version)
+            .values(version=Rutina.version + 1)
+            .returning(Rutina)
+            .execution_options(synchronize_session=False)
+        )
+    ).scalars().first()
+    if rutina is None:
+        extend_query_budget(1)
+        actual = (await session.exec(select(Rutina.version).where(Rutina.id == rutina_id))).first()
+        if actual is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La rutina fue reordenada por otra operación (versión actual: {actual}); recargue y reintente",
+        )
 
-    ids = [item.id for item in payload.items]
-    ejercicios = session.exec(
-        select(Ejercicio).where(Ejercicio.id.in_(ids), Ejercicio.rutina_id == rutina_id)
-    ).all()
-    if len(ejercicios) != len(payload.items):
+    # Every exercise of the routine matches, so RETURNING yields the complete list.
+    ejercicios = (
+        await session.exec(
+            update(Ejercicio)
+            .where(Ejercicio.rutina_id == rutina_id)
+            .values(orden=case(ordenes, value=Ejercicio.id, else_=Ejercicio.orden))
+            .returning(Ejercicio)
+            .execution_options(synchronize_session=False)
+        )
+    ).scalars().all()
+    if not ordenes.keys() <= {ejercicio.id for ejercicio in ejercicios}:
+        await session.rollback()
         raise HTTPException(status_code=400, detail="Algún ejercicio no pertenece a la rutina")
+    await session.commit()
+    # List pages with include=ejercicios embed orden.
+    response_cache.invalidate(rutina_tag(rutina_id), LISTAS)
+    difusor.publicar(rutina_tag(rutina_id), LISTAS)
+    pdf_cache.invalidar(rutina_id)
 
-    ejercicio_map = {ej.id: ej for ej in ejercicios}
-    for item in payload.items:
-        ejercicio = ejercicio_map[item.id]
-        ejercicio.orden = item.orden
-        session.add(ejercicio)
-
-    session.commit()
-    for ejercicio in ejercicios:
-        session.refresh(ejercicio)
-
-    rutina.ejercicios = session.exec(
-        select(Ejercicio).where(Ejercicio.rutina_id == rutina.id).order_by(Ejercicio.dia_semana, Ejercicio.orden)
-    ).all()
-    return RutinaRead.from_orm(rutina)
+    set_committed_value(rutina, "ejercicios", _ordenar_por_dia(ejercicios))
+    return json_response(rutina_dict(rutina))
 
 
 @router.post("/{rutina_id}/duplicar", response_model=RutinaRead, status_code=status.HTTP_201_CREATED)
-def duplicar_rutina(rutina_id: int, session: Session = Depends(get_session)):
-    rutina = session.get(Rutina, rutina_id)
-    if not rutina:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
-
-    ejercicios = session.exec(
-        select(Ejercicio).where(Ejercicio.rutina_id == rutina.id).order_by(Ejercicio.orden)
-    ).all()
-
-    new_name = _generate_copy_name(session, rutina.nombre)
-    rutina_copia = Rutina(nombre=new_name, descripcion=rutina.descripcion)
-    session.add(rutina_copia)
-    session.commit()
-    session.refresh(rutina_copia)
-
-    ejercicios_copia: list[Ejercicio] = []
-    for ejercicio in ejercicios:
-        ejercicio_copia = Ejercicio(
-            nombre=ejercicio.nombre,
-            dia_semana=ejercicio.dia_semana,
-            series=ejercicio.series,
-            repeticiones=ejercicio.repeticiones,
-            peso=ejercicio.peso,
-            notas=ejercicio.notas,
-            orden=ejercicio.orden,
-            rutina_id=rutina_copia.id,
-        )
-        session.add(ejercicio_copia)
-        ejercicios_copia.append(ejercicio_copia)
+async def duplicar_rutina(rutina_id: int, session: AsyncSession = Depends(get_session)):
+    (rutina_copia,) = await _duplicar(session, rutina_id, 1)
+    return json_response(rutina_dict(rutina_copia), status_code=status.HTTP_201_CREATED)
 
-    session.commit()
-    for ejercicio in ejercicios_copia:
-        session.refresh(ejercicio)
 
-    rutina_copia.ejercicios = ejercicios_copia
-    return RutinaRead.from_orm(rutina_copia)
+@router.post(
+    "/{rutina_id}/duplicar/multiple", response_model=List[RutinaRead], status_code=status.HTTP_201_CREATED
+)
+async def duplicar_rutina_multiple(
+    rutina_id: int,
+    copias: int = Query(..., ge=1, le=MAX_COPIAS),
+    session: AsyncSession = Depends(get_session),
+):
+    copias_creadas = await _duplicar(session, rutina_id, copias)
+    return json_response([rutina_dict(copia) for copia in copias_creadas], status_code=status.HTTP_201_CREATED)
 
 
-@router.get("/{rutina_id}/export", response_class=StreamingResponse)
-def exportar_rutina(
+@router.get(
+    "/{rutina_id}/export",
+    response_class=Response,
+    dependencies=[Depends(admision("pdf")), Depends(query_budget(2))],
+)
+async def exportar_rutina(
+    request: Request,
     rutina_id: int,
     formato: str = Query("pdf", pattern="^(pdf)$"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    rutina = _get_rutina_con_ejercicios(session, rutina_id)
+    rutina = await _get_rutina_con_ejercicios(session, rutina_id)
     if not rutina:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
-    return _export_pdf(rutina)
-
+    return await _export_pdf(request, rutina)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_session, query_budget
+from app.models import SyncResponse
+from app.serialization import json_response
+from app.sync import CursorInvalido, CursorVencido, cambios
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SyncResponse, dependencies=[Depends(query_budget(5))])
+async def sincronizar(
+    since: str | None = Query(None, min_length=1, description="Cursor devuelto por la sincronización anterior."),
+    limit: int = Query(500, ge=1, le=5000, description="Máximo de cambios por tipo en esta respuesta."),
+    # Always the primary: a replica that has not replayed a change yet would let the cursor skip it.
+    session: AsyncSession = Depends(get_session),
+):
+    """Routines, exercises and plan entries created, changed or deleted since ``since``; see ``app.sync``."""
+    try:
+        return json_response(await cambios(session, since, limit))
+    except CursorVencido as error:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(error))
+    except CursorInvalido as error:
+        raise HTTPException(status_code=400, detail=str(error))
@@ -0,0 +1,195 @@
+"""Indexed search over routines and exercises.
+
+PostgreSQL uses ``pg_trgm`` GIN indexes for substring matching and a ``tsvector``
+index for ranked full-text search. SQLite uses FTS5 tables with the trigram
+tokenizer, kept in sync by triggers. Any other dialect falls back to LIKE scans.
+"""
+
+import unicodedata
+
+from sqlalchemy import Engine, column, event, func, literal_column, or_, select, table, text
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models import Ejercicio, Rutina
+
+TRIGRAM_MIN_LENGTH = 3
+
+
+def fold(value: str | None) -> str | None:
+    """Lowercase and strip diacritics ("Día" -> "dia")."""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def _contains(expression, texto: str) -> ColumnElement:
+    return expression.contains(texto, autoescape=True)
+
+
+class LikeSearch:
+    """Unindexed LIKE scans, used for dialects without a dedicated backend."""
+
+    def install(self, connection) -> None:
+        return None
+
+    def rutina_filter(self, texto: str, sin_acentos: bool) -> tuple[list, ColumnElement | None]:
+        return [_contains(func.lower(Rutina.nombre), texto.lower())], None
+
+    def ejercicio_filter(self, texto: str, sin_acentos: bool) -> ColumnElement:
+        return _contains(func.lower(Ejercicio.nombre), texto.lower())
+
+
+class PostgresSearch(LikeSearch):
+    statements = (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        # unaccent() is only STABLE; an IMMUTABLE wrapper is required to index it.
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS "
+        "$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+        "CREATE INDEX IF NOT EXISTS ix_rutina_nombre_trgm "
+        "ON rutina USING gin (f_unaccent(lower(nombre)) gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_rutina_fts ON rutina USING gin "
+        "(to_tsvector('spanish'::regconfig, f_unaccent(coalesce(nombre, '') || ' ' || coalesce(descripcion, ''))))",
+        "CREATE INDEX IF NOT EXISTS ix_ejercicio_nombre_trgm "
+        "ON ejercicio USING gin (f_unaccent(lower(nombre)) gin_trgm_ops)",
+    )
+
+    def install(self, connection) -> None:
+        for statement in self.statements:
+            connection.execute(text(statement))
+
+    @staticmethod
+    def _folded(column_expression) -> ColumnElement:
+        return func.f_unaccent(func.lower(column_expression))
+
+    @staticmethod
+    def _document() -> ColumnElement:
+        # Must match the ix_rutina_fts expression exactly for the index to be used.
+        contenido = (
+            func.coalesce(Rutina.nombre, literal_column("''"))
+            .op("||")(literal_column("' '"))
+            .op("||")(func.coalesce(Rutina.descripcion, literal_column("''")))
+        )
+        return func.to_tsvector(literal_column("'spanish'::regconfig"), func.f_unaccent(contenido))
+
+    def rutina_filter(self, texto: str, sin_acentos: bool) -> tuple[list, ColumnElement | None]:
+        consulta = func.plainto_tsquery(literal_column("'spanish'::regconfig"), fold(texto))
+        documento = self._document()
+        nombre = self._folded(Rutina.nombre)
+
+        substring = _contains(nombre, fold(texto))
+        if not sin_acentos:
+            substring = substring & _contains(func.lower(Rutina.nombre), texto.lower())
+        condicion = or_(substring, documento.op("@@")(consulta))
+        rank = func.ts_rank(documento, consulta) + func.similarity(nombre, fold(texto))
+        return [condicion], rank
+
+    def ejercicio_filter(self, texto: str, sin_acentos: bool) -> ColumnElement:
+        condicion = _contains(self._folded(Ejercicio.nombre), fold(texto))
+        if not sin_acentos:
+            condicion = condicion & _contains(func.lower(Ejercicio.nombre), texto.lower())
+        return condicion
+
+
+class SQLiteSearch(LikeSearch):
+    rutina_fts = table("rutina_fts", column("rowid"))
+    ejercicio_fts = table("ejercicio_fts", column("rowid"))
+
+    statements = (
+        "CREATE TRIGGER IF NOT EXISTS rutina_fts_ai AFTER INSERT ON rutina BEGIN "
+        "INSERT INTO rutina_fts (rowid, nombre, descripcion) "
+        "VALUES (new.id, fold(new.nombre), fold(coalesce(new.descripcion, ''))); END",
+        "CREATE TRIGGER IF NOT EXISTS rutina_fts_ad AFTER DELETE ON rutina BEGIN "
+        "DELETE FROM rutina_fts WHERE rowid = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS rutina_fts_au AFTER UPDATE OF nombre, descripcion ON rutina BEGIN "
+        "UPDATE rutina_fts SET nombre = fold(new.nombre), descripcion = fold(coalesce(new.descripcion, '')) "
+        "WHERE rowid = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS ejercicio_fts_ai AFTER INSERT ON ejercicio BEGIN "
+        "INSERT INTO ejercicio_fts (rowid, nombre) VALUES (new.id, fold(new.nombre)); END",
+        "CREATE TRIGGER IF NOT EXISTS ejercicio_fts_ad AFTER DELETE ON ejercicio BEGIN "
+        "DELETE FROM ejercicio_fts WHERE rowid = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS ejercicio_fts_au AFTER UPDATE OF nombre ON ejercicio BEGIN "
+        "UPDATE ejercicio_fts SET nombre = fold(new.nombre) WHERE rowid = old.id; END",
+    )
+
+    def install(self, connection) -> None:
+        existing = {
+            row[0]
+            for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        }
+        if "rutina_fts" not in existing:
+            connection.execute(
+                text("CREATE VIRTUAL TABLE rutina_fts USING fts5(nombre, descripcion, tokenize = 'trigram')")
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO rutina_fts (rowid, nombre, descripcion) "
+                    "SELECT id, fold(nombre), fold(coalesce(descripcion, '')) FROM rutina"
+                )
+            )
+        if "ejercicio_fts" not in existing:
+            connection.execute(text("CREATE VIRTUAL TABLE ejercicio_fts USING fts5(nombre, tokenize = 'trigram')"))
+            connection.execute(
+                text("INSERT INTO ejercicio_fts (rowid, nombre) SELECT id, fold(nombre) FROM ejercicio")
+            )
+        for statement in self.statements:
+            connection.execute(text(statement))
+
+    @staticmethod
+    def _fts_query(texto: str) -> str:
+        return '"' + fold(texto).replace('"', '""') + '"'
+
+    def _matching_ids(self, fts_table, texto: str):
+        return select(fts_table.c.rowid).where(literal_column(fts_table.name).op("MATCH")(self._fts_query(texto)))
+
+    def rutina_filter(self, texto: str, sin_acentos: bool) -> tuple[list, ColumnElement | None]:
+        if len(fold(texto)) < TRIGRAM_MIN_LENGTH:
+            return super().rutina_filter(texto, sin_acentos)
+
+        condiciones = [Rutina.id.in_(self._matching_ids(self.rutina_fts, texto))]
+        if not sin_acentos:
+            condiciones.append(
+                or_(
+                    _contains(func.lower(Rutina.nombre), texto.lower()),
+                    _contains(func.lower(Rutina.descripcion), texto.lower()),
+                )
+            )
+        rank = (
+            select(-func.bm25(literal_column("rutina_fts"), 10.0, 1.0))
+            .where(
+                literal_column("rutina_fts").op("MATCH")(self._fts_query(texto)),
+                self.rutina_fts.c.rowid == Rutina.id,
+            )
+            .correlate(Rutina)
+            .scalar_subquery()
+        )
+        return condiciones, rank
+
+    def ejercicio_filter(self, texto: str, sin_acentos: bool) -> ColumnElement:
+        if len(fold(texto)) < TRIGRAM_MIN_LENGTH:
+            return super().ejercicio_filter(texto, sin_acentos)
+
+        condicion = Ejercicio.id.in_(self._matching_ids(self.ejercicio_fts, texto))
+        if not sin_acentos:
+            condicion = condicion & _contains(func.lower(Ejercicio.nombre), texto.lower())
+        return condicion
+
+
+_BACKENDS = {"postgresql": PostgresSearch(), "sqlite": SQLiteSearch()}
+_FALLBACK = LikeSearch()
+
+
+def get_search_backend(dialect_name: str) -> LikeSearch:
+    return _BACKENDS.get(dialect_name, _FALLBACK)
+
+
+def configure_engine(engine: Engine) -> None:
+    """Register the ``fold`` SQL function used by the SQLite FTS triggers."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _register_fold(dbapi_connection, connection_record):
+        dbapi_connection.create_function("fold", 1, fold, deterministic=True)
@@ -0,0 +1,84 @@
+"""Response payloads built straight from rows, encoded with orjson.
+
+Rows were validated when they were written. Building ``RutinaRead`` with
+``from_orm`` and letting FastAPI validate and encode the ``response_model``
+again would walk every routine and exercise three times. The handlers use
+these builders and return ``json_response(...)``. FastAPI does not re-check a
+returned ``Response``, so the routes declare ``response_model`` only for the
+OpenAPI schema. The keys come from the read models, which keeps the payloads
+in step with that schema.
+"""
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from app.models import EjercicioRead, PlanSemanal, RutinaList, RutinaRead
+
+CAMPOS_EJERCICIO = tuple(EjercicioRead.model_fields)
+CAMPOS_RUTINA = tuple(campo for campo in RutinaRead.model_fields if campo != "ejercicios")
+CAMPOS_RUTINA_LISTA = tuple(RutinaList.model_fields)
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload) -> bytes:
+    """Encode ``payload``. Dates, enums and models left in it are handled too."""
+    return orjson.dumps(payload, default=_default)
+
+
+class JSONBodyResponse(ORJSONResponse):
+    """orjson response that also accepts pydantic models; the app's default response class."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(payload, status_code: int = 200) -> JSONBodyResponse:
+    return JSONBodyResponse(payload, status_code=status_code)
+
+
+def _campos(instancia, campos: tuple[str, ...]) -> dict:
+    # Loaded column values live in the instance __dict__; reading them there skips the
+    # instrumented attribute, which is most of the cost. Expired ones still go through getattr.
+    valores = instancia.__dict__
+    return {campo: valores[campo] if campo in valores else getattr(instancia, campo) for campo in campos}
+
+
+def ejercicio_dict(ejercicio) -> dict:
+    return _campos(ejercicio, CAMPOS_EJERCICIO)
+
+
+def rutina_dict(
+    rutina, campos: tuple[str, ...] = CAMPOS_RUTINA, campos_ejercicio: tuple[str, ...] | None = CAMPOS_EJERCICIO
+) -> dict:
+    """``RutinaRead`` payload, or the sparse subset in ``campos``; the exercises must already be loaded.
+
+    ``campos_ejercicio=None`` leaves the exercises out.
+    """
+    datos = _campos(rutina, campos)
+    if campos_ejercicio is not None:
+        datos["ejercicios"] = [_campos(ejercicio, campos_ejercicio) for ejercicio in rutina.ejercicios]
+    return datos
+
+
+def rutina_lista_dict(row, campos: tuple[str, ...] = CAMPOS_RUTINA_LISTA) -> dict:
+    """``RutinaList`` payload (or the subset in ``campos``) from a row of the list query."""
+    return {campo: getattr(row, campo) for campo in campos}
+
+
+def plan_dia_dict(dia, entry: PlanSemanal | None, expandir: bool) -> dict:
+    """``PlanDiaRead`` payload, or ``PlanDiaDetalle`` with ``expandir``."""
+    rutina = entry.rutina if entry else None
+    datos = {
+        "dia_semana": dia,
+        "rutina_id": entry.rutina_id if entry else None,
+        "rutina_nombre": rutina.nombre if rutina else None,
+    }
+    if expandir:
+        datos["rutina"] = rutina_dict(rutina) if rutina else None
+    return datos
@@ -0,0 +1,152 @@
+"""Streaming dump of every routine with its exercises (CSV, JSON or NDJSON).
+
+Rows come from a single Rutina LEFT JOIN Ejercicio query read through a
+server-side cursor in batches of ``STREAM_BATCH`` rows, so memory stays flat
+no matter how many routines there are. Plain columns are selected instead of
+ORM entities to keep the identity map out of the loop.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlmodel import select
+
+from app.models import Ejercicio, Rutina
+from app.replicas import replicas
+
+STREAM_BATCH = 1000
+
+RUTINA_COLUMNAS = (Rutina.id, Rutina.nombre, Rutina.descripcion, Rutina.fecha_creacion)
+EJERCICIO_COLUMNAS = (
+    Ejercicio.id,
+    Ejercicio.nombre,
+    Ejercicio.dia_semana,
+    Ejercicio.series,
+    Ejercicio.repeticiones,
+    Ejercicio.peso,
+    Ejercicio.notas,
+    Ejercicio.orden,
+)
+CSV_ENCABEZADO = (
+    "rutina_id",
+    "rutina_nombre",
+    "rutina_descripcion",
+    "rutina_fecha_creacion",
+    "ejercicio_id",
+    "ejercicio_nombre",
+    "dia_semana",
+    "series",
+    "repeticiones",
+    "peso",
+    "notas",
+    "orden",
+)
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def _statement():
+    return (
+        select(*RUTINA_COLUMNAS, *EJERCICIO_COLUMNAS)
+        .select_from(Rutina)
+        .outerjoin(Ejercicio, Ejercicio.rutina_id == Rutina.id)
+        .order_by(Rutina.id, Ejercicio.orden, Ejercicio.id)
+        .execution_options(yield_per=STREAM_BATCH)
+    )
+
+
+async def _filas(primario: bool) -> AsyncIterator[list[tuple]]:
+    # The response outlives the request's session dependency, so the stream opens its own.
+    async with replicas.session(primario) as session:
+        result = await session.stream(_statement())
+        async for lote in result.partitions():
+            yield lote
+
+
+def _fecha(valor: datetime | None) -> str | None:
+    return valor.isoformat() if valor is not None else None
+
+
+def _ejercicio(fila: tuple) -> dict:
+    id_, nombre, dia_semana, series, repeticiones, peso, notas, orden = fila[len(RUTINA_COLUMNAS) :]
+    return {
+        "id": id_,
+        "nombre": nombre,
+        "dia_semana": dia_semana.value if dia_semana is not None else None,
+        "series": series,
+        "repeticiones": repeticiones,
+        "peso": peso,
+        "notas": notas,
+        "orden": orden,
+    }
+
+
+async def _rutinas(primario: bool) -> AsyncIterator[list[dict]]:
+    """Group the ordered join rows back into routines, one batch of complete routines at a time."""
+    actual: dict | None = None
+    async for lote in _filas(primario):
+        listas = []
+        for fila in lote:
+            rutina_id = fila[0]
+            if actual is None or actual["id"] != rutina_id:
+                if actual is not None:
+                    listas.append(actual)
+                actual = {
+                    "id": rutina_id,
+                    "nombre": fila[1],
+                    "descripcion": fila[2],
+                    "fecha_creacion": _fecha(fila[3]),
+                    "ejercicios": [],
+                }
+            if fila[len(RUTINA_COLUMNAS)] is not None:
+                actual["ejercicios"].append(_ejercicio(fila))
+        if listas:
+            yield listas
+    if actual is not None:
+        yield [actual]
+
+
+async def _csv(primario: bool) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_ENCABEZADO)
+    async for lote in _filas(primario):
+        for fila in lote:
+            dia_semana = fila[6]
+            writer.writerow(
+                (
+                    *fila[:3],
+                    _fecha(fila[3]),
+                    *fila[4:6],
+                    dia_semana.value if dia_semana is not None else None,
+                    *fila[7:],
+                )
+            )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def _ndjson(primario: bool) -> AsyncIterator[str]:
+    async for rutinas in _rutinas(primario):
+        yield "".join(json.dumps(rutina, ensure_ascii=False) + "\n" for rutina in rutinas)
+
+
+async def _json(primario: bool) -> AsyncIterator[str]:
+    separador = "["
+    async for rutinas in _rutinas(primario):
+        yield separador + ",".join(json.dumps(rutina, ensure_ascii=False) for rutina in rutinas)
+        separador = ","
+    yield "[]" if separador == "[" else "]"
+
+
+GENERADORES = {"csv": _csv, "json": _json, "ndjson": _ndjson}
+
+
+def volcado(formato: str, primario: bool = False) -> AsyncIterator[str]:
+    """Async iterator producing the full dump in ``formato``, read from a replica unless ``primario``."""
+    return GENERADORES[formato](primario)
@@ -0,0 +1,161 @@
+"""Delta sync: the routines, exercises and plan entries changed since a cursor.
+
+Rows carry ``fecha_modificacion`` and deletes leave a tombstone in
+``eliminacion``, both written by triggers (migration 0005). The cursor holds
+one ``(fecha, id)`` keyset position per source, so every source is read with
+one range query on its ``(fecha_modificacion, id)`` index, and a page never
+splits rows that share a timestamp.
+
+A row becomes visible when its transaction commits, which can be after later
+stamped rows. The cursor therefore never moves past the *horizon*. On
+PostgreSQL that is the start of the oldest write transaction still in flight.
+On SQLite it is the database clock minus ``SYNC_MARGIN_SECONDS``. Changes
+newer than the horizon are sent, then sent again on the next sync. Clients
+apply a response idempotently: deletes first, then upserts.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import DateTime, delete, literal_column, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_engine
+from app.models import Eliminacion, Ejercicio, EjercicioSync, PlanSemanal, PlanSync, Rutina, RutinaSync
+
+logger = logging.getLogger("app.sync")
+
+HORIZONTE_POSTGRES = (
+    "(least(clock_timestamp(), (SELECT min(xact_start) FROM pg_stat_activity "
+    "WHERE datname = current_database() AND backend_xid IS NOT NULL)) AT TIME ZONE 'UTC')"
+)
+HORIZONTE_SQLITE = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+PURGA_INTERVALO = 3600
+
+Posicion = tuple[datetime, int]
+INICIO: Posicion = (datetime(1970, 1, 1), 0)
+
+
+class Fuente(NamedTuple):
+    clave: str
+    modelo: type
+    campos: tuple[str, ...]
+    fecha: str
+
+    def columnas(self) -> list:
+        return [getattr(self.modelo, campo) for campo in self.campos]
+
+
+FUENTES = (
+    Fuente("rutinas", Rutina, tuple(RutinaSync.model_fields), "fecha_modificacion"),
+    Fuente("ejercicios", Ejercicio, tuple(EjercicioSync.model_fields), "fecha_modificacion"),
+    Fuente("plan", PlanSemanal, tuple(PlanSync.model_fields), "fecha_modificacion"),
+)
+ELIMINADOS = Fuente("eliminados", Eliminacion, ("id", "tabla", "fila_id", "fecha_eliminacion"), "fecha_eliminacion")
+# eliminacion.tabla -> key of the response's "eliminados".
+CLAVE_TABLA = {"rutina": "rutinas", "ejercicio": "ejercicios", "plansemanal": "plan"}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class CursorVencido(CursorInvalido):
+    """The cursor predates the tombstone retention; the client must sync from scratch."""
+
+
+def encode_cursor(posiciones: dict[str, Posicion]) -> str:
+    datos = {clave: [fecha.isoformat(), fila_id] for clave, (fecha, fila_id) in posiciones.items()}
+    return base64.urlsafe_b64encode(json.dumps(datos, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Posicion]:
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return {
+            fuente.clave: (datetime.fromisoformat(datos[fuente.clave][0]), int(datos[fuente.clave][1]))
+            for fuente in (*FUENTES, ELIMINADOS)
+        }
+    except (ValueError, TypeError, KeyError, IndexError, UnicodeDecodeError):
+        raise CursorInvalido("Cursor inválido")
+
+
+async def horizonte(session: AsyncSession) -> datetime:
+    """Position no uncommitted change can precede; see the module docstring."""
+    if session.get_bind().dialect.name == "postgresql":
+        return (await session.exec(select(literal_column(HORIZONTE_POSTGRES, DateTime)))).one()
+    ahora = (await session.exec(select(literal_column(HORIZONTE_SQLITE, DateTime)))).one()
+    return ahora - timedelta(seconds=settings.sync_margin_seconds)
+
+
+async def cambios(session: AsyncSession, cursor: str | None, limite: int) -> dict:
+    """``SyncResponse`` payload with up to ``limite`` changes per source after ``cursor``; one statement per source.
+
+    Without ``cursor`` every row is returned (paged) and only deletes from now on are reported.
+    """
+    tope: Posicion = (await horizonte(session), 0)
+    if cursor is None:
+        posiciones = {fuente.clave: INICIO for fuente in FUENTES} | {ELIMINADOS.clave: tope}
+    else:
+        posiciones = decode_cursor(cursor)
+        if posiciones[ELIMINADOS.clave][0] < tope[0] - timedelta(days=settings.sync_tombstone_days):
+            raise CursorVencido("El cursor es anterior a la retención de eliminaciones; sincronice desde cero")
+
+    datos: dict = {"eliminados": {clave: [] for clave in CLAVE_TABLA.values()}}
+    hay_mas = False
+    for fuente in (*FUENTES, ELIMINADOS):
+        fecha, fila_id = getattr(fuente.modelo, fuente.fecha), fuente.modelo.id
+        statement = (
+            select(*fuente.columnas())
+            .where(tuple_(fecha, fila_id) > tuple_(*posiciones[fuente.clave]))
+            .order_by(fecha, fila_id)
+            .limit(limite + 1)
+        )
+        filas = (await session.exec(statement)).all()
+        truncada = len(filas) > limite
+        filas = filas[:limite]
+
+        if fuente is ELIMINADOS:
+            for fila in filas:
+                datos["eliminados"][CLAVE_TABLA[fila.tabla]].append(fila.fila_id)
+        else:
+            datos[fuente.clave] = [dict(fila._mapping) for fila in filas]
+
+        previa = posiciones[fuente.clave]
+        if truncada:
+            ultima = (getattr(filas[-1], fuente.fecha), filas[-1].id)
+            posiciones[fuente.clave] = max(previa, min(ultima, tope))
+            # Past the horizon the next page would repeat this one; the client picks it up on its next sync.
+            hay_mas = hay_mas or ultima < tope
+        else:
+            posiciones[fuente.clave] = max(previa, tope)
+
+    datos["cursor"] = encode_cursor(posiciones)
+    datos["hay_mas"] = hay_mas
+    return datos
+
+
+async def purgar_eliminaciones() -> int:
+    """Delete tombstones older than ``SYNC_TOMBSTONE_DAYS``; return how many were removed."""
+    limite = datetime.utcnow() - timedelta(days=settings.sync_tombstone_days)
+    async with AsyncSession(async_engine) as session:
+        resultado = await session.exec(delete(Eliminacion).where(Eliminacion.fecha_eliminacion < limite))
+        await session.commit()
+    return resultado.rowcount
+
+
+async def purgar_periodicamente() -> None:
+    while True:
+        # Sleep first: nothing is due at startup, and a purge cut short by shutdown would leave its connection behind.
+        await asyncio.sleep(PURGA_INTERVALO)
+        try:
+            await purgar_eliminaciones()
+        except SQLAlchemyError:
+            logger.warning("Could not purge sync tombstones", exc_info=True)
@@ -0,0 +1,110 @@
+"""Compare sync (threadpool) and async request handling under high concurrency.
+
+Seeds the configured database, then drives ``GET /api/rutinas/{id}`` and
+``GET /api/rutinas/`` in-process through the ASGI transport, once against the
+async routers and once against equivalent sync handlers bound to the sync engine.
+
+    python -m bench.async_vs_sync --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlmodel import Session, func, select
+
+from app.database import engine, get_sync_session, init_db
+from app.models import DiaSemana, Ejercicio, Rutina, RutinaList, RutinaListResponse, RutinaRead
+from app.serialization import CAMPOS_RUTINA_LISTA
+from main import app as async_app
+
+sync_app = FastAPI()
+
+
+@sync_app.get("/api/rutinas/{rutina_id}", response_model=RutinaRead)
+def obtener_rutina_sync(rutina_id: int, session: Session = Depends(get_sync_session)):
+    rutina = session.get(Rutina, rutina_id)
+    if not rutina:
+        raise HTTPException(status_code=404, detail="Rutina no encontrada")
+    rutina.ejercicios = session.exec(
+        select(Ejercicio).where(Ejercicio.rutina_id == rutina.id).order_by(Ejercicio.orden)
+    ).all()
+    return RutinaRead.from_orm(rutina)
+
+
+@sync_app.get("/api/rutinas/", response_model=RutinaListResponse)
+def listar_rutinas_sync(limit: int = 50, session: Session = Depends(get_sync_session)):
+    # The async list's statement: the page's columns and the total in one round trip, no per-row loads.
+    total = select(func.count(Rutina.id)).scalar_subquery().label("total")
+    columnas = [getattr(Rutina, campo) for campo in CAMPOS_RUTINA_LISTA]
+    filas = session.exec(select(*columnas, total).order_by(Rutina.id).limit(limit + 1)).all()
+    items = [RutinaList.model_validate(fila._mapping) for fila in filas[:limit]]
+    return RutinaListResponse(items=items, total=filas[0].total if filas else 0, skip=0, limit=limit)
+
+
+def seed(rutinas: int, ejercicios: int) -> list[int]:
+    init_db()
+    with Session(engine) as session:
+        existing = session.exec(select(Rutina.id).where(Rutina.nombre.startswith("bench-"))).all()
+        if len(existing) >= rutinas:
+            return list(existing[:rutinas])
+        dias = list(DiaSemana)
+        for index in range(len(existing), rutinas):
+            rutina = Rutina(nombre=f"bench-{index}", descripcion="Rutina de benchmark")
+            rutina.ejercicios = [
+                Ejercicio(nombre=f"Ejercicio {n}", dia_semana=dias[n % 7], series=4, repeticiones=10, orden=n)
+                for n in range(ejercicios)
+            ]
+            session.add(rutina)
+        session.commit()
+        return list(session.exec(select(Rutina.id).where(Rutina.nombre.startswith("bench-"))).all())
+
+
+async def drive(app, urls: list[str], concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            response = await client.get(queue.get_nowait())
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rutinas", type=int, default=200)
+    parser.add_argument("--ejercicios", type=int, default=20)
+    args = parser.parse_args()
+
+    ids = seed(args.rutinas, args.ejercicios)
+    urls = [
+        f"/api/rutinas/{ids[n % len(ids)]}" if n % 4 else "/api/rutinas/?limit=50" for n in range(args.requests)
+    ]
+
+    async def run():
+        results = {}
+        for name, app in (("sync", sync_app), ("async", async_app)):
+            await drive(app, urls[:50], 10)  # warm up pools and caches
+            elapsed = await drive(app, urls, args.concurrency)
+            results[name] = args.requests / elapsed
+        return results
+
+    results = asyncio.run(run())
+    for name, throughput in results.items():
+        print(f"{name:>5}: {throughput:8.1f} req/s ({args.requests} requests, concurrency {args.concurrency})")
+    print(f"async/sync: {results['async'] / results['sync']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Load-test every API endpoint in-process against a synthetic dataset.
+
+Seeds ``--rutinas`` routines with ``--ejercicios`` exercises each and a full
+weekly plan, then drives each scenario through the ASGI transport at
+``--concurrency``. Reports throughput, p50/p95/p99 latency and SQL statements
+per request, and writes the results as JSON so runs can be compared:
+
+    python -m bench.endpoints --rutinas 2000 --ejercicios 30 --output bench/resultados/base.json
+    python -m bench.endpoints --comparar bench/resultados/base.json
+
+Without ``DATABASE_URL`` (or ``--database-url``) it runs against a SQLite file
+in the temp directory. The response cache is disabled unless ``--cache`` is given.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import httpx
+
+PALABRAS = ("fuerza", "hipertrofia", "resistencia", "movilidad", "potencia", "cardio", "piernas", "empuje", "tirón")
+PREFIJO = "bench-"
+
+
+@dataclass
+class Peticion:
+    method: str
+    url: str
+    json: dict | list | None = None
+
+
+@dataclass
+class Dataset:
+    rutinas: list[int]
+    ejercicios: dict[int, list[int]]
+    versiones: dict[int, int]
+    reordenadas: int = 0
+
+
+Escenario = Callable[[random.Random, Dataset], Peticion]
+
+
+def _reordenar(rng: random.Random, data: Dataset) -> Peticion:
+    # Round-robin, sending the version the previous reorder of the routine left. A routine
+    # is only revisited when a run sends more reorders than --rutinas; if the earlier
+    # request is still in flight then, the later one gets 409 and counts as an error.
+    rutina_id = data.rutinas[data.reordenadas % len(data.rutinas)]
+    data.reordenadas += 1
+    ids = data.ejercicios[rutina_id][:]
+    rng.shuffle(ids)
+    items = [{"id": ejercicio_id, "orden": orden} for orden, ejercicio_id in enumerate(ids)]
+    version = data.versiones[rutina_id]
+    data.versiones[rutina_id] += 1
+    return Peticion("PUT", f"/api/rutinas/{rutina_id}/ejercicios/reordenar", {"items": items, "version": version})
+
+
+ESCENARIOS: dict[str, Escenario] = {
+    "listar": lambda rng, data: Peticion("GET", f"/api/rutinas/?limit=50&skip={rng.randrange(0, len(data.rutinas))}"),
+    "listar_filtro": lambda rng, data: Peticion(
+        "GET", f"/api/rutinas/?limit=50&dia_semana=Lunes&skip={rng.randrange(0, len(data.rutinas) // 2)}"
+    ),
+    "buscar": lambda rng, data: Peticion("GET", f"/api/rutinas/buscar?nombre={rng.choice(PALABRAS)}&limit=20"),
+    "detalle": lambda rng, data: Peticion("GET", f"/api/rutinas/{rng.choice(data.rutinas)}"),
+    "reordenar": _reordenar,
+    "duplicar": lambda rng, data: Peticion("POST", f"/api/rutinas/{rng.choice(data.rutinas)}/duplicar"),
+    "plan": lambda rng, data: Peticion("GET", "/api/plan/"),
+    "plan_expandido": lambda rng, data: Peticion("GET", "/api/plan/?expand=ejercicios"),
+    "plan_hoy": lambda rng, data: Peticion("GET", "/api/plan/hoy"),
+    "export_pdf": lambda rng, data: Peticion("GET", f"/api/rutinas/{rng.choice(data.rutinas)}/export"),
+}
+
+
+def seed(rutinas: int, ejercicios: int) -> Dataset:
+    """Create the synthetic dataset, reusing it when a previous run already did."""
+    from sqlalchemy import delete, insert
+    from sqlmodel import Session, select
+
+    from app.database import engine, init_db
+    from app.models import DiaSemana, Ejercicio, PlanSemanal, Rutina
+
+    init_db()
+    rng = random.Random(0)
+    dias = list(DiaSemana)
+    with Session(engine) as session:
+        # Copies left by the "duplicar" scenario of a previous run.
+        copias = select(Rutina.id).where(Rutina.nombre.startswith(PREFIJO), Rutina.nombre.contains("(copia"))
+        session.exec(delete(Ejercicio).where(Ejercicio.rutina_id.in_(copias)))
+        session.exec(delete(Rutina).where(Rutina.id.in_(copias)))
+
+        existentes = session.exec(select(Rutina.id).where(Rutina.nombre.startswith(PREFIJO))).all()
+        if len(existentes) < rutinas:
+            filas = [
+                {
+                    "nombre": f"{PREFIJO}{index:06d} {rng.choice(PALABRAS)}",
+                    "descripcion": f"Rutina de {rng.choice(PALABRAS)} y {rng.choice(PALABRAS)}",
+                    "fecha_creacion": datetime.utcnow(),
+                }
+                for index in range(len(existentes), rutinas)
+            ]
+            nuevas = session.exec(insert(Rutina).returning(Rutina.id), params=filas).scalars().all()
+            session.exec(
+                insert(Ejercicio),
+                params=[
+                    {
+                        "rutina_id": rutina_id,
+                        "nombre": f"{rng.choice(PALABRAS).capitalize()} {n}",
+                        "dia_semana": dias[n % len(dias)],
+                        "series": 4,
+                        "repeticiones": 10,
+                        "peso": float(rng.randrange(0, 100)),
+                        "orden": n,
+                    }
+                    for rutina_id in nuevas
+                    for n in range(ejercicios)
+                ],
+            )
+        ids = sorted(session.exec(select(Rutina.id).where(Rutina.nombre.startswith(PREFIJO))).all())[:rutinas]
+
+        session.exec(delete(PlanSemanal))
+        session.exec(
+            insert(PlanSemanal), params=[{"dia_semana": dia, "rutina_id": ids[index]} for index, dia in enumerate(dias)]
+        )
+        session.commit()
+
+        por_rutina: dict[int, list[int]] = {rutina_id: [] for rutina_id in ids}
+        for ejercicio_id, rutina_id in session.exec(
+            select(Ejercicio.id, Ejercicio.rutina_id).where(Ejercicio.rutina_id.in_(ids))
+        ):
+            por_rutina[rutina_id].append(ejercicio_id)
+        versiones = dict(session.exec(select(Rutina.id, Rutina.version).where(Rutina.id.in_(ids))).all())
+    return Dataset(rutinas=ids, ejercicios=por_rutina, versiones=versiones)
+
+
+class ContadorSQL:
+    """Counts statements on the async engine; scenarios run one at a time, so totals divide cleanly."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.total = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args) -> None:
+        self.total += 1
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+async def correr(app, peticiones: list[Peticion], concurrency: int) -> tuple[list[float], int, float]:
+    """Send ``peticiones`` with ``concurrency`` workers; return latencies (s), errors and elapsed time."""
+    transport = httpx.ASGITransport(app=app)
+    pendientes = iter(peticiones)
+    latencias: list[float] = []
+    errores = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errores
+        for peticion in pendientes:
+            inicio = time.perf_counter()
+            response = await client.request(peticion.method, peticion.url, json=peticion.json)
+            latencias.append(time.perf_counter() - inicio)
+            if response.status_code >= 400:
+                errores += 1
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return latencias, errores, time.perf_counter() - inicio
+
+
+async def ejecutar(args: argparse.Namespace, data: Dataset) -> dict:
+    from app.cache import response_cache
+    from app.database import async_engine
+    from app.exports import export_manager
+    from main import app
+
+    response_cache.enabled = args.cache
+    contador = ContadorSQL(async_engine)
+    rng = random.Random(args.seed)
+    resultados = {}
+    try:
+        for nombre in args.escenarios:
+            generar = ESCENARIOS[nombre]
+            await correr(app, [generar(rng, data) for _ in range(min(20, args.requests))], 5)  # warm up
+            peticiones = [generar(rng, data) for _ in range(args.requests)]
+            antes = contador.total
+            latencias, errores, elapsed = await correr(app, peticiones, args.concurrency)
+            ms = [latencia * 1000 for latencia in latencias]
+            resultados[nombre] = {
+                "requests": len(latencias),
+                "errores": errores,
+                "throughput": round(len(latencias) / elapsed, 1),
+                "p50_ms": round(_percentil(ms, 50), 2),
+                "p95_ms": round(_percentil(ms, 95), 2),
+                "p99_ms": round(_percentil(ms, 99), 2),
+                "media_ms": round(statistics.fmean(ms), 2),
+                "sql_por_request": round((contador.total - antes) / len(latencias), 2),
+            }
+            print(_linea(nombre, resultados[nombre]), flush=True)
+    finally:
+        export_manager.shutdown()
+    return resultados
+
+
+def _linea(nombre: str, r: dict) -> str:
+    return (
+        f"{nombre:>15}: {r['throughput']:8.1f} req/s  p50 {r['p50_ms']:7.2f}  p95 {r['p95_ms']:7.2f}  "
+        f"p99 {r['p99_ms']:7.2f} ms  sql/req {r['sql_por_request']:5.2f}  errores {r['errores']}"
+    )
+
+
+def _commit() -> str | None:
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return salida.stdout.strip()
+
+
+def comparar(actual: dict, previo: dict) -> None:
+    print(f"\nComparación con {previo['meta'].get('commit')} ({previo['meta'].get('fecha')}):")
+    for nombre, r in actual["escenarios"].items():
+        anterior = previo["escenarios"].get(nombre)
+        if anterior is None:
+            continue
+        cambios = []
+        for campo in ("throughput", "p95_ms", "sql_por_request"):
+            if anterior[campo]:
+                cambios.append(f"{campo} {(r[campo] - anterior[campo]) / anterior[campo] * 100:+6.1f}%")
+        print(f"{nombre:>15}: " + "  ".join(cambios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rutinas", type=int, default=2000)
+    parser.add_argument("--ejercicios", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=200, help="requests por escenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--escenarios", nargs="+", choices=list(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument("--cache", action="store_true", help="deja activa la caché de respuestas")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output", type=Path, help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", type=Path, help="resultados JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    # Settings are read on import, so the database must be chosen before importing the app.
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.gettempdir()) / 'rutinas_bench.db'}")
+
+    inicio = time.perf_counter()
+    data = seed(args.rutinas, args.ejercicios)
+    print(f"Dataset: {len(data.rutinas)} rutinas x {args.ejercicios} ejercicios ({time.perf_counter() - inicio:.1f}s)")
+
+    resultados = {
+        "meta": {
+            "commit": _commit(),
+            "fecha": datetime.utcnow().isoformat(timespec="seconds"),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "python": platform.python_version(),
+            "rutinas": len(data.rutinas),
+            "ejercicios": args.ejercicios,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": args.cache,
+        },
+        "escenarios": asyncio.run(ejecutar(args, data)),
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(resultados, indent=2) + "\n")
+        print(f"Resultados guardados en {args.output}")
+    if args.comparar:
+        comparar(resultados, json.loads(args.comparar.read_text()))
+    if any(r["errores"] for r in resultados["escenarios"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
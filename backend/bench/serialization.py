@@ -0,0 +1,131 @@
+"""Microbenchmark of response serialization, without a database.
+
+Builds a ``RutinaRead`` payload (one routine with ``--ejercicios`` exercises)
+and a ``RutinaListResponse`` page (``--items`` rows) from in-memory objects.
+It then times the previous path against the current one:
+
+- ``from_orm``: ``RutinaRead.from_orm``, then FastAPI's ``response_model``
+  validation, ``jsonable_encoder`` and the standard ``json`` encoder.
+- ``directo``: the ``app.serialization`` builders and orjson.
+
+    python -m bench.serialization --ejercicios 100 --items 200
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import DiaSemana, Ejercicio, Rutina, RutinaList, RutinaListResponse, RutinaRead
+from app.serialization import dumps, rutina_dict, rutina_lista_dict
+
+
+def _rutina(ejercicios: int) -> Rutina:
+    dias = list(DiaSemana)
+    rutina = Rutina(id=1, nombre="Fuerza", descripcion="Rutina de benchmark", fecha_creacion=datetime.utcnow())
+    rutina.ejercicios = [
+        Ejercicio(
+            id=n + 1,
+            rutina_id=1,
+            nombre=f"Ejercicio {n}",
+            dia_semana=dias[n % len(dias)],
+            series=4,
+            repeticiones=10,
+            peso=float(n),
+            notas="Controlar la bajada" if n % 3 == 0 else None,
+            orden=n,
+        )
+        for n in range(ejercicios)
+    ]
+    return rutina
+
+
+def _filas(items: int) -> list[SimpleNamespace]:
+    """Rows shaped like the ones the list query returns."""
+    ahora = datetime.utcnow()
+    return [
+        SimpleNamespace(
+            id=n, nombre=f"Rutina {n}", descripcion="Rutina de benchmark", fecha_creacion=ahora, total_ejercicios=30
+        )
+        for n in range(items)
+    ]
+
+
+async def _serializar(field, contenido) -> bytes:
+    """What FastAPI does with a handler's return value when the route has a ``response_model``."""
+    return JSONResponse(await serialize_response(field=field, response_content=contenido)).body
+
+
+def _medir(funcion: Callable[[], object], repeticiones: int) -> float:
+    """Median seconds per call."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def _correr_async(coroutine_factory) -> Callable[[], object]:
+    def correr():
+        coroutine = coroutine_factory()
+        try:
+            coroutine.send(None)
+        except StopIteration as fin:
+            # serialize_response only awaits threadpool work for sync handlers, so it never suspends here.
+            return fin.value
+        raise RuntimeError("serialize_response suspended")
+
+    return correr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ejercicios", type=int, default=100)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--repeticiones", type=int, default=300)
+    args = parser.parse_args()
+
+    rutina = _rutina(args.ejercicios)
+    filas = _filas(args.items)
+    campo_rutina = create_response_field(name="response", type_=RutinaRead)
+    campo_lista = create_response_field(name="response", type_=RutinaListResponse)
+
+    def lista_from_orm():
+        items = [RutinaList(**vars(fila)) for fila in filas]
+        return RutinaListResponse(items=items, total=len(filas), skip=0, limit=len(filas), next_cursor=None)
+
+    def lista_directa():
+        items = [rutina_lista_dict(fila) for fila in filas]
+        return {"items": items, "total": len(filas), "skip": 0, "limit": len(filas), "next_cursor": None}
+
+    casos = {
+        f"RutinaRead ({args.ejercicios} ejercicios)": (
+            _correr_async(lambda: _serializar(campo_rutina, RutinaRead.from_orm(rutina))),
+            lambda: dumps(rutina_dict(rutina)),
+        ),
+        f"RutinaListResponse ({args.items} items)": (
+            _correr_async(lambda: _serializar(campo_lista, lista_from_orm())),
+            lambda: dumps(lista_directa()),
+        ),
+    }
+    for nombre, (anterior, directo) in casos.items():
+        # Same document either way; only the byte layout may differ.
+        assert json.loads(anterior()) == json.loads(directo()), nombre
+        t_anterior = _medir(anterior, args.repeticiones)
+        t_directo = _medir(directo, args.repeticiones)
+        print(
+            f"{nombre:>34}: from_orm {t_anterior * 1e6:9.1f} us  directo {t_directo * 1e6:9.1f} us  "
+            f"x{t_anterior / t_directo:5.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
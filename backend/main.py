@@ -1,17 +1,47 @@
+import asyncio
+import logging
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
 
-from app.database import init_db
-from app.routers import ejercicios_router, rutinas_router
+from app.admision import admision_status
+from app.cache import response_cache
+from app.config import settings
+from app.database import QueryBudgetExceeded, ensure_schema, ping_database, pool_status, track_queries
+from app.eventos import difusor, iniciar_puente
+from app.exports import export_manager
+from app.metrics import MetricsMiddleware, metrics
+from app.pdf_cache import pdf_cache
+from app.replicas import ReadYourWritesMiddleware, replicas
+from app.serialization import JSONBodyResponse
+from app.sync import purgar_periodicamente
+from app.routers import ejercicios_router, eventos_router, exportaciones_router, rutinas_router, sync_router
 from app.routers.plan import router as plan_router
 
+budget_logger = logging.getLogger("app.query_budget")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    await ensure_schema()
+    limpieza = asyncio.create_task(export_manager.limpiar_periodicamente())
+    volcado_metricas = asyncio.create_task(metrics.flush_periodically())
+    purga = asyncio.create_task(purgar_periodicamente())
+    puente = iniciar_puente()
     yield
+    if puente is not None:
+        puente.cancel()
+    limpieza.cancel()
+    purga.cancel()
+    volcado_metricas.cancel()
+    metrics.flush()
+    export_manager.shutdown()
 
 
 app = FastAPI(
@@ -19,6 +49,7 @@ app = FastAPI(
     description="API RESTful para administrar rutinas de entrenamiento y ejercicios",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=JSONBodyResponse,
 )
 
 app.add_middleware(
@@ -29,9 +60,83 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+class QueryTimingMiddleware:
+    """Count and time the SQL of each request; report it in ``Server-Timing`` and check query budgets."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        replaced = False
+        response_started = False
+        with track_queries(scope) as stats:
+
+            async def send_with_timing(message):
+                nonlocal replaced, response_started
+                if replaced:
+                    return
+                if message["type"] == "http.response.start":
+                    response_started = True
+                    headers = MutableHeaders(scope=message)
+                    if stats.over_budget:
+                        budget_logger.warning("%s ran %d queries (budget %d)", stats.route, stats.count, stats.budget)
+                        if settings.query_budget_strict:
+                            if not stats.committed:
+                                replaced = True
+                                await _budget_error(stats, started)(scope, receive, send)
+                                return
+                            # The work is saved; a 500 would tell the client otherwise. Flag it for the test run.
+                            headers["X-Query-Budget-Exceeded"] = f"{stats.count}/{stats.budget}"
+                    headers.update(_timing_headers(stats, started))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            except QueryBudgetExceeded:
+                # Raised before COMMIT (strict mode), so nothing was saved.
+                budget_logger.warning("%s ran %d queries (budget %d)", stats.route, stats.count, stats.budget)
+                if response_started:
+                    raise
+                await _budget_error(stats, started)(scope, receive, send)
+
+
+def _budget_error(stats, started: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"detail": f"Se ejecutaron {stats.count} consultas (máximo {stats.budget})"},
+        headers=_timing_headers(stats, started),
+    )
+
+
+def _timing_headers(stats, started: float) -> dict[str, str]:
+    return {
+        "Server-Timing": (
+            f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+            f"app;dur={(time.perf_counter() - started) * 1000:.2f}"
+        ),
+        "X-Query-Count": str(stats.count),
+    }
+
+
+app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=settings.db_replica_sticky_seconds)
+# Inner to QueryTimingMiddleware, so the request's query stats are still set when metrics are recorded.
+app.add_middleware(
+    MetricsMiddleware, metrics=metrics, routes_app=app, long_lived_routes=frozenset({"/api/eventos/"})
+)
+app.add_middleware(QueryTimingMiddleware)
+
 app.include_router(rutinas_router, prefix="/api/rutinas", tags=["Rutinas"])
 app.include_router(ejercicios_router, prefix="/api/ejercicios", tags=["Ejercicios"])
 app.include_router(plan_router, prefix="/api/plan", tags=["Plan Semanal"])
+app.include_router(exportaciones_router, prefix="/api/exportaciones", tags=["Exportaciones"])
+app.include_router(sync_router, prefix="/api/sync", tags=["Sincronización"])
+app.include_router(eventos_router, prefix="/api/eventos", tags=["Eventos"])
 
 
 @app.get("/", tags=["Raiz"])
@@ -43,3 +148,56 @@ def root():
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/health/pool", tags=["Raiz"])
+def pool_health():
+    return pool_status()
+
+
+@app.get("/health/replicas", tags=["Raiz"])
+def replicas_health():
+    return replicas.status()
+
+
+@app.get("/health/cache", tags=["Raiz"])
+def cache_health():
+    return response_cache.stats()
+
+
+@app.get("/health/pdf-cache", tags=["Raiz"])
+def pdf_cache_health():
+    return pdf_cache.stats()
+
+
+@app.get("/health/admision", tags=["Raiz"])
+def admision_health():
+    return admision_status()
+
+
+@app.get("/health/eventos", tags=["Raiz"])
+def eventos_health():
+    return difusor.status()
+
+
+@app.get("/metrics", tags=["Raiz"], response_class=PlainTextResponse)
+async def metrics_endpoint():
+    contenido = await run_in_threadpool(metrics.render)
+    return PlainTextResponse(contenido, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/ready", tags=["Raiz"])
+async def readiness_check():
+    pool = pool_status()
+    if pool.get("saturated"):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "reason": "pool_exhausted", "pool": pool},
+        )
+    try:
+        await asyncio.wait_for(ping_database(), timeout=settings.db_ready_timeout)
+    except (asyncio.TimeoutError, SQLAlchemyError, OSError):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "reason": "database_unreachable"},
+        )
+    return {"status": "ready"}
@@ -0,0 +1,63 @@
+"""Shared fixtures: the app on a fresh SQLite database in a temporary directory.
+
+Settings are read when ``app.config`` is imported, so the environment is set
+here, before any test module imports the app. The database is migrated to
+head, query budgets run in strict mode, and the response cache is off so
+every request reaches the database.
+"""
+
+import os
+import tempfile
+import uuid
+
+import httpx
+import pytest
+
+_directorio = tempfile.mkdtemp(prefix="rutinas_tests_")
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("METRICS_DIR", None)
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_directorio}/rutinas.db",
+    DB_MIGRATE_ON_STARTUP="true",
+    QUERY_BUDGET_STRICT="true",
+    RESPONSE_CACHE_ENABLED="false",
+    EXPORT_SPOOL_DIR=os.path.join(_directorio, "exports"),
+    PDF_CACHE_DIR=os.path.join(_directorio, "pdf_cache"),
+)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client():
+    """HTTP client for the app; session-scoped, so every test runs on one event loop and one engine pool."""
+    from app.database import async_engine, ensure_schema
+    from app.exports import export_manager
+    from main import app
+
+    # ASGITransport runs no lifespan, so the PDF worker pool is shut down here.
+    await ensure_schema()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    export_manager.shutdown()
+    await async_engine.dispose()
+
+
+@pytest.fixture
+def crear_rutina(client):
+    """Create a routine with a unique name; ``dias`` lists the day of each exercise."""
+
+    async def crear(dias=("Lunes", "Lunes", "Miércoles"), **datos):
+        ejercicios = [
+            {"nombre": f"Ejercicio {indice}", "dia_semana": dia, "series": 3, "repeticiones": 10, "orden": indice}
+            for indice, dia in enumerate(dias)
+        ]
+        payload = {"nombre": f"Rutina {uuid.uuid4().hex[:12]}", "ejercicios": ejercicios, **datos}
+        response = await client.post("/api/rutinas/", json=payload)
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return crear
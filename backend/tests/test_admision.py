@@ -0,0 +1,89 @@
+"""Admission control: queue limits, wait timeouts and slots handed back."""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admision import Limitador, admitido, limitadores
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def limitador(monkeypatch):
+    """One slot, one place in the queue and a short wait, registered as "prueba"."""
+    limitador = Limitador("prueba", limite=1, cola=1, espera=0.05)
+    monkeypatch.setitem(limitadores, "prueba", limitador)
+    return limitador
+
+
+def libre(limitador: Limitador) -> bool:
+    return not limitador._semaforo.locked() and limitador.en_curso == 0 and limitador.esperando == 0
+
+
+async def test_cola_llena(limitador):
+    await limitador.entrar()
+    en_cola = asyncio.ensure_future(limitador.entrar())
+    await asyncio.sleep(0)
+    assert limitador.esperando == 1
+
+    with pytest.raises(HTTPException) as error:
+        await limitador.entrar()
+    assert error.value.status_code == 503
+    assert "Retry-After" in error.value.headers
+
+    limitador.salir()
+    await en_cola
+    limitador.salir()
+    assert libre(limitador)
+    assert limitador.rechazados == 1
+
+
+async def test_espera_agotada(limitador):
+    await limitador.entrar()
+    with pytest.raises(HTTPException) as error:
+        await limitador.entrar()
+    assert error.value.status_code == 503
+    limitador.salir()
+    assert libre(limitador)
+
+
+async def test_cancelar_en_cola_no_pierde_lugares(limitador):
+    await limitador.entrar()
+    en_cola = asyncio.ensure_future(limitador.entrar())
+    await asyncio.sleep(0)
+    # The slot is released and the waiter cancelled in the same tick: its wakeup must not be lost.
+    limitador.salir()
+    en_cola.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await en_cola
+    assert libre(limitador)
+
+    await limitador.entrar()
+    limitador.salir()
+    assert libre(limitador)
+
+
+async def test_un_error_devuelve_el_lugar(limitador):
+    with pytest.raises(RuntimeError):
+        async with admitido("prueba"):
+            assert limitador.en_curso == 1
+            raise RuntimeError("falla el handler")
+    assert libre(limitador)
+
+
+async def test_carrera_con_la_espera(limitador):
+    # Many waiters whose deadline races the releases; every slot comes back.
+    limitador.cola = 100
+
+    async def pedir():
+        try:
+            async with admitido("prueba"):
+                await asyncio.sleep(0.01)
+        except HTTPException:
+            pass
+
+    await asyncio.gather(*(pedir() for _ in range(50)))
+    assert libre(limitador)
+    assert limitador._semaforo._value == 1
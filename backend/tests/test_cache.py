@@ -0,0 +1,100 @@
+"""Response cache: keys, ETags and invalidation on write."""
+
+import pytest
+from starlette.requests import Request
+
+from app.cache import MemoryCacheBackend, ResponseCache, response_cache, rutina_tag
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """The app's response cache, enabled (conftest turns it off) and empty for the test."""
+    monkeypatch.setattr(response_cache, "enabled", True)
+    response_cache.backend.clear()
+    yield response_cache
+    response_cache.backend.clear()
+
+
+async def test_un_valor_no_se_hace_pasar_por_otra_consulta(client, crear_rutina, cache):
+    rutina = await crear_rutina()
+    nombre = rutina["ejercicios"][0]["nombre"]
+    # One parameter whose value spells "&limit=1": it must not share the key of the two-parameter query.
+    envenenada = await client.get(f"/api/rutinas/?ejercicio_nombre={nombre}%26limit%3D1")
+    assert envenenada.status_code == 200, envenenada.text
+    assert envenenada.json()["items"] == []
+
+    response = await client.get("/api/rutinas/", params={"ejercicio_nombre": nombre, "limit": 1})
+    assert response.json()["items"] != []
+
+
+async def test_etag_y_304(client, crear_rutina, cache):
+    rutina = await crear_rutina()
+    primera = await client.get(f"/api/rutinas/{rutina['id']}")
+    assert primera.status_code == 200
+    etag = primera.headers["etag"]
+
+    repetida = await client.get(f"/api/rutinas/{rutina['id']}")
+    assert repetida.headers["etag"] == etag
+    assert repetida.headers["x-query-count"] == "0"
+
+    no_modificada = await client.get(f"/api/rutinas/{rutina['id']}", headers={"If-None-Match": etag})
+    assert no_modificada.status_code == 304
+    assert no_modificada.content == b""
+    assert (await client.get(f"/api/rutinas/{rutina['id']}", headers={"If-None-Match": '"otro"'})).status_code == 200
+
+
+async def test_una_escritura_invalida_detalle_y_listado(client, crear_rutina, cache):
+    rutina = await crear_rutina()
+    detalle = await client.get(f"/api/rutinas/{rutina['id']}")
+    listado = await client.get("/api/rutinas/", params={"limit": 200})
+
+    response = await client.put(f"/api/rutinas/{rutina['id']}", json={"nombre": f"{rutina['nombre']} editada"})
+    assert response.status_code == 200, response.text
+
+    nuevo_detalle = await client.get(f"/api/rutinas/{rutina['id']}")
+    assert nuevo_detalle.json()["nombre"] == f"{rutina['nombre']} editada"
+    assert nuevo_detalle.headers["etag"] != detalle.headers["etag"]
+    stale = await client.get(f"/api/rutinas/{rutina['id']}", headers={"If-None-Match": detalle.headers["etag"]})
+    assert stale.status_code == 200
+    nuevo_listado = await client.get("/api/rutinas/", params={"limit": 200})
+    assert nuevo_listado.headers["etag"] != listado.headers["etag"]
+    assert {item["nombre"] for item in nuevo_listado.json()["items"]} >= {f"{rutina['nombre']} editada"}
+
+
+def test_una_lectura_que_compite_con_una_escritura_no_se_guarda():
+    cache = ResponseCache(MemoryCacheBackend(10), ttl=60)
+
+    def request(path):
+        return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+    # The read looks up, the write commits and invalidates, then the read stores what it saw before.
+    lenta = request("/api/rutinas/1")
+    assert cache.lookup(lenta) is None
+    otra = request("/api/rutinas/2")
+    assert cache.lookup(otra) is None
+    cache.invalidate(rutina_tag(1))
+    cache.store(lenta, {"nombre": "vieja"}, [rutina_tag(1)])
+    cache.store(otra, {"nombre": "otra"}, [rutina_tag(2)])
+
+    assert cache.lookup(request("/api/rutinas/1")) is None
+    assert cache.lookup(request("/api/rutinas/2")) is not None
+    assert cache.stats()["raced_stores"] == 1
+
+
+async def test_reordenar_invalida_los_listados(client, crear_rutina, cache):
+    rutina = await crear_rutina()
+    params = {"include": "ejercicios", "fields": "ejercicios.orden", "limit": 200}
+
+    def ordenes(response):
+        item = next(item for item in response.json()["items"] if item["id"] == rutina["id"])
+        return sorted(ejercicio["orden"] for ejercicio in item["ejercicios"])
+
+    assert ordenes(await client.get("/api/rutinas/", params=params)) == [0, 1, 2]
+    items = [{"id": ejercicio["id"], "orden": 10 + ejercicio["orden"]} for ejercicio in rutina["ejercicios"]]
+    response = await client.put(
+        f"/api/rutinas/{rutina['id']}/ejercicios/reordenar", json={"items": items, "version": rutina["version"]}
+    )
+    assert response.status_code == 200, response.text
+    assert ordenes(await client.get("/api/rutinas/", params=params)) == [10, 11, 12]
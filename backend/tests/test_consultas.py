@@ -0,0 +1,158 @@
+"""Statement counts and query plans of the read endpoints.
+
+How many statements each read issues and what it returns: a page costs one
+statement however many rows it has, and ``fields=``/``include=`` select only
+what was asked for. The hot queries of ``app.migrations.plans`` must use
+their index.
+"""
+
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def consultar(client, url, **params):
+    """GET ``url``; the response and how many statements it ran (``X-Query-Count``)."""
+    response = await client.get(url, params=params)
+    assert response.status_code == 200, response.text
+    return response, int(response.headers["x-query-count"])
+
+
+
+@pytest.fixture
+def marca():
+    """Token unique to one test: exercise names carry it, so ``ejercicio_nombre`` scopes the results to the test."""
+    return f"marca{uuid.uuid4().hex[:8]}"
+
+
+async def crear_con_ejercicios(client, marca, dias):
+    ejercicios = [
+        {"nombre": f"{marca} {indice}", "dia_semana": dia, "series": 3, "repeticiones": 10, "orden": indice}
+        for indice, dia in enumerate(dias)
+    ]
+    payload = {"nombre": f"Rutina {uuid.uuid4().hex[:12]}", "ejercicios": ejercicios}
+    response = await client.post("/api/rutinas/", json=payload)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+async def test_listado_en_una_consulta(client, crear_rutina):
+    for _ in range(3):
+        await crear_rutina()
+    _, consultas = await consultar(client, "/api/rutinas/")
+    assert consultas == 1
+    _, consultas = await consultar(client, "/api/rutinas/", incluir_total=False)
+    assert consultas == 1
+
+
+async def test_listado_por_cursor(client, crear_rutina):
+    for _ in range(3):
+        await crear_rutina()
+    primera, consultas = await consultar(client, "/api/rutinas/", limit=2, incluir_total=False)
+    assert consultas == 1
+    cursor = primera.json()["next_cursor"]
+    assert cursor is not None
+    siguiente, consultas = await consultar(client, "/api/rutinas/", limit=2, cursor=cursor, incluir_total=False)
+    assert consultas == 1
+    ids = [item["id"] for item in primera.json()["items"] + siguiente.json()["items"]]
+    assert ids == sorted(set(ids))
+
+
+async def test_busqueda(client, crear_rutina):
+    rutina = await crear_rutina()
+    response, consultas = await consultar(client, "/api/rutinas/buscar", nombre=rutina["nombre"])
+    # The total rides on the page's rows.
+    assert consultas == 1
+    assert [item["id"] for item in response.json()["items"]] == [rutina["id"]]
+    assert response.json()["items"][0]["total_ejercicios"] == 3
+    assert response.json()["total"] == 1
+
+
+async def test_busqueda_sin_resultados(client):
+    response, consultas = await consultar(client, "/api/rutinas/buscar", nombre=f"nada{uuid.uuid4().hex}")
+    # An empty page has no row to carry the total: it is counted separately.
+    assert consultas == 2
+    assert response.json()["items"] == []
+    assert response.json()["total"] == 0
+
+
+
+async def test_fields_en_listado(client, crear_rutina):
+    await crear_rutina()
+    response, consultas = await consultar(client, "/api/rutinas/", fields="nombre")
+    assert consultas == 1
+    assert {tuple(item) for item in response.json()["items"]} == {("id", "nombre")}
+
+
+async def test_include_ejercicios_en_listado(client, crear_rutina):
+    rutina = await crear_rutina()
+    response, consultas = await consultar(
+        client, "/api/rutinas/", include="ejercicios", fields="nombre,ejercicios.nombre"
+    )
+    assert consultas == 2
+    item = next(item for item in response.json()["items"] if item["id"] == rutina["id"])
+    assert set(item) == {"id", "nombre", "ejercicios"}
+    assert [set(ejercicio) for ejercicio in item["ejercicios"]] == [{"id", "nombre"}] * 3
+
+
+async def test_include_sin_subcampos_devuelve_todo(client, crear_rutina):
+    rutina = await crear_rutina()
+    response, _ = await consultar(client, "/api/rutinas/", include="ejercicios", fields="nombre")
+    item = next(item for item in response.json()["items"] if item["id"] == rutina["id"])
+    assert [set(ejercicio) for ejercicio in item["ejercicios"]] == [set(rutina["ejercicios"][0])] * 3
+
+
+async def test_fields_en_detalle(client, crear_rutina):
+    rutina = await crear_rutina()
+    response, consultas = await consultar(client, f"/api/rutinas/{rutina['id']}", fields="nombre")
+    assert consultas == 1
+    assert response.json() == {"id": rutina["id"], "nombre": rutina["nombre"]}
+
+    response, consultas = await consultar(client, f"/api/rutinas/{rutina['id']}", fields="ejercicios.series")
+    assert consultas == 2
+    assert [set(ejercicio) for ejercicio in response.json()["ejercicios"]] == [{"id", "series"}] * 3
+
+
+async def test_campo_desconocido(client):
+    response = await client.get("/api/rutinas/", params={"fields": "nombre,color"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Campo desconocido: 'color'"
+
+
+async def test_filtros_por_cantidad_de_ejercicios(client, marca):
+    una = await crear_con_ejercicios(client, marca, ["Lunes"])
+    tres = await crear_con_ejercicios(client, marca, ["Lunes", "Martes", "Martes"])
+    cinco = await crear_con_ejercicios(client, marca, ["Martes"] * 5)
+
+    async def ids(**params):
+        response, consultas = await consultar(client, "/api/rutinas/", ejercicio_nombre=marca, **params)
+        assert consultas == 1
+        return [item["id"] for item in response.json()["items"]]
+
+    assert await ids(min_ejercicios=3) == [tres["id"], cinco["id"]]
+    assert await ids(max_ejercicios=3) == [una["id"], tres["id"]]
+    assert await ids(min_ejercicios=2, max_ejercicios=4) == [tres["id"]]
+    assert await ids(orden="ejercicios") == [cinco["id"], tres["id"], una["id"]]
+
+
+async def test_filtro_por_dia(client, marca):
+    rutina = await crear_con_ejercicios(client, marca, ["Domingo", "Lunes"])
+    sin_domingo = await crear_con_ejercicios(client, marca, ["Lunes"])
+
+    response, consultas = await consultar(client, "/api/rutinas/", dia_semana="Domingo", limit=200)
+    assert consultas == 1
+    encontradas = {item["id"] for item in response.json()["items"]}
+    assert rutina["id"] in encontradas
+    assert sin_domingo["id"] not in encontradas
+
+async def test_planes_usan_los_indices(client):
+    from app.database import async_engine
+    from app.migrations.plans import HOT_QUERIES, check_plans
+
+    # client has migrated the database to head.
+    async with async_engine.connect() as connection:
+        resultados = await connection.run_sync(check_plans)
+    assert [resultado.nombre for resultado in resultados] == list(HOT_QUERIES)
+    fallidos = {resultado.nombre: resultado.plan for resultado in resultados if not resultado.ok}
+    assert not fallidos, fallidos
@@ -0,0 +1,85 @@
+"""PDF export jobs: rendered in the process pool, polled and downloaded."""
+
+import asyncio
+import io
+import zipfile
+
+import pytest
+
+from app.exports import export_manager
+
+pytestmark = pytest.mark.anyio
+
+
+async def esperar(client, job_id, intentos=300):
+    """Poll the job until it leaves pendiente/procesando; its final state."""
+    for _ in range(intentos):
+        estado = (await client.get(f"/api/exportaciones/{job_id}")).json()
+        if estado["estado"] not in ("pendiente", "procesando"):
+            return estado
+        await asyncio.sleep(0.1)
+    raise AssertionError(f"La exportación {job_id} no terminó: {estado}")
+
+
+async def test_zip_completo(client, crear_rutina):
+    rutinas = [await crear_rutina() for _ in range(3)]
+    response = await client.post("/api/exportaciones/", json={"rutina_ids": [rutina["id"] for rutina in rutinas]})
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert (job["estado"], job["total"]) == ("pendiente", 3)
+
+    estado = await esperar(client, job["id"])
+    assert (estado["estado"], estado["completadas"], estado["error"]) == ("completado", 3, None)
+    descarga = await client.get(f"/api/exportaciones/{job['id']}/descarga")
+    assert descarga.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(descarga.content)) as archivo:
+        assert archivo.namelist() == [f"rutina_{rutina['id']}.pdf" for rutina in rutinas]
+        assert all(archivo.read(nombre).startswith(b"%PDF") for nombre in archivo.namelist())
+
+
+async def test_un_solo_pdf(client, crear_rutina):
+    rutinas = [await crear_rutina() for _ in range(2)]
+    payload = {"rutina_ids": [rutina["id"] for rutina in rutinas], "formato": "pdf"}
+    job = (await client.post("/api/exportaciones/", json=payload)).json()
+    assert (await esperar(client, job["id"]))["estado"] == "completado"
+    descarga = await client.get(f"/api/exportaciones/{job['id']}/descarga")
+    assert descarga.headers["content-type"] == "application/pdf"
+    assert descarga.content.startswith(b"%PDF")
+
+
+async def test_error_en_el_worker(client, crear_rutina):
+    async def cargar():
+        # Missing every field but the id: render_rutinas raises inside the worker process.
+        return [{"id": 1}, {"id": 2}]
+
+    job = export_manager.lanzar("pdf", 2, cargar)
+    estado = await esperar(client, job["id"])
+    assert (estado["estado"], estado["error"]) == ("error", "'nombre'")
+    descarga = await client.get(f"/api/exportaciones/{job['id']}/descarga")
+    assert descarga.status_code == 409
+    assert descarga.json()["detail"] == "La exportación está error"
+    assert list(export_manager.spool_dir.glob(f"{job['id']}.*")) == [export_manager.spool_dir / f"{job['id']}.json"]
+
+    # The pool survives a failed render.
+    rutina = await crear_rutina()
+    job = (await client.post("/api/exportaciones/", json={"rutina_ids": [rutina["id"]]})).json()
+    assert (await esperar(client, job["id"]))["estado"] == "completado"
+
+
+async def test_error_al_cargar(client):
+    async def cargar():
+        raise RuntimeError("la réplica no responde")
+
+    job = export_manager.lanzar("zip", 1, cargar)
+    estado = await esperar(client, job["id"])
+    assert (estado["estado"], estado["error"]) == ("error", "la réplica no responde")
+
+
+async def test_pedidos_invalidos(client):
+    response = await client.post("/api/exportaciones/", json={"rutina_ids": [1], "plan_semanal": True})
+    assert response.status_code == 400
+    response = await client.post("/api/exportaciones/", json={"rutina_ids": [10**9]})
+    assert response.status_code == 404
+    assert response.json()["detail"] == {"rutinas_no_encontradas": [10**9]}
+    assert (await client.get(f"/api/exportaciones/{'0' * 32}")).status_code == 404
+    assert (await client.get("/api/exportaciones/no-es-un-id")).status_code == 404
@@ -0,0 +1,112 @@
+"""Bulk import: the summary counts every input routine exactly once.
+
+Only the executemany path runs here; the ``COPY`` path needs PostgreSQL.
+"""
+
+import json
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+pytestmark = pytest.mark.anyio
+
+
+def rutina(nombre, *ejercicios, descripcion=None):
+    return {
+        "nombre": nombre,
+        "descripcion": descripcion,
+        "ejercicios": [
+            {"nombre": ejercicio, "dia_semana": "Lunes", "series": 3, "repeticiones": 10, "orden": indice}
+            for indice, ejercicio in enumerate(ejercicios)
+        ],
+    }
+
+
+async def importar(client, cuerpo, **params):
+    response = await client.post("/api/rutinas/import", params=params, content=cuerpo.encode())
+    assert response.status_code == 200, response.text
+    resumen = response.json()
+    return {campo: resumen[campo] for campo in ("insertadas", "actualizadas", "omitidas", "fallidas", "ejercicios")}, [
+        (error["linea"], error["error"]) for error in resumen["errores"]
+    ]
+
+
+def ndjson(*registros):
+    return "\n".join(registro if isinstance(registro, str) else json.dumps(registro) for registro in registros)
+
+
+async def test_resumen_ndjson(client, crear_rutina):
+    existente = await crear_rutina()
+    nueva = f"Importada {uuid.uuid4().hex[:8]}"
+    cuerpo = ndjson(
+        rutina(nueva, "Sentadilla", "Peso muerto"),
+        "{no es json",
+        {"nombre": "Sin ejercicios válidos", "ejercicios": [{"nombre": "X"}]},
+        rutina(nueva, "Repetida"),
+        rutina(existente["nombre"], "Otra"),
+    )
+    resumen, errores = await importar(client, cuerpo)
+    assert resumen == {"insertadas": 1, "actualizadas": 0, "omitidas": 2, "fallidas": 2, "ejercicios": 2}
+    assert [linea for linea, _ in errores] == [2, 3]
+    assert errores[0][1].startswith("JSON inválido")
+
+    buscada = (await client.get("/api/rutinas/buscar", params={"nombre": nueva})).json()["items"]
+    assert [(item["nombre"], item["total_ejercicios"]) for item in buscada] == [(nueva, 2)]
+
+
+async def test_actualizar_existentes(client, crear_rutina):
+    existente = await crear_rutina()
+    cuerpo = ndjson(rutina(existente["nombre"], "Remo", descripcion="Nueva descripción"))
+    resumen, errores = await importar(client, cuerpo, duplicados="actualizar")
+    assert resumen == {"insertadas": 0, "actualizadas": 1, "omitidas": 0, "fallidas": 0, "ejercicios": 1}
+    assert errores == []
+
+    detalle = (await client.get(f"/api/rutinas/{existente['id']}")).json()
+    assert detalle["descripcion"] == "Nueva descripción"
+    assert [ejercicio["nombre"] for ejercicio in detalle["ejercicios"]] == ["Remo"]
+
+
+async def test_csv(client):
+    nombre = f"Csv {uuid.uuid4().hex[:8]}"
+    cuerpo = "\n".join(
+        [
+            "rutina_nombre,rutina_descripcion,ejercicio_nombre,dia_semana,series,repeticiones,notas",
+            f"{nombre},Fuerza,Sentadilla,Lunes,5,5,",
+            f'{nombre},Fuerza,Press,Martes,3,8,"dos',
+            'líneas"',
+            f"{nombre},Fuerza,Remo,Martes,3",
+        ]
+    )
+    resumen, errores = await importar(client, cuerpo, formato="csv")
+    assert resumen == {"insertadas": 1, "actualizadas": 0, "omitidas": 0, "fallidas": 1, "ejercicios": 2}
+    assert errores == [(5, "Se esperaban 7 columnas y hay 5")]
+
+    buscada = (await client.get("/api/rutinas/buscar", params={"nombre": nombre})).json()["items"][0]
+    detalle = (await client.get(f"/api/rutinas/{buscada['id']}")).json()
+    assert [ejercicio["notas"] for ejercicio in detalle["ejercicios"]] == [None, "dos\nlíneas"]
+
+
+async def test_csv_sin_columna_de_rutina(client):
+    response = await client.post("/api/rutinas/import", params={"formato": "csv"}, content=b"nombre\nA\n")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "El CSV debe tener la columna rutina_nombre"
+
+
+async def test_lote_rechazado(client, crear_rutina, monkeypatch):
+    from app import imports
+
+    async def falla(session, filas):
+        raise OperationalError("INSERT INTO ejercicio", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(imports, "_insertar_ejercicios", falla)
+    existente = await crear_rutina()
+    nuevas = [f"Rechazada {uuid.uuid4().hex[:8]}" for _ in range(2)]
+    cuerpo = ndjson(*(rutina(nombre, "Sentadilla") for nombre in nuevas), rutina(existente["nombre"], "Otra"))
+
+    # The existing routine is skipped either way; only the two that would be written fail.
+    resumen, errores = await importar(client, cuerpo)
+    assert resumen == {"insertadas": 0, "actualizadas": 0, "omitidas": 1, "fallidas": 2, "ejercicios": 0}
+    assert errores == [(1, "Lote de 2 rutinas rechazado: OperationalError")]
+    for nombre in nuevas:
+        assert (await client.get("/api/rutinas/buscar", params={"nombre": nombre})).json()["total"] == 0
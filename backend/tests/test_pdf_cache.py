@@ -0,0 +1,98 @@
+"""PDF cache: content-addressed keys, both tiers, invalidation and eviction by bytes."""
+
+import pytest
+
+from app.pdf_cache import PdfCache, clave_pdf, pdf_cache
+
+pytestmark = pytest.mark.anyio
+
+
+def datos(nombre="Fuerza", *ejercicios):
+    return {
+        "id": 1,
+        "nombre": nombre,
+        "descripcion": None,
+        "ejercicios": [
+            {"nombre": ejercicio, "dia_semana": "Lunes", "series": 3, "repeticiones": 10, "orden": indice}
+            for indice, ejercicio in enumerate(ejercicios)
+        ],
+    }
+
+
+def test_clave_por_contenido():
+    assert clave_pdf(datos("Fuerza", "Sentadilla", "Press")) == clave_pdf(datos("Fuerza", "Sentadilla", "Press"))
+    assert clave_pdf(datos("Fuerza", "Sentadilla", "Press")) != clave_pdf(datos("Fuerza", "Press", "Sentadilla"))
+    assert clave_pdf(datos("Fuerza", "Sentadilla")) != clave_pdf(datos("Potencia", "Sentadilla"))
+
+
+def test_aciertos_en_memoria_y_en_disco(tmp_path):
+    cache = PdfCache(tmp_path, memory_max_bytes=100, disk_max_bytes=100)
+    cache.put("a" * 64, b"%PDF uno", rutina_id=1)
+    assert cache.get("a" * 64) == b"%PDF uno"
+    assert cache.get("b" * 64) is None
+
+    # Another process sharing the directory starts with an empty memory tier.
+    otra = PdfCache(tmp_path, memory_max_bytes=100, disk_max_bytes=100)
+    assert otra.get("a" * 64) == b"%PDF uno"
+    assert otra.get("a" * 64) == b"%PDF uno"
+    assert (cache.memory_hits, cache.misses) == (1, 1)
+    assert (otra.disk_hits, otra.memory_hits) == (1, 1)
+
+
+def test_invalidar_tras_editar(tmp_path):
+    cache = PdfCache(tmp_path, memory_max_bytes=100, disk_max_bytes=100)
+    vieja, nueva = clave_pdf(datos("Fuerza")), clave_pdf(datos("Fuerza editada"))
+    cache.put(vieja, b"%PDF vieja", rutina_id=1)
+    # A new render of the same routine replaces its previous entry.
+    cache.put(nueva, b"%PDF nueva", rutina_id=1)
+    assert cache.get(vieja) is None
+    assert not (tmp_path / f"{vieja}.pdf").exists()
+
+    cache.invalidar(1)
+    assert cache.get(nueva) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_expulsa_por_bytes(tmp_path):
+    cache = PdfCache(tmp_path, memory_max_bytes=25, disk_max_bytes=25)
+    cache.put("a" * 64, b"a" * 10)
+    cache.put("b" * 64, b"b" * 10)
+    cache.get("a" * 64)
+    cache.put("c" * 64, b"c" * 10)
+
+    # Each tier tracks its own use: the hit on "a" came from memory, so only memory kept it.
+    estado = cache.stats()
+    assert (estado["memory_entries"], estado["memory_bytes"]) == (2, 20)
+    assert (estado["disk_entries"], estado["disk_bytes"]) == (2, 20)
+    assert list(cache._memory) == ["a" * 64, "c" * 64]
+    assert sorted(path.stem[0] for path in tmp_path.iterdir()) == ["b", "c"]
+    assert cache.get("b" * 64) == b"b" * 10
+    assert cache.disk_hits == 1
+
+    # Larger than the whole budget: served, but never stored.
+    cache.put("d" * 64, b"d" * 30)
+    assert cache.get("d" * 64) is None
+    assert cache.get("c" * 64) == b"c" * 10
+    assert cache.stats()["disk_bytes"] == 20
+
+
+async def test_export_reusa_el_pdf_hasta_que_cambia(client, crear_rutina):
+    rutina = await crear_rutina()
+    url = f"/api/rutinas/{rutina['id']}/export"
+    primera = await client.get(url)
+    assert primera.status_code == 200, primera.text
+    assert primera.content.startswith(b"%PDF")
+    renders = pdf_cache.renders
+
+    repetida = await client.get(url)
+    assert repetida.content == primera.content
+    assert repetida.headers["etag"] == primera.headers["etag"]
+    assert pdf_cache.renders == renders
+    assert (await client.get(url, headers={"If-None-Match": primera.headers["etag"]})).status_code == 304
+
+    response = await client.put(f"/api/rutinas/{rutina['id']}", json={"nombre": f"{rutina['nombre']} editada"})
+    assert response.status_code == 200, response.text
+    editada = await client.get(url)
+    assert editada.headers["etag"] != primera.headers["etag"]
+    assert pdf_cache.renders == renders + 1
+    assert pdf_cache.get(primera.headers["etag"].strip('"')) is None
@@ -0,0 +1,132 @@
+"""The main endpoints stay within their ``query_budget`` (strict mode, see conftest)."""
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def assert_dentro_del_presupuesto(response, status_code=200):
+    assert response.status_code == status_code, response.text
+    assert "x-query-budget-exceeded" not in response.headers
+
+
+async def test_listado(client, crear_rutina):
+    for _ in range(3):
+        await crear_rutina()
+    assert_dentro_del_presupuesto(await client.get("/api/rutinas/"))
+    assert_dentro_del_presupuesto(await client.get("/api/rutinas/", params={"include": "ejercicios"}))
+
+
+async def test_busqueda(client, crear_rutina):
+    rutina = await crear_rutina()
+    response = await client.get("/api/rutinas/buscar", params={"nombre": rutina["nombre"]})
+    assert_dentro_del_presupuesto(response)
+    assert [item["id"] for item in response.json()["items"]] == [rutina["id"]]
+
+
+async def test_paginas_vacias(client):
+    # No row carries the total, so it takes a second statement.
+    response = await client.get("/api/rutinas/", params={"ejercicio_nombre": "ninguno-coincide"})
+    assert_dentro_del_presupuesto(response)
+    assert response.json()["total"] == 0
+    response = await client.get("/api/rutinas/buscar", params={"nombre": "ninguno-coincide"})
+    assert_dentro_del_presupuesto(response)
+    assert response.json()["total"] == 0
+
+
+async def test_detalle(client, crear_rutina):
+    rutina = await crear_rutina()
+    assert_dentro_del_presupuesto(await client.get(f"/api/rutinas/{rutina['id']}"))
+
+
+async def test_lote_mixto(client, crear_rutina):
+    rutina = await crear_rutina(dias=("Lunes",) * 5)
+    primero, segundo, tercero, cuarto, quinto = (ejercicio["id"] for ejercicio in rutina["ejercicios"])
+    # Each set of updated columns is its own UPDATE; the first and last share one.
+    operaciones = [
+        {"op": "create", "rutina_id": rutina["id"], "nombre": "Nuevo", "dia_semana": "Martes", "series": 4,
+         "repeticiones": 8},
+        {"op": "update", "id": primero, "series": 5},
+        {"op": "update", "id": tercero, "nombre": "Renombrado"},
+        {"op": "update", "id": cuarto, "peso": 20, "notas": "Con pausa"},
+        {"op": "update", "id": quinto, "series": 6},
+        {"op": "delete", "id": segundo},
+    ]
+    response = await client.post("/api/ejercicios/batch", json={"operaciones": operaciones})
+    assert_dentro_del_presupuesto(response)
+    resultados = response.json()["resultados"]
+    assert [resultado["op"] for resultado in resultados] == ["create", "update", "update", "update", "update", "delete"]
+    ejercicios = [resultado["ejercicio"] for resultado in resultados[1:5]]
+    assert [ejercicios[0]["series"], ejercicios[1]["nombre"], ejercicios[2]["peso"], ejercicios[3]["series"]] == [
+        5, "Renombrado", 20, 6
+    ]
+    assert ejercicios[2]["notas"] == "Con pausa"
+
+
+async def test_lote_con_muchas_altas(client, crear_rutina):
+    rutina = await crear_rutina()
+    operaciones = [
+        {"op": "create", "rutina_id": rutina["id"], "nombre": f"Alta {indice}", "dia_semana": "Jueves",
+         "series": 1, "repeticiones": 1}
+        for indice in range(50)
+    ]
+    response = await client.post("/api/ejercicios/batch", json={"operaciones": operaciones})
+    assert_dentro_del_presupuesto(response)
+
+
+async def test_bulk(client):
+    rutinas = [
+        {
+            "nombre": f"Bulk {indice}",
+            "ejercicios": [{"nombre": "Sentadilla", "dia_semana": "Lunes", "series": 3, "repeticiones": 5}] * 3,
+        }
+        for indice in range(20)
+    ]
+    assert_dentro_del_presupuesto(await client.post("/api/rutinas/bulk", json=rutinas), status_code=201)
+
+
+async def test_reordenar(client, crear_rutina):
+    rutina = await crear_rutina()
+    items = [{"id": ejercicio["id"], "orden": 2 - indice} for indice, ejercicio in enumerate(rutina["ejercicios"])]
+    response = await client.put(
+        f"/api/rutinas/{rutina['id']}/ejercicios/reordenar", json={"items": items, "version": rutina["version"]}
+    )
+    assert_dentro_del_presupuesto(response)
+
+
+async def test_reordenar_con_version_vieja(client, crear_rutina):
+    rutina = await crear_rutina()
+    url = f"/api/rutinas/{rutina['id']}/ejercicios/reordenar"
+    items = [{"id": ejercicio["id"], "orden": 2 - indice} for indice, ejercicio in enumerate(rutina["ejercicios"])]
+    assert_dentro_del_presupuesto(await client.put(url, json={"items": items, "version": rutina["version"]}))
+
+    # Another tab still holds the version read before the first reorder.
+    response = await client.put(url, json={"items": items[::-1], "version": rutina["version"]})
+    assert_dentro_del_presupuesto(response, status_code=409)
+    assert f"versión actual: {rutina['version'] + 1}" in response.json()["detail"]
+    assert (await client.put(url, json={"items": items[::-1]})).status_code == 422
+    assert (await client.put("/api/rutinas/0/ejercicios/reordenar", json={"items": items, "version": 1})).status_code == 404
+
+    detalle = (await client.get(f"/api/rutinas/{rutina['id']}")).json()
+    assert detalle["version"] == rutina["version"] + 1
+    assert {ejercicio["id"]: ejercicio["orden"] for ejercicio in detalle["ejercicios"]} == {
+        item["id"]: item["orden"] for item in items
+    }
+
+
+async def test_exceso_no_confirma(client, crear_rutina, monkeypatch):
+    """An over-budget request in strict mode fails before COMMIT, so its changes are not saved."""
+    from app.database import extend_query_budget
+    from app.routers import ejercicios
+
+    rutina = await crear_rutina()
+    ejercicio_id = rutina["ejercicios"][0]["id"]
+    monkeypatch.setattr(ejercicios, "extend_query_budget", lambda extra: extend_query_budget(extra - 1))
+
+    response = await client.post("/api/ejercicios/batch", json={"operaciones": [{"op": "delete", "id": ejercicio_id}]})
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("Se ejecutaron")
+
+    monkeypatch.undo()
+    detalle = (await client.get(f"/api/rutinas/{rutina['id']}")).json()
+    assert ejercicio_id in [ejercicio["id"] for ejercicio in detalle["ejercicios"]]
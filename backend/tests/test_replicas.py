@@ -0,0 +1,130 @@
+"""Read replicas: read-your-writes cookie, cache hold-off and lazily opened read sessions.
+
+The replica is the primary's own SQLite file, so it is never behind; the
+tests check which engine each read checks a connection out of.
+"""
+
+import asyncio
+from collections import Counter
+
+import pytest
+from sqlalchemy import event
+
+from app.cache import response_cache
+from app.config import settings
+from app.database import async_engine
+from app.replicas import STICKY_COOKIE, Replica, replicas
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(client, monkeypatch):
+    """The only replica, on the primary's database file; the client starts and ends without the cookie."""
+    replica = Replica(settings.database_url)
+    monkeypatch.setattr(replicas, "replicas", [replica])
+    client.cookies.clear()
+    yield replica
+    client.cookies.clear()
+    await replica.engine.dispose()
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "enabled", True)
+    response_cache.backend.clear()
+    yield response_cache
+    response_cache.backend.clear()
+
+
+@pytest.fixture
+def conexiones(replica):
+    """Connections checked out of the primary and replica pools during the test."""
+    contadas = Counter()
+    oyentes = []
+    for nombre, engine in (("primario", async_engine), ("replica", replica.engine)):
+        oyente = lambda *args, nombre=nombre: contadas.update([nombre])
+        event.listen(engine.sync_engine, "checkout", oyente)
+        oyentes.append((engine.sync_engine, oyente))
+    yield contadas
+    for engine, oyente in oyentes:
+        event.remove(engine, "checkout", oyente)
+
+
+async def leer(client, conexiones, url):
+    """GET ``url``; the response and the pools it took connections from."""
+    antes = conexiones.copy()
+    response = await client.get(url)
+    assert response.status_code == 200, response.text
+    return response, set(conexiones - antes)
+
+
+async def test_lecturas_despues_de_escribir_van_al_primario(client, crear_rutina, conexiones, cache):
+    rutina = await crear_rutina()
+    assert STICKY_COOKIE in client.cookies
+    sticky, bypasses = replicas.sticky_reads, cache.bypassed
+
+    _, pools = await leer(client, conexiones, f"/api/rutinas/{rutina['id']}")
+    assert pools == {"primario"}
+    assert replicas.sticky_reads == sticky + 1
+    assert cache.bypassed == bypasses + 1
+
+    # What the primary returned is current, so it was cached for everyone else.
+    client.cookies.clear()
+    _, pools = await leer(client, conexiones, f"/api/rutinas/{rutina['id']}")
+    assert pools == set()
+    _, pools = await leer(client, conexiones, f"/api/rutinas/{rutina['id']}?fields=nombre")
+    assert pools == {"replica"}
+
+
+async def test_no_guarda_lecturas_de_la_replica_tras_invalidar(client, crear_rutina, conexiones, cache, monkeypatch):
+    monkeypatch.setattr(cache, "hold_off", 0.2)
+    rutina = await crear_rutina()
+    url = f"/api/rutinas/{rutina['id']}"
+    assert (await client.put(url, json={"descripcion": "editada"})).status_code == 200
+    client.cookies.clear()
+    held_off = cache.held_off
+
+    # Right after the write the replica might still lack it: read, but don't cache.
+    for _ in range(2):
+        response, pools = await leer(client, conexiones, url)
+        assert pools == {"replica"}
+        assert response.json()["descripcion"] == "editada"
+    assert cache.held_off == held_off + 2
+
+    await asyncio.sleep(0.25)
+    await leer(client, conexiones, url)
+    response, pools = await leer(client, conexiones, url)
+    assert pools == set()
+    assert response.headers["x-query-count"] == "0"
+
+
+async def test_un_acierto_de_cache_no_toma_conexion(client, crear_rutina, conexiones, cache):
+    await crear_rutina()
+    client.cookies.clear()
+
+    _, pools = await leer(client, conexiones, "/api/rutinas/?limit=5")
+    assert pools == {"replica"}
+    _, pools = await leer(client, conexiones, "/api/rutinas/?limit=5")
+    assert pools == set()
+    _, pools = await leer(client, conexiones, "/api/plan/")
+    assert pools == {"replica"}
+    _, pools = await leer(client, conexiones, "/api/plan/")
+    assert pools == set()
+
+
+async def test_replica_caida_lee_del_primario(client, crear_rutina, monkeypatch, tmp_path):
+    rutina = await crear_rutina()
+    caida = Replica(f"sqlite:///{tmp_path}/no/existe.db")
+    monkeypatch.setattr(replicas, "replicas", [caida])
+    client.cookies.clear()
+    fallbacks = replicas.fallbacks
+    try:
+        response = await client.get(f"/api/rutinas/{rutina['id']}")
+        assert response.status_code == 200, response.text
+        assert replicas.fallbacks == fallbacks + 1
+        assert not caida.healthy
+        assert caida.last_error.startswith("OperationalError")
+    finally:
+        client.cookies.clear()
+        await caida.engine.dispose()
@@ -16,7 +16,7 @@ import {
 import OpenInNewIcon from '@mui/icons-material/OpenInNew'
 import ArrowBackIcon from '@mui/icons-material/ArrowBack'
 
-import { planAPI, rutinasAPI } from '../services/api'
+import { planAPI, rutinasAPI, suscribirCambios } from '../services/api'
 import { useNavigate } from 'react-router-dom'
 
 const DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
@@ -28,9 +28,9 @@ function PlanSemanal() {
   const [error, setError] = useState(null)
   const navigate = useNavigate()
 
-  const cargarDatos = async () => {
+  const cargarDatos = async ({ silencioso = false } = {}) => {
     // Obtiene plan y rutinas disponibles en paralelo
-    setLoading(true)
+    if (!silencioso) setLoading(true)
     setError(null)
     try {
       const [planRes, rutinasRes] = await Promise.all([
@@ -54,6 +54,15 @@ function PlanSemanal() {
     cargarDatos()
   }, [])
 
+  // Recarga sin spinner cuando otro cliente cambia el plan o las rutinas
+  useEffect(
+    () =>
+      suscribirCambios((cambio) => {
+        if (!cambio || cambio.plan || cambio.listado) cargarDatos({ silencioso: true })
+      }),
+    []
+  )
+
   const handleChange = async (dia, rutinaId) => {
     try {
       if (!rutinaId) {
@@ -113,10 +113,16 @@ function RutinaDetail() {
     setRutina({ ...rutina, ejercicios: updatedExercises })
 
     try {
-      await rutinasAPI.reorderExercises(rutina.id, updates)
-      await fetchRutina()
+      // La respuesta trae la rutina con la nueva versión y la lista completa.
+      const response = await rutinasAPI.reorderExercises(rutina.id, updates, rutina.version)
+      setRutina(response.data)
     } catch (err) {
-      setError('No se pudo reordenar. Reintenta.')
+      if (err.response?.status === 409) {
+        setError('La rutina fue reordenada en otra pestaña. Se recargó el orden actual.')
+        await fetchRutina()
+      } else {
+        setError('No se pudo reordenar. Reintenta.')
+      }
     } finally {
       setDraggingId(null)
     }
@@ -140,15 +140,15 @@ function RutinaForm() {
     try {
       if (id) {
         await rutinasAPI.update(id, { nombre: rutina.nombre, descripcion: rutina.descripcion })
-        await Promise.all(
-          ejerciciosProcesados.map(async ({ original, payload }) => {
-            if (original?.id) {
-              await ejerciciosAPI.update(original.id, payload)
-            } else {
-              await rutinasAPI.addExercise(id, payload)
-            }
-          })
+        // Un solo request/transacción para todos los ejercicios
+        const operaciones = ejerciciosProcesados.map(({ original, payload }) =>
+          original?.id
+            ? { op: 'update', id: original.id, ...payload }
+            : { op: 'create', rutina_id: Number(id), ...payload }
         )
+        if (operaciones.length) {
+          await ejerciciosAPI.batch(operaciones)
+        }
         setSuccess('Rutina actualizada correctamente.')
         await fetchRutina()
       } else {
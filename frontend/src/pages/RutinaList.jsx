@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useNavigate } from 'react-router-dom'
 import {
   Box,
@@ -21,7 +21,7 @@ import EditIcon from '@mui/icons-material/Edit'
 import AddIcon from '@mui/icons-material/Add'
 import ContentCopyIcon from '@mui/icons-material/ContentCopy'
 
-import { rutinasAPI } from '../services/api'
+import { rutinasAPI, suscribirCambios } from '../services/api'
 
 function RutinaList() {
   const [rutinas, setRutinas] = useState([])
@@ -38,8 +38,8 @@ function RutinaList() {
 
   // Carga rutinas con paginación y filtros (búsqueda, día y ejercicio)
   const fetchRutinas = async (nextPage = 1, options = {}) => {
-    const { term = searchTerm, dia = diaFilter, ejercicio = ejercicioFilter } = options
-    setLoading(true)
+    const { term = searchTerm, dia = diaFilter, ejercicio = ejercicioFilter, silencioso = false } = options
+    if (!silencioso) setLoading(true)
     setError(null)
     const trimmedTerm = term.trim()
     const trimmedEjercicio = ejercicio.trim()
@@ -92,6 +92,17 @@ function RutinaList() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [])
 
+  // Recarga la página actual sin spinner cuando cambia el listado en otro cliente
+  const recargar = useRef(null)
+  recargar.current = () => fetchRutinas(page, { silencioso: true })
+  useEffect(
+    () =>
+      suscribirCambios((cambio) => {
+        if (!cambio || cambio.listado) recargar.current()
+      }),
+    []
+  )
+
   const totalPages = Math.max(1, Math.ceil(total / PAGE_SIZE))
 
   const handleDelete = async (id) => {
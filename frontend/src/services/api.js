@@ -4,6 +4,8 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
 const api = axios.create({
   baseURL: API_BASE_URL,
+  // Sends the read-your-writes cookie, so reads right after a write skip the read replicas.
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },
@@ -19,8 +21,8 @@ export const rutinasAPI = {
   delete: (id) => api.delete(`/api/rutinas/${id}`),
   addExercise: (id, data) => api.post(`/api/rutinas/${id}/ejercicios`, data),
   duplicate: (id) => api.post(`/api/rutinas/${id}/duplicar`),
-  reorderExercises: (id, items) =>
-    api.put(`/api/rutinas/${id}/ejercicios/reordenar`, { items }),
+  reorderExercises: (id, items, version) =>
+    api.put(`/api/rutinas/${id}/ejercicios/reordenar`, { items, version }),
   exportOnePdf: (id) =>
     api.get(`/api/rutinas/${id}/export`, {
       params: { formato: 'pdf' },
@@ -30,6 +32,8 @@ export const rutinasAPI = {
 
 export const planAPI = {
   get: () => api.get('/api/plan/'),
+  getExpanded: () => api.get('/api/plan/', { params: { expand: 'ejercicios' } }),
+  today: () => api.get('/api/plan/hoy'),
   setDay: (dia_semana, rutina_id) => api.put('/api/plan/', { dia_semana, rutina_id }),
   clearDay: (dia_semana) => api.delete(`/api/plan/${dia_semana}`),
 }
@@ -37,6 +41,16 @@ export const planAPI = {
 export const ejerciciosAPI = {
   update: (id, data) => api.put(`/api/ejercicios/${id}`, data),
   delete: (id) => api.delete(`/api/ejercicios/${id}`),
+  batch: (operaciones) => api.post('/api/ejercicios/batch', { operaciones }),
+}
+
+// Stream of change events (SSE). Calls onCambio with the "cambio" payload, or with null on "resync"
+// (some events were missed: reload everything). Returns a function that closes the stream.
+export const suscribirCambios = (onCambio) => {
+  const source = new EventSource(`${API_BASE_URL}/api/eventos/`, { withCredentials: true })
+  source.addEventListener('cambio', (event) => onCambio(JSON.parse(event.data)))
+  source.addEventListener('resync', () => onCambio(null))
+  return () => source.close()
 }
 
 export default api